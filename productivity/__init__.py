@@ -0,0 +1,27 @@
+"""
+Headless productivity computation core shared by the Streamlit apps and batch jobs.
+
+Modules (none of them import Streamlit):
+
+- ``productivity.metrics``  – products/inputs metrics, TFP & partial productivity, Kaizen
+- ``productivity.national`` – national aggregation over long-form multi-company data
+- ``productivity.national_store`` – indexed, memory-mapped store for ingested national datasets
+- ``productivity.cube``     – rollup cube for drill-down (company → sector → region → nation)
+- ``productivity.sampling`` – sampled quick-look estimates with confidence intervals
+- ``productivity.timeseries`` – chained growth rates, Törnqvist/Fisher TFP indexes, moving averages
+- ``productivity.schema``   – one-time coercion of products/inputs/national tables
+- ``productivity.quality``  – vectorised data-quality screening (flags, outliers, quarantine)
+- ``productivity.labour``   – labour productivity indicators & weighted index (sample1)
+- ``productivity.tabular_io`` / ``productivity.result_cache`` – file formats and result cache
+- ``productivity.paging``   – server-side filter/sort/paging for table views
+- ``productivity.jobs``     – bounded background job runner with progress, cancellation, per-user limits
+- ``productivity.serving`` / ``productivity.loadtest`` – shared local compute service and its load test
+- ``productivity.registry`` – in-memory registry of parsed uploads shared across sessions
+- ``productivity.batch``    – compact array-backed metric results (integer-coded keys)
+- ``productivity.synthetic`` / ``productivity.benchmark`` – synthetic data and benchmarks
+
+Run ``python -m productivity --help`` for the batch CLI. Submodules are imported on demand
+so that the CLI starts without loading pandas.
+"""
+
+__version__ = "1.0.0"
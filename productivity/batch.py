@@ -0,0 +1,114 @@
+"""
+Compact, array-backed container for per-unit / per-group metric results.
+
+A MetricBatch holds one float64 array per metric and stores each key column (unit,
+period, company, …) as integer codes plus one array of distinct labels. Results are
+filled column by column from vectorised computations, never row by row. to_pandas()
+and to_arrow() wrap the same buffers without copying them: categoricals and dictionary
+arrays reuse the codes, and float columns reuse the metric arrays.
+
+    batch = hitung_batch_compact(units, weights, targets)
+    batch.nbytes                 # about 4–8 bytes per key and 8 per metric, per row
+    batch.to_arrow()             # e.g. pyarrow.parquet.write_table(batch.to_arrow(), path)
+"""
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _code_dtype(n_labels: int) -> np.dtype:
+    # Same width pandas picks for categorical codes, so Categorical.from_codes does not copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_labels < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class MetricBatch:
+    """Key columns as (codes, labels) and metric columns as float64 arrays, all of one length."""
+
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        self.keys: Dict[str, tuple] = {}
+        self.metrics: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def columns(self) -> List[str]:
+        return [*self.keys, *self.metrics]
+
+    def _check_length(self, name: str, n: int) -> None:
+        if n != self.n_rows:
+            raise ValueError(f"Column {name!r} has {n:,} rows, batch has {self.n_rows:,}")
+
+    def set_key(self, name: str, values) -> "MetricBatch":
+        """Store a key column from raw values (factorised once; missing values get code -1)."""
+        if not hasattr(values, "dtype"):
+            # Lists, tuples, ranges, …: pd.factorize only takes array-likes
+            values = pd.Series(values, dtype=None if len(values) else object)
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            if isinstance(values, pd.Series):
+                values = values.array
+            return self.set_key_codes(name, values.codes, values.categories)
+        codes, labels = pd.factorize(values)
+        return self.set_key_codes(name, codes, labels)
+
+    def set_key_codes(self, name: str, codes, labels) -> "MetricBatch":
+        """Store a key column that is already coded (codes index into labels; -1 = missing)."""
+        labels = pd.Index(labels)
+        codes = np.asarray(codes)
+        self._check_length(name, len(codes))
+        self.keys[name] = (codes.astype(_code_dtype(len(labels)), copy=False), labels)
+        return self
+
+    def set_metric(self, name: str, values) -> "MetricBatch":
+        """Store a metric column; a float64 array is kept as-is, anything else is converted once."""
+        values = np.asarray(values, dtype=np.float64)
+        self._check_length(name, len(values))
+        self.metrics[name] = values
+        return self
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keys: Iterable[str], metrics: Optional[Iterable[str]] = None) -> "MetricBatch":
+        """Batch from a DataFrame: `keys` are coded, `metrics` (default: every other column) become float64."""
+        keys = list(keys)
+        batch = cls(len(df))
+        for key in keys:
+            batch.set_key(key, df[key])
+        for col in (metrics if metrics is not None else [c for c in df.columns if c not in keys]):
+            batch.set_metric(col, df[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        return batch
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the codes, labels and metric arrays."""
+        total = sum(a.nbytes for a in self.metrics.values())
+        for codes, labels in self.keys.values():
+            total += codes.nbytes + int(labels.memory_usage(deep=True))
+        return total
+
+    def to_pandas(self) -> pd.DataFrame:
+        """DataFrame of categorical keys and float64 metrics sharing this batch's buffers."""
+        data = {name: pd.Categorical.from_codes(codes, categories=labels, validate=False)
+                for name, (codes, labels) in self.keys.items()}
+        data.update(self.metrics)
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """pyarrow Table: keys as dictionary arrays, metrics as float64 (NaN kept as values), zero-copy."""
+        import pyarrow as pa
+
+        arrays, names = [], []
+        for name, (codes, labels) in self.keys.items():
+            # Missing keys (code -1) become nulls; this needs a mask, so only then is a copy made
+            missing = codes < 0
+            indices = pa.array(codes, mask=missing) if missing.any() else pa.array(codes)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(labels.to_numpy(), from_pandas=True)))
+            names.append(name)
+        for name, values in self.metrics.items():
+            arrays.append(pa.array(values))
+            names.append(name)
+        return pa.Table.from_arrays(arrays, names=names)
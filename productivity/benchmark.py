@@ -0,0 +1,173 @@
+"""
+Benchmarks for the computation entry points.
+
+Each case generates synthetic data at the requested row counts, runs the function a few
+times and records wall time (best of N), throughput (rows/s) and peak traced memory.
+Results are written as a JSON baseline; a later run can be compared against it:
+
+    python -m productivity bench --sizes 1e3 1e5 1e6 --out bench.json
+    python -m productivity bench --sizes 1e3 1e5 1e6 --compare bench.json
+"""
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import __version__, synthetic
+from .labour import (grid_bobot, grid_target, hitung_batch, hitung_batch_compact, hitung_indeks, hitung_indikator,
+                     hitung_sensitivitas)
+from .metrics import extract_partial_inputs, kaizen_compare, productivity_metrics, scenario_metrics
+from .national import national_aggregate
+from .quality import screen
+from .sampling import sample_cube
+from .timeseries import national_timeseries
+
+WEIGHTS = (0.4, 0.3, 0.3)
+TARGETS = (2e6, 5e3, 3.0)
+SETTINGS = {"use_price_output": True, "use_standard_hour_output": True}
+
+# Row-wise Python loops are skipped above this size unless asked for
+SCALAR_MAX_ROWS = 100_000
+
+
+def _scalar_index(units: pd.DataFrame) -> None:
+    for output, workers, hours, labour_cost in units[["output", "workers", "hours", "labour_cost"]].itertuples(index=False):
+        lp, hp, wp = hitung_indikator(output, workers, hours, labour_cost)
+        hitung_indeks(lp, hp, wp, WEIGHTS, TARGETS)
+
+
+def _cases(scalar_max: int) -> Dict[str, Tuple[Callable[[int], object], Callable[[object], object], int]]:
+    """name -> (setup(n) -> data, run(data), max rows)."""
+    half = lambda n: max(n // 2, 1)  # noqa: E731
+    return {
+        "hitung_indeks_scalar": (synthetic.labour_units, _scalar_index, scalar_max),
+        "hitung_batch": (synthetic.labour_units, lambda d: hitung_batch(d, WEIGHTS, TARGETS), 0),
+        "hitung_batch_compact": (synthetic.labour_units, lambda d: hitung_batch_compact(d, WEIGHTS, TARGETS), 0),
+        "hitung_sensitivitas": (
+            synthetic.labour_units,
+            lambda d: hitung_sensitivitas(d, grid_bobot(0.25), grid_target(TARGETS, (0.5, 1.0, 2.0))),
+            0,
+        ),
+        "extract_partial_inputs": (lambda n: synthetic.inputs(n), extract_partial_inputs, 0),
+        "productivity_metrics": (
+            lambda n: (synthetic.products(half(n)), synthetic.inputs(half(n))),
+            lambda d: productivity_metrics(*d, use_standard_hour_output=True),
+            0,
+        ),
+        "kaizen_compare": (
+            lambda n: (synthetic.products(n // 4 or 1), synthetic.inputs(n // 4 or 1),
+                       synthetic.products(n // 4 or 1, seed=1), synthetic.inputs(n // 4 or 1, seed=1)),
+            lambda d: kaizen_compare(*d, SETTINGS),
+            0,
+        ),
+        "scenario_metrics": (
+            lambda n: synthetic.scenarios(n, n_scenarios=min(1_000, max(n // 100, 1))),
+            lambda d: scenario_metrics(*d, SETTINGS),
+            0,
+        ),
+        "national_aggregate": (synthetic.national_dataset, lambda d: national_aggregate(d, SETTINGS), 0),
+        "national_aggregate_company_period": (
+            synthetic.national_dataset,
+            lambda d: national_aggregate(d, SETTINGS, by=["company", "period"]),
+            0,
+        ),
+        "sample_cube_10pct": (
+            synthetic.national_dataset,
+            lambda d: sample_cube(d, 0.1).estimate(SETTINGS, by=["period"]),
+            0,
+        ),
+        "screen_national": (synthetic.national_dataset, lambda d: screen(d, "national"), 0),
+        "national_timeseries_company": (
+            synthetic.national_dataset,
+            lambda d: national_timeseries(d, SETTINGS, entity=["company"]),
+            0,
+        ),
+    }
+
+
+def measure(run: Callable[[object], object], data, rows: int, repeat: int = 3) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(data)
+        times.append(time.perf_counter() - start)
+    # Separate traced run: tracemalloc slows allocation-heavy code, so it is not timed
+    tracemalloc.start()
+    run(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return {
+        "rows": rows,
+        "wall_s": best,
+        "wall_s_median": float(np.median(times)),
+        "rows_per_s": rows / best if best > 0 else float("inf"),
+        "peak_mem_mb": peak / 1e6,
+    }
+
+
+def run_benchmarks(sizes: List[int], cases: Optional[List[str]] = None, repeat: int = 3,
+                   scalar_max: int = SCALAR_MAX_ROWS, log: Optional[Callable[[str], None]] = None) -> Dict:
+    all_cases = _cases(scalar_max)
+    selected = cases or list(all_cases)
+    unknown = [c for c in selected if c not in all_cases]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {unknown} (choose from {list(all_cases)})")
+
+    results = []
+    for name in selected:
+        setup, run, max_rows = all_cases[name]
+        for n in sizes:
+            if max_rows and n > max_rows:
+                continue
+            data = setup(n)
+            r = {"case": name, **measure(run, data, n, repeat)}
+            results.append(r)
+            if log:
+                log(f"{name:<36} {n:>12,} rows  {r['wall_s']:>9.4f}s  {r['rows_per_s']:>14,.0f} rows/s  "
+                    f"{r['peak_mem_mb']:>9.1f} MB")
+            del data
+    return {
+        "version": __version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2) -> List[Dict]:
+    """
+    Compare wall times per (case, rows). A result is a regression when it is slower than
+    the baseline by more than `threshold` (0.2 = 20 %).
+    """
+    base = {(r["case"], r["rows"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        b = base.get((r["case"], r["rows"]))
+        if b is None:
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] > 0 else float("inf")
+        rows.append({
+            "case": r["case"], "rows": r["rows"],
+            "baseline_s": b["wall_s"], "current_s": r["wall_s"], "ratio": ratio,
+            "mem_ratio": r["peak_mem_mb"] / b["peak_mem_mb"] if b["peak_mem_mb"] > 0 else float("nan"),
+            "regression": ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+def save(result: Dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,390 @@
+"""
+Batch runner for nightly jobs, without Streamlit.
+
+    python -m productivity national --input national.parquet --out metrics.parquet --workers 8
+    python -m productivity ingest --input national.parquet --store stores/national
+    python -m productivity national --store stores/national --from 2020Q1 --to 2021Q4 --out metrics.parquet
+    python -m productivity national --input national.parquet --deflators deflators.csv --out real.parquet
+    python -m productivity national --store stores/national --sample 0.05 --out quick.parquet
+    python -m productivity national --store stores/national --screen --z-max 4 --out screened.parquet
+    python -m productivity trends --input national.parquet --entity company --window 4 --out trends.parquet
+    python -m productivity scenarios --products plans.csv --inputs inputs.csv --baseline S0 --out compare.parquet
+    python -m productivity multi-unit --input units.csv --out hasil.parquet --weights 40 30 30
+    python -m productivity screen --input national.parquet --kind national --out clean.parquet --quarantine bad.csv
+    python -m productivity serve --address 127.0.0.1:8765 --workers 4 --per-user 2
+    python -m productivity loadtest --sessions 30 --distinct 3 --rows 1e6 [--address 127.0.0.1:8765]
+    python -m productivity bench --sizes 1e3 1e5 1e6 --out bench.json [--compare baseline.json]
+
+Input/output formats follow the file extension (.csv, .parquet, .feather/.arrow).
+pandas is only imported once a command actually runs.
+"""
+import argparse
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+def _settings(args: argparse.Namespace) -> Dict:
+    return {
+        "use_price_output": not args.quantity_output,
+        "use_standard_hour_output": args.std_hours,
+        "price_deflator": None if args.price_deflator in (0, 1) else args.price_deflator,
+        "input_deflator": None if args.input_deflator in (0, 1) else args.input_deflator,
+    }
+
+
+def _write(df, path: str) -> None:
+    from .tabular_io import table_format, write_table
+
+    write_table(df, path, table_format(path))
+
+
+def _national_settings(args: argparse.Namespace) -> Dict:
+    settings = _settings(args)
+    if args.deflators:
+        from .schema import prepare_deflators
+        from .tabular_io import read_table
+
+        settings["deflators"] = prepare_deflators(read_table(args.deflators))
+    return settings
+
+
+def _write_batch(batch, path: str) -> None:
+    # Parquet/Feather straight from the batch's Arrow view, without a pandas copy
+    from .tabular_io import _require_pyarrow, table_format, write_table
+
+    fmt = table_format(path)
+    if fmt == "csv":
+        write_table(batch.to_pandas(), path, fmt)
+        return
+    _require_pyarrow()
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    (pq.write_table if fmt == "parquet" else feather.write_feather)(batch.to_arrow(), path)
+
+
+def _screened(df, kind: str, args: argparse.Namespace):
+    # Rows flagged by quality.screen are left out (and written to --quarantine when given)
+    from .quality import screen
+
+    screening = screen(df, kind, z_max=args.z_max)
+    for r in screening.report().itertuples(index=False):
+        print(f"{r.check:<14} {r.column:<20} {r.rows:>10,} rows ({r.share_pct:.2f}%)  e.g. {r.examples}", file=sys.stderr)
+    if args.quarantine:
+        _write(screening.quarantined(df), args.quarantine)
+    print(f"{screening.n_flagged:,} of {len(df):,} rows quarantined", file=sys.stderr)
+    return screening.passed(df)
+
+
+def _run_national(args: argparse.Namespace) -> None:
+    settings = _national_settings(args)
+    if args.sample is not None:
+        if args.screen:
+            raise ValueError("--sample and --screen cannot be combined")
+        from .sampling import sample_cube
+
+        if args.store:
+            from .national_store import NationalStore
+
+            period_range = None if args.start is None and args.end is None else (args.start, args.end)
+            sample = sample_cube(NationalStore(args.store), args.sample, seed=args.seed, workers=args.workers,
+                                 periods=args.periods, period_range=period_range, companies=args.companies)
+        else:
+            if args.periods or args.companies or args.start or args.end:
+                raise ValueError("--periods/--companies/--from/--to need an ingested --store")
+            from .tabular_io import read_table
+
+            sample = sample_cube(read_table(args.input), args.sample, seed=args.seed, workers=args.workers)
+        result = sample.estimate(settings, by=args.by)
+    elif args.screen and args.store:
+        if args.quarantine:
+            raise ValueError("--quarantine needs --input (or write the flagged rows with the screen command)")
+        from .national_store import NationalStore, national_aggregate_store
+        from .quality import quarantine_store, screen_store
+
+        store = NationalStore(args.store)
+        for r in screen_store(store, args.z_max).itertuples(index=False):
+            print(f"{r.check:<14} {r.column:<20} {r.rows:>10,} rows ({r.share_pct:.2f}%)  e.g. {r.examples}", file=sys.stderr)
+        passed = quarantine_store(store, args.z_max)
+        print(f"{store.n_rows - passed.n_rows:,} of {store.n_rows:,} rows quarantined", file=sys.stderr)
+        period_range = None if args.start is None and args.end is None else (args.start, args.end)
+        result = national_aggregate_store(passed, settings, by=args.by, workers=args.workers,
+                                          chunksize=args.chunksize, periods=args.periods,
+                                          period_range=period_range, companies=args.companies)
+    elif args.screen:
+        from .national import national_aggregate
+        from .tabular_io import read_table
+
+        dataset = _screened(read_table(args.input), "national", args)
+        result = national_aggregate(dataset, settings, by=args.by, workers=args.workers)
+    elif args.store:
+        from .national_store import NationalStore, national_aggregate_store
+
+        period_range = None if args.start is None and args.end is None else (args.start, args.end)
+        result = national_aggregate_store(NationalStore(args.store), settings, by=args.by,
+                                          workers=args.workers, chunksize=args.chunksize, periods=args.periods,
+                                          period_range=period_range, companies=args.companies)
+    else:
+        if args.periods or args.companies or args.start or args.end:
+            raise ValueError("--periods/--companies/--from/--to need an ingested --store")
+        from .national import national_aggregate_chunked
+
+        result = national_aggregate_chunked(args.input, settings, by=args.by,
+                                            chunksize=args.chunksize, workers=args.workers)
+    _write(result, args.out)
+    print(f"{len(result):,} groups written to {args.out}", file=sys.stderr)
+
+
+def _run_trends(args: argparse.Namespace) -> None:
+    from .tabular_io import read_table
+    from .timeseries import national_timeseries
+
+    result = national_timeseries(read_table(args.input), _national_settings(args), entity=args.entity,
+                                 window=args.window, workers=args.workers)
+    _write(result, args.out)
+    print(f"{len(result):,} entity-periods written to {args.out}", file=sys.stderr)
+
+
+def _run_ingest(args: argparse.Namespace) -> None:
+    from .national_store import ingest
+
+    store = ingest(args.input, args.store, chunksize=args.chunksize)
+    print(f"{store.n_rows:,} rows, {len(store.periods):,} periods, {len(store.companies):,} companies "
+          f"indexed in {args.store}", file=sys.stderr)
+
+
+def _run_scenarios(args: argparse.Namespace) -> None:
+    from .metrics import scenario_compare, scenario_metrics
+    from .tabular_io import read_table
+
+    metrics = scenario_metrics(read_table(args.products), read_table(args.inputs), _settings(args),
+                               scenario_col=args.scenario_col)
+    # IDs read from CSV may be numbers; match the command-line baseline by its text
+    ids = {str(s): s for s in metrics.index}
+    if args.baseline is not None and args.baseline not in ids:
+        raise ValueError(f"Unknown baseline scenario: {args.baseline!r}")
+    baseline = metrics.index[0] if args.baseline is None else ids[args.baseline]
+    result = scenario_compare(metrics, baseline)
+    result.columns = [f"{part}_{metric}" for part, metric in result.columns]
+    _write(result.reset_index(), args.out)
+    print(f"{len(result):,} scenarios compared with {baseline!r}, written to {args.out}", file=sys.stderr)
+
+
+def _run_screen(args: argparse.Namespace) -> None:
+    from .tabular_io import read_table
+
+    clean = _screened(read_table(args.input), args.kind, args)
+    if args.out:
+        _write(clean, args.out)
+        print(f"{len(clean):,} clean rows written to {args.out}", file=sys.stderr)
+
+
+def _add_screen_options(p: argparse.ArgumentParser, flag: bool = True) -> None:
+    if flag:
+        p.add_argument("--screen", action="store_true", help="Leave out rows flagged by the data-quality screen")
+    p.add_argument("--quarantine", help="Write the flagged rows (with an issues column) to this file")
+    p.add_argument("--z-max", type=float, default=3.5, help="Robust z-score above which a price/cost is an outlier")
+
+
+def _add_output_settings(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--quantity-output", action="store_true",
+                   help="Aggregate output by quantity instead of value (quantity × price)")
+    p.add_argument("--std-hours", action="store_true", help="Also compute output in standard hours")
+    p.add_argument("--price-deflator", type=float, default=1.0)
+    p.add_argument("--input-deflator", type=float, default=1.0)
+
+
+def _run_multi_unit(args: argparse.Namespace) -> None:
+    from .labour import hitung_batch, hitung_batch_compact
+    from .tabular_io import read_table
+
+    keys = ["unit", "period"] if args.compact else ["unit"]
+    df = read_table(args.input, columns=[*keys, "output", "workers", "hours", "labour_cost"])
+    missing = [c for c in ["unit", "output", "workers", "labour_cost"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Input missing required columns: {missing}")
+    if args.screen:
+        df = _screened(df, "units", args)
+    weight_sum = sum(args.weights)
+    weights = tuple(w / weight_sum for w in args.weights) if weight_sum else (0, 0, 0)
+    if args.compact:
+        result = hitung_batch_compact(df, weights, tuple(args.targets))
+        _write_batch(result, args.out)
+    else:
+        result = hitung_batch(df, weights, tuple(args.targets))
+        _write(result, args.out)
+    print(f"{len(result):,} units written to {args.out}", file=sys.stderr)
+
+
+def _run_serve(args: argparse.Namespace) -> None:
+    from .jobs import JobRunner
+    from .serving import serve
+
+    print(f"Compute service on {args.address}: {args.workers} job threads, "
+          f"{args.per_user or 'unlimited'} concurrent jobs per user", file=sys.stderr)
+    serve(args.address, JobRunner(max_workers=args.workers, max_per_user=args.per_user or None))
+
+
+def _run_loadtest(args: argparse.Namespace) -> None:
+    import json
+
+    from .jobs import JobRunner
+    from .loadtest import prepare_store, run_load_test
+    from .serving import ComputeClient
+
+    log = lambda line: print(line, file=sys.stderr)  # noqa: E731
+    if args.store:
+        from .national_store import NationalStore
+
+        store = NationalStore(args.store)
+    else:
+        store = prepare_store(int(float(args.rows)))
+        log(f"{store.n_rows:,} synthetic rows ingested into {store.directory}")
+    if args.address:
+        runner = ComputeClient(args.address)
+    else:
+        runner = JobRunner(max_workers=args.job_workers, max_per_user=args.per_user or None,
+                           max_finished=max(64, args.sessions * args.requests))
+    report = run_load_test(runner, store, sessions=args.sessions, requests=args.requests, distinct=args.distinct,
+                           users=args.users, workers=args.workers, log=log)
+    log(f"{report['requests']:,} requests from {report['sessions']} sessions ({report['users']} users) → "
+        f"{report['jobs_run']} jobs, {report['failed']} failed, {report['requests_per_s']:.2f} req/s")
+    log(f"latency p50 {report['p50_s']:.3f}s  p95 {report['p95_s']:.3f}s  p99 {report['p99_s']:.3f}s  "
+        f"max {report['max_s']:.3f}s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def _run_bench(args: argparse.Namespace) -> None:
+    from . import benchmark
+
+    log = lambda line: print(line, file=sys.stderr)  # noqa: E731
+    result = benchmark.run_benchmarks([int(float(n)) for n in args.sizes], cases=args.cases,
+                                      repeat=args.repeat, scalar_max=args.scalar_max, log=log)
+    if args.out:
+        benchmark.save(result, args.out)
+        log(f"Results saved to {args.out}")
+    if args.compare:
+        rows = benchmark.compare(result, benchmark.load(args.compare), args.threshold)
+        for r in rows:
+            flag = "REGRESSION" if r["regression"] else ""
+            log(f"{r['case']:<36} {r['rows']:>12,} rows  {r['baseline_s']:.4f}s -> {r['current_s']:.4f}s  "
+                f"x{r['ratio']:.2f}  mem x{r['mem_ratio']:.2f}  {flag}")
+        regressions = [r for r in rows if r["regression"]]
+        if regressions:
+            raise ValueError(f"{len(regressions)} benchmark regression(s) over {args.threshold:.0%}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m productivity", description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    nat = sub.add_parser("national", help="National aggregation of a long-form dataset")
+    source = nat.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Long-form dataset (.csv/.parquet/.feather)")
+    source.add_argument("--store", help="Store directory created by the ingest command")
+    nat.add_argument("--out", required=True, help="Output file for the metrics table")
+    nat.add_argument("--by", nargs="+", default=["period"], help="Grouping keys (default: period)")
+    nat.add_argument("--chunksize", type=int, default=250_000, help="Rows per chunk")
+    nat.add_argument("--workers", type=int, default=1, help="Processes used for per-chunk sums")
+    _add_output_settings(nat)
+    nat.add_argument("--deflators", help="Deflator series: period, optional sector, price_deflator, input_deflator")
+    nat.add_argument("--periods", nargs="+", help="Only these periods (--store only)")
+    nat.add_argument("--from", dest="start", help="First period of a range, inclusive (--store only)")
+    nat.add_argument("--to", dest="end", help="Last period of a range, inclusive (--store only)")
+    nat.add_argument("--companies", nargs="+", help="Only these companies (--store only)")
+    _add_screen_options(nat)
+    nat.add_argument("--sample", type=float,
+                     help="Estimate from this fraction of companies, with 95%% confidence intervals (e.g. 0.05)")
+    nat.add_argument("--seed", type=int, default=0, help="Company sample seed (--sample)")
+    nat.set_defaults(func=_run_national)
+
+    tr = sub.add_parser("trends", help="Growth rates and chained TFP indexes per entity and period")
+    tr.add_argument("--input", required=True, help="Long-form dataset (.csv/.parquet/.feather)")
+    tr.add_argument("--out", required=True, help="Output file for the time-series table")
+    tr.add_argument("--entity", nargs="*", default=["company"],
+                    help="Entity keys, one series each (default: company; none = the nation)")
+    tr.add_argument("--window", type=int, default=4, help="Periods in the TFP growth moving average")
+    tr.add_argument("--workers", type=int, default=1, help="Processes used for the base sums")
+    _add_output_settings(tr)
+    tr.add_argument("--deflators", help="Deflator series: period, optional sector, price_deflator, input_deflator")
+    tr.set_defaults(func=_run_trends)
+
+    ing = sub.add_parser("ingest", help="Build an indexed, memory-mapped store from a national dataset")
+    ing.add_argument("--input", required=True, help="Long-form dataset (.csv/.parquet/.feather)")
+    ing.add_argument("--store", required=True, help="Directory to create")
+    ing.add_argument("--chunksize", type=int, default=250_000, help="Rows per chunk")
+    ing.set_defaults(func=_run_ingest)
+
+    sc = sub.add_parser("scenarios", help="Kaizen metrics for many scenarios against a baseline")
+    sc.add_argument("--products", required=True, help="Stacked products table with a scenario column")
+    sc.add_argument("--inputs", required=True, help="Stacked inputs table with a scenario column")
+    sc.add_argument("--out", required=True, help="Output file: value/change_abs/change_pct per metric")
+    sc.add_argument("--scenario-col", default="scenario", help="Scenario ID column (default: scenario)")
+    sc.add_argument("--baseline", help="Baseline scenario ID (default: the first, sorted)")
+    _add_output_settings(sc)
+    sc.set_defaults(func=_run_scenarios)
+
+    mu = sub.add_parser("multi-unit", help="Labour productivity per unit (sample1 CSV mode)")
+    mu.add_argument("--input", required=True, help="Table with unit, output, workers, hours, labour_cost")
+    mu.add_argument("--out", required=True)
+    mu.add_argument("--weights", nargs=3, type=float, default=[40, 30, 30], metavar=("LP", "HP", "WP"))
+    mu.add_argument("--targets", nargs=3, type=float, default=[0, 0, 0], metavar=("LP", "HP", "WP"))
+    mu.add_argument("--compact", action="store_true",
+                    help="Write only the unit/period keys (dictionary-encoded) and the result columns")
+    _add_screen_options(mu)
+    mu.set_defaults(func=_run_multi_unit)
+
+    scr = sub.add_parser("screen", help="Flag and quarantine bad rows (unparsable, negative, outliers)")
+    scr.add_argument("--input", required=True, help="Table to screen (.csv/.parquet/.feather)")
+    scr.add_argument("--kind", required=True, choices=["products", "inputs", "national", "units"])
+    scr.add_argument("--out", help="Write the rows that passed to this file")
+    _add_screen_options(scr, flag=False)
+    scr.set_defaults(func=_run_screen)
+
+    srv = sub.add_parser("serve", help="Shared compute service for Streamlit front ends (PRODUCTIVITY_COMPUTE_ADDRESS)")
+    srv.add_argument("--address", default="127.0.0.1:8765", help="host:port to listen on (default: 127.0.0.1:8765)")
+    srv.add_argument("--workers", type=int, default=4, help="Jobs running at once")
+    srv.add_argument("--per-user", type=int, default=2, help="Jobs running at once per user (0 = no limit)")
+    srv.set_defaults(func=_run_serve)
+
+    lt = sub.add_parser("loadtest", help="Simulate concurrent sessions requesting national cubes")
+    lt.add_argument("--sessions", type=int, default=30, help="Concurrent simulated sessions")
+    lt.add_argument("--requests", type=int, default=1, help="Requests per session, sent one after another")
+    lt.add_argument("--distinct", type=int, default=3, help="Distinct requests (period windows) across sessions")
+    lt.add_argument("--users", type=int, help="Users the sessions belong to (default: one per session)")
+    lt.add_argument("--rows", default="1e6", help="Synthetic national rows (ignored with --store)")
+    lt.add_argument("--store", help="Existing store directory instead of synthetic data")
+    lt.add_argument("--workers", type=int, default=1, help="Processes per cube build (shared pool)")
+    lt.add_argument("--address", help="Compute service to test (default: an in-process job runner)")
+    lt.add_argument("--job-workers", type=int, default=2, help="Job threads of the in-process runner")
+    lt.add_argument("--per-user", type=int, default=2, help="Per-user job limit of the in-process runner")
+    lt.add_argument("--out", help="Write the report as JSON")
+    lt.set_defaults(func=_run_loadtest)
+
+    bench = sub.add_parser("bench", help="Benchmark the computation entry points on synthetic data")
+    bench.add_argument("--sizes", nargs="+", default=["1e3", "1e4", "1e5", "1e6"],
+                       help="Row counts, e.g. 1e3 1e5 1e7")
+    bench.add_argument("--cases", nargs="+", help="Subset of benchmark cases (default: all)")
+    bench.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is reported)")
+    bench.add_argument("--scalar-max", type=int, default=100_000,
+                       help="Largest size for the row-by-row scalar baseline")
+    bench.add_argument("--out", help="Write results as a JSON baseline")
+    bench.add_argument("--compare", help="Baseline JSON to compare against")
+    bench.add_argument("--threshold", type=float, default=0.2, help="Slowdown ratio flagged as regression")
+    bench.set_defaults(func=_run_bench)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    try:
+        args.func(args)
+    except (ValueError, KeyError, OSError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
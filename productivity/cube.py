@@ -0,0 +1,117 @@
+"""
+Rollup cube for national drill-down (company → sector → region → nation).
+
+The additive base sums (national_base_sums) are computed once at the finest grain, with
+one row per period × region × sector × company present in the data. Every coarser level
+is a groupby-sum of that cube, and its TFP/PP ratios come from
+national_metrics_from_sums, so a query never rescans raw rows.
+
+Rows with a missing key stay in the cube as a NaN group. They are dropped only from the
+levels that group by that key, as national_aggregate would drop them.
+
+A deflator series in the settings is applied to the finest-grain rows (which carry period
+and sector) before the rollup.
+
+    cube = build_cube(dataset)
+    cube.metrics(settings, by=["region"])                           # one row per region
+    cube.metrics(settings, by=["sector", "period"], region="R07")   # drill into a region
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+from .national import (deflate_sums, national_base_sums_chunked, national_base_sums_parallel,
+                       national_metrics_from_sums)
+
+# Coarse to fine; company is the finest grain
+CUBE_DIMENSIONS: List[str] = ["period", "region", "sector", "company"]
+# Index name of the single row of a rollup without grouping keys
+NATION = "nation"
+
+
+class NationalCube:
+    """Finest-grain national base sums, indexed by the cube dimensions."""
+
+    def __init__(self, sums: pd.DataFrame):
+        self.sums = sums
+
+    @property
+    def dimensions(self) -> List[str]:
+        return list(self.sums.index.names)
+
+    def values(self, dimension: str) -> List:
+        """Distinct non-missing values of one dimension, sorted."""
+        level = self.sums.index.get_level_values(dimension)
+        return sorted(v for v in level.unique() if not pd.isna(v))
+
+    @timed("national_cube.rollup")
+    def rollup(self, by: Sequence[str] = (), **filters) -> pd.DataFrame:
+        """
+        Base sums per combination of `by` (empty = the whole nation), over the cube rows
+        whose dimensions match `filters` (dimension=value or dimension=[values]).
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [d for d in [*by, *filters] if d not in self.dimensions]
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {unknown} (cube has {self.dimensions})")
+        sums = self.sums
+        if filters:
+            mask = np.ones(len(sums), dtype=bool)
+            for dim, values in filters.items():
+                values = [values] if isinstance(values, str) or not isinstance(values, Sequence) else list(values)
+                mask &= sums.index.get_level_values(dim).isin(values)
+            sums = sums[mask]
+            if sums.empty:
+                raise ValueError(f"No cube rows match {filters}")
+        if not by:
+            total = sums.sum().to_frame().T
+            total.index = pd.Index(["ALL"], name=NATION)
+            return total
+        return sums.groupby(level=by, sort=True, observed=True).sum()
+
+    def metrics(self, settings: Dict, by: Sequence[str] = (), **filters) -> pd.DataFrame:
+        """national_aggregate-style metrics at any level of the cube."""
+        return national_metrics_from_sums(self._deflated(settings).rollup(by, **filters), settings)
+
+    def timeseries(self, settings: Dict, entity: Sequence[str] = (), window: int = 4, **filters) -> pd.DataFrame:
+        """Growth and chained TFP indexes (productivity_timeseries) per entity (empty = the nation) and period."""
+        from .timeseries import productivity_timeseries
+
+        entity = [entity] if isinstance(entity, str) else list(entity)
+        sums = self._deflated(settings).rollup([*entity, "period"], **filters)
+        return productivity_timeseries(sums, settings, window)
+
+    def _deflated(self, settings: Dict) -> "NationalCube":
+        return self if settings.get("deflators") is None else NationalCube(deflate_sums(self.sums, settings))
+
+
+def _dimensions(columns, dimensions: Sequence[str]) -> List[str]:
+    # period is always available: a dataset without it is one "ALL" period
+    return [d for d in dimensions if d in columns or d == "period"]
+
+
+@timed("national_cube.build")
+def build_cube(dataset: pd.DataFrame, dimensions: Sequence[str] = CUBE_DIMENSIONS, workers: int = 1) -> NationalCube:
+    """One pass over an in-memory dataset (process pool with workers > 1)."""
+    dims = _dimensions(dataset.columns, dimensions)
+    return NationalCube(national_base_sums_parallel(dataset, dims, workers, dropna=False))
+
+
+def build_cube_chunked(source, dimensions: Sequence[str] = CUBE_DIMENSIONS, chunksize: int = 250_000,
+                       workers: int = 1) -> NationalCube:
+    """One chunked pass over a CSV/Parquet/Feather path or uploaded file."""
+    from .tabular_io import table_columns
+
+    dims = _dimensions(table_columns(source), dimensions)
+    return NationalCube(national_base_sums_chunked(source, dims, chunksize, workers, dropna=False))
+
+
+def build_cube_from_store(store, dimensions: Sequence[str] = CUBE_DIMENSIONS, workers: int = 1,
+                          **filters) -> NationalCube:
+    """One pass over the rows of a NationalStore matching `filters` (see NationalStore.row_ranges)."""
+    from .national_store import national_base_sums_store
+
+    dims = _dimensions(store.columns, dimensions)
+    return NationalCube(national_base_sums_store(store, dims, workers, dropna=False, **filters))
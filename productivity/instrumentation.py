@@ -0,0 +1,165 @@
+"""
+Lightweight timing spans for the computation and I/O hot paths.
+
+Every span records wall time, row count and resident-memory delta. Spans go to
+- the recorder started for the current run (start_recording), e.g. one Streamlit rerun,
+- process-wide totals exported as Prometheus text (prometheus_text),
+- the "productivity.timing" logger at DEBUG level, as one JSON object per span.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("productivity.timing")
+
+_recorder: contextvars.ContextVar = contextvars.ContextVar("productivity_recorder", default=None)
+_depth: contextvars.ContextVar = contextvars.ContextVar("productivity_span_depth", default=0)
+
+_totals_lock = threading.Lock()
+_totals: Dict[str, Dict[str, float]] = {}
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Span:
+    __slots__ = ("name", "rows", "depth", "start", "wall_s", "mem_delta_bytes")
+
+    def __init__(self, name: str, rows: Optional[int], depth: int):
+        self.name = name
+        self.rows = rows
+        self.depth = depth
+        self.start = time.time()
+        self.wall_s = 0.0
+        self.mem_delta_bytes: Optional[int] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "span": self.name,
+            "rows": self.rows,
+            "depth": self.depth,
+            "start": self.start,
+            "wall_ms": self.wall_s * 1000.0,
+            "mem_delta_mb": None if self.mem_delta_bytes is None else self.mem_delta_bytes / 1e6,
+            "rows_per_s": (self.rows / self.wall_s) if self.rows and self.wall_s > 0 else None,
+        }
+
+
+class Recorder:
+    """Spans collected during one run, in completion order."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def records(self) -> List[Dict]:
+        return [s.as_dict() for s in self.spans]
+
+    def to_json_lines(self) -> str:
+        return "\n".join(json.dumps(r) for r in self.records())
+
+    def total_ms(self) -> float:
+        return sum(s.wall_s for s in self.spans if s.depth == 0) * 1000.0
+
+
+def start_recording() -> Recorder:
+    recorder = Recorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop_recording() -> None:
+    _recorder.set(None)
+
+
+@contextmanager
+def span(name: str, rows: Optional[int] = None):
+    """Time a block; set `.rows` on the yielded span if the count is only known inside."""
+    depth = _depth.get()
+    s = Span(name, rows, depth)
+    token = _depth.set(depth + 1)
+    mem_before = rss_bytes()
+    t0 = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.wall_s = time.perf_counter() - t0
+        mem_after = rss_bytes()
+        if mem_before is not None and mem_after is not None:
+            s.mem_delta_bytes = mem_after - mem_before
+        _depth.reset(token)
+        _finish(s)
+
+
+def _finish(s: Span) -> None:
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.spans.append(s)
+    with _totals_lock:
+        t = _totals.setdefault(s.name, {"count": 0, "seconds": 0.0, "rows": 0})
+        t["count"] += 1
+        t["seconds"] += s.wall_s
+        t["rows"] += s.rows or 0
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps(s.as_dict()))
+
+
+def _rows_of(obj) -> Optional[int]:
+    shape = getattr(obj, "shape", None)
+    return int(shape[0]) if shape else None
+
+
+def timed(name: str):
+    """Decorator: run the function inside a span. Rows come from the first argument's
+    shape, or from the result's shape when the input has none (e.g. file readers)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, _rows_of(args[0]) if args else None) as s:
+                result = fn(*args, **kwargs)
+                if s.rows is None:
+                    s.rows = _rows_of(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def prometheus_text(prefix: str = "productivity") -> str:
+    """Process-wide span totals in the Prometheus text exposition format."""
+    with _totals_lock:
+        totals = {k: dict(v) for k, v in _totals.items()}
+    lines = [
+        f"# HELP {prefix}_span_seconds Wall time spent in instrumented spans.",
+        f"# TYPE {prefix}_span_seconds summary",
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {t["seconds"]:.6f}')
+        lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {t["count"]}')
+    lines += [
+        f"# HELP {prefix}_span_rows_total Rows processed by instrumented spans.",
+        f"# TYPE {prefix}_span_rows_total counter",
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'{prefix}_span_rows_total{{span="{name}"}} {t["rows"]}')
+    return "\n".join(lines) + "\n"
+
+
+def reset_totals() -> None:
+    with _totals_lock:
+        _totals.clear()
@@ -0,0 +1,251 @@
+"""
+Background jobs for long computations, on a bounded thread pool.
+
+submit() returns a job id right away. The job runs in a worker thread, so a Streamlit
+rerun (any widget touch) no longer throws the work away. Jobs are deduplicated by key:
+while a job for the same key is queued, running or done, submitting again returns that
+job instead of starting another. The most recent finished jobs keep their results.
+
+Jobs may carry a user. With max_per_user, at most that many of a user's jobs run at
+once; the rest wait, queued, until one of that user's jobs finishes. A request that is
+deduplicated onto another user's job does not count against the limit.
+
+Computation loops call report_progress(). Inside a job, this updates the job's progress
+and raises JobCancelled once cancellation has been requested. Outside a job it does
+nothing, so the same code runs unchanged in the CLI and in tests.
+
+process_pool() hands out one process pool for the whole process, so concurrent jobs share
+worker processes instead of each starting its own. It grows to the largest worker count
+asked for and is shut down at exit.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("productivity.jobs")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("productivity_job", default=None)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ("id", "name", "key", "user", "status", "progress", "rows_done", "result", "error",
+                 "submitted", "started", "finished", "_cancel")
+
+    def __init__(self, job_id: str, name: str, key: Optional[str], user: Optional[str] = None):
+        self.id = job_id
+        self.name = name
+        self.key = key
+        self.user = user
+        self.status = QUEUED
+        # Fraction done (0..1) when the total is known, else None; rows_done counts input rows
+        self.progress: Optional[float] = None
+        self.rows_done = 0
+        self.result = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED
+
+    def elapsed_s(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def __getstate__(self):
+        # Snapshots sent to another process (see serving) leave the cancel event behind
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_cancel"}
+
+    def __setstate__(self, state) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._cancel = threading.Event()
+
+
+def report_progress(done: int, total: Optional[int] = None) -> None:
+    """Record `done` of `total` rows for the current job; raise JobCancelled if it was cancelled."""
+    job = _current_job.get()
+    if job is None:
+        return
+    if job._cancel.is_set():
+        raise JobCancelled(job.id)
+    job.rows_done = done
+    if total:
+        job.progress = min(done / total, 1.0)
+
+
+_process_pool_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers = 0
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool of at least `workers` processes shared by every caller in this process.
+    A larger request replaces it with a bigger one; the old pool finishes the work already
+    submitted to it and then exits, so callers fetch the pool for each submit.
+    """
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or workers > _process_pool_workers:
+            old = _process_pool
+            _process_pool, _process_pool_workers = ProcessPoolExecutor(max_workers=workers), workers
+            if old is not None:
+                old.shutdown(wait=False)
+        return _process_pool
+
+
+@atexit.register
+def shutdown_process_pool(pool: Optional[ProcessPoolExecutor] = None) -> None:
+    """Shut down the shared pool (only if it is still `pool`, when given); the next process_pool() starts afresh."""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or (pool is not None and pool is not _process_pool):
+            return
+        old, _process_pool, _process_pool_workers = _process_pool, None, 0
+    old.shutdown(wait=False, cancel_futures=True)
+
+
+class JobRunner:
+    def __init__(self, max_workers: int = 2, max_finished: int = 64, max_per_user: Optional[int] = None):
+        self.max_finished = max_finished
+        self.max_per_user = max_per_user
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="productivity-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        # user -> jobs dispatched to the pool (queued there or running), and jobs held back by the limit
+        self._active: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "JobRunner":
+        """
+        Pool size from PRODUCTIVITY_JOB_WORKERS (default 2); concurrent jobs per user from
+        PRODUCTIVITY_JOBS_PER_USER (default 2, 0 = no limit).
+        """
+        per_user = int(os.environ.get("PRODUCTIVITY_JOBS_PER_USER", "2"))
+        return cls(max_workers=int(os.environ.get("PRODUCTIVITY_JOB_WORKERS", "2")), max_per_user=per_user or None)
+
+    def submit(self, name: str, fn: Callable, *args, key: Optional[str] = None, user: Optional[str] = None,
+               **kwargs) -> str:
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(key)) if key is not None else None
+            if existing is not None and existing.status not in (FAILED, CANCELLED):
+                return existing.id
+            job = Job(uuid.uuid4().hex[:12], name, key, user)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._trim()
+            if user is not None and self.max_per_user and self._active.get(user, 0) >= self.max_per_user:
+                self._waiting.setdefault(user, deque()).append((job, fn, args, kwargs))
+                return job.id
+            if user is not None:
+                self._active[user] = self._active.get(user, 0) + 1
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; queued jobs never start, running ones stop at their next progress report."""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job._cancel.set()
+        with self._lock:
+            waiting = self._waiting.get(job.user, ())
+            held = [w for w in waiting if w[0] is job]
+            for w in held:
+                waiting.remove(w)
+        if held:
+            job.status, job.finished = CANCELLED, time.time()
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        """Jobs per status, and per user the jobs dispatched and held back by the per-user limit."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            users = {u: {"active": n, "waiting": len(self._waiting.get(u, ()))} for u, n in self._active.items() if n}
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for job in jobs:
+            counts[job.status] += 1
+        return {**counts, "users": users}
+
+    def shutdown(self, wait: bool = True) -> None:
+        for job in self.jobs():
+            job._cancel.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable, args, kwargs) -> None:
+        try:
+            self._execute(job, fn, args, kwargs)
+        finally:
+            self._release(job.user)
+
+    def _execute(self, job: Job, fn: Callable, args, kwargs) -> None:
+        if job._cancel.is_set():
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        token = _current_job.set(job)
+        try:
+            job.result = fn(*args, **kwargs)
+            job.progress = 1.0
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.name)
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+            _current_job.reset(token)
+
+    def _release(self, user: Optional[str]) -> None:
+        # A finished job frees its user's slot for the next job that user has waiting
+        if user is None:
+            return
+        with self._lock:
+            waiting = self._waiting.get(user)
+            if waiting:
+                self._pool.submit(self._run, *waiting.popleft())
+                return
+            self._active[user] -= 1
+            if not self._active[user]:
+                del self._active[user]
+                self._waiting.pop(user, None)
+
+    def _trim(self) -> None:
+        # Caller holds the lock; drop the oldest finished jobs (and their results) beyond the limit
+        finished = [j for j in self._jobs.values() if j.is_finished]
+        for job in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+            if job.key is not None and self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
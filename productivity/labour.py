@@ -0,0 +1,202 @@
+"""
+Indikator produktivitas tenaga kerja (output per pekerja, per jam kerja, per upah) dan
+indeks produktivitas 0–100 berbobot terhadap target – versi skalar dan versi kolom.
+"""
+import numpy as np
+
+from .batch import MetricBatch
+from .instrumentation import timed
+
+
+def hitung_indikator(output, workers, hours, labour_cost):
+    lp = output / workers if workers > 0 else np.nan
+    hp = output / hours if hours > 0 else np.nan
+    wp = output / labour_cost if labour_cost > 0 else np.nan
+    return lp, hp, wp
+
+
+def hitung_skor_indikator(value, target):
+    if target is None or target == 0 or np.isnan(value):
+        return np.nan
+    return min(100.0, (value / target) * 100.0)
+
+
+def hitung_indeks(lp, hp, wp, weights, targets):
+    w_lp, w_hp, w_wp = weights
+    t_lp, t_hp, t_wp = targets
+    s_lp = hitung_skor_indikator(lp, t_lp)
+    s_hp = hitung_skor_indikator(hp, t_hp)
+    s_wp = hitung_skor_indikator(wp, t_wp)
+
+    skor_list, bobot_list = [], []
+    if not np.isnan(s_lp) and w_lp > 0: skor_list.append(s_lp); bobot_list.append(w_lp)
+    if not np.isnan(s_hp) and w_hp > 0: skor_list.append(s_hp); bobot_list.append(w_hp)
+    if not np.isnan(s_wp) and w_wp > 0: skor_list.append(s_wp); bobot_list.append(w_wp)
+    if len(skor_list) == 0: return np.nan
+
+    bobot_arr = np.array(bobot_list) / np.sum(bobot_list)
+    return float(np.sum(bobot_arr * np.array(skor_list)))
+
+
+# Versi kolom (vectorized) dari fungsi di atas – aturan NaN & normalisasi bobot sama persis
+def hitung_indikator_batch(output, workers, hours, labour_cost):
+    output = np.asarray(output, dtype=float)
+    workers = np.asarray(workers, dtype=float)
+    hours = np.asarray(hours, dtype=float)
+    labour_cost = np.asarray(labour_cost, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lp = np.where(workers > 0, output / workers, np.nan)
+        hp = np.where(hours > 0, output / hours, np.nan)
+        wp = np.where(labour_cost > 0, output / labour_cost, np.nan)
+    return lp, hp, wp
+
+
+def hitung_skor_indikator_batch(values, target):
+    values = np.asarray(values, dtype=float)
+    if target is None or target == 0:
+        return np.full(values.shape, np.nan)
+    return np.minimum(100.0, (values / target) * 100.0)
+
+
+def hitung_indeks_batch(lp, hp, wp, weights, targets):
+    skor = [hitung_skor_indikator_batch(v, t) for v, t in zip((lp, hp, wp), targets)]
+    # Indikator hanya dihitung jika skor tersedia dan bobot > 0 (sama dengan hitung_indeks)
+    bobot = [np.where(~np.isnan(s) & (w > 0), float(w), 0.0) for s, w in zip(skor, weights)]
+    bobot_total = bobot[0] + bobot[1] + bobot[2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        indeks = np.zeros(bobot_total.shape)
+        for s, b in zip(skor, bobot):
+            indeks = indeks + np.where(b > 0, (b / bobot_total) * s, 0.0)
+    return np.where(bobot_total > 0, indeks, np.nan)
+
+
+def _kolom_hasil(df, weights, targets):
+    hours = df["hours"] if "hours" in df.columns else np.nan
+    lp, hp, wp = hitung_indikator_batch(df["output"], df["workers"], hours, df["labour_cost"])
+    return {"prod_per_worker": lp, "prod_per_hour": hp, "prod_per_wage": wp,
+            "productivity_index": hitung_indeks_batch(lp, hp, wp, weights, targets)}
+
+
+@timed("hitung_batch")
+def hitung_batch(df, weights, targets):
+    hasil = df.copy()
+    for nama, kolom in _kolom_hasil(df, weights, targets).items():
+        hasil[nama] = kolom
+    return hasil
+
+
+@timed("hitung_batch_compact")
+def hitung_batch_compact(df, weights, targets, keys=("unit", "period")):
+    """
+    Hasil hitung_batch sebagai MetricBatch: kolom kunci (unit, period – yang ada) sebagai kode
+    integer, lalu hanya keempat kolom hasil (tanpa salinan kolom input).
+    """
+    hasil = MetricBatch(len(df))
+    for kunci in keys:
+        if kunci in df.columns:
+            hasil.set_key(kunci, df[kunci])
+    for nama, kolom in _kolom_hasil(df, weights, targets).items():
+        hasil.set_metric(nama, kolom)
+    return hasil
+
+
+# Analisis sensitivitas: indeks untuk banyak kombinasi bobot × target sekaligus
+def grid_bobot(langkah=0.1):
+    """Semua kombinasi (w_lp, w_hp, w_wp) kelipatan `langkah` dengan jumlah 1 – array (n, 3)."""
+    n = int(round(1 / langkah))
+    a, b = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+    keep = a + b <= n
+    return np.column_stack([a[keep], b[keep], n - a[keep] - b[keep]]) / n
+
+
+def grid_target(targets, faktor=(0.8, 0.9, 1.0, 1.1, 1.2)):
+    """Kombinasi target (t_lp, t_hp, t_wp) = target × faktor per indikator – array (n, 3)."""
+    faktor = np.asarray(faktor, dtype=float)
+    per_indikator = [np.asarray(t, dtype=float) * faktor for t in targets]
+    return np.stack(np.meshgrid(*per_indikator, indexing="ij"), axis=-1).reshape(-1, 3)
+
+
+def _indeks_grid(nilai, bobot, target):
+    # nilai (3, unit), bobot/target (kombinasi, 3) -> indeks (kombinasi, unit); aturan hitung_indeks_batch.
+    # Skor hanya NaN jika nilai NaN atau target 0, jadi bobot efektif = bobot × (target ≠ 0) ⊗ (nilai ada)
+    n_komb, n_unit = len(bobot), nilai.shape[1]
+    pembilang, bobot_total = np.zeros((n_komb, n_unit)), np.zeros((n_komb, n_unit))
+    skor = np.empty((n_komb, n_unit))
+    for k in range(3):
+        ada = ~np.isnan(nilai[k])
+        b = np.where((target[:, k] != 0) & (bobot[:, k] > 0), bobot[:, k], 0.0)
+        skala = 100.0 / np.where(target[:, k] != 0, target[:, k], 1.0)
+        # Nilai NaN diisi 0 -> skor 0, sehingga tidak menambah pembilang
+        np.multiply(skala[:, None], np.where(ada, nilai[k], 0.0)[None, :], out=skor)
+        np.minimum(skor, 100.0, out=skor)
+        skor *= b[:, None]
+        pembilang += skor
+        bobot_total += np.multiply.outer(b, ada)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(bobot_total > 0, pembilang / bobot_total, np.nan)
+
+
+def _peringkat(indeks):
+    # Peringkat per kombinasi (1 = indeks tertinggi); nilai sama -> peringkat sama, NaN tetap NaN.
+    # Dibulatkan dulu agar indeks yang hanya beda derau pembulatan float (urutan operasi) tetap seri
+    indeks = np.round(indeks, 9)
+    n_unit = indeks.shape[1]
+    urutan = np.argsort(-indeks, axis=1)
+    terurut = np.take_along_axis(indeks, urutan, axis=1)
+    posisi = np.broadcast_to(np.arange(n_unit), terurut.shape)
+    baru = np.ones(terurut.shape, dtype=bool)
+    baru[:, 1:] = terurut[:, 1:] != terurut[:, :-1]
+    awal = np.maximum.accumulate(np.where(baru, posisi, 0), axis=1) + 1.0
+    peringkat = np.empty(indeks.shape)
+    np.put_along_axis(peringkat, urutan, awal, axis=1)
+    peringkat[np.isnan(indeks)] = np.nan
+    return peringkat
+
+
+@timed("hitung_sensitivitas")
+def hitung_sensitivitas(df, bobot_grid, target_grid, maks_elemen=4_000_000):
+    """
+    Indeks (aturan hitung_indeks) untuk setiap unit × setiap kombinasi bobot_grid × target_grid,
+    diringkas per unit: min/maks/rata-rata/std indeks dan peringkat (terbaik, terburuk,
+    rata-rata, std). Kombinasi diproses per blok agar memori tetap di bawah `maks_elemen` nilai.
+    """
+    hours = df["hours"] if "hours" in df.columns else np.nan
+    nilai = np.vstack(np.broadcast_arrays(*hitung_indikator_batch(df["output"], df["workers"], hours,
+                                                                   df["labour_cost"])))
+    bobot_grid = np.asarray(bobot_grid, dtype=float).reshape(-1, 3)
+    target_grid = np.asarray(target_grid, dtype=float).reshape(-1, 3)
+    # Semua pasangan bobot × target
+    bobot = np.repeat(bobot_grid, len(target_grid), axis=0)
+    target = np.tile(target_grid, (len(bobot_grid), 1))
+
+    n_unit = nilai.shape[1]
+    blok = max(1, maks_elemen // max(3 * n_unit, 1))
+    statistik = {k: np.zeros(n_unit) for k in ("n", "i_sum", "i_sq", "r_sum", "r_sq")}
+    i_min, r_min = np.full(n_unit, np.inf), np.full(n_unit, np.inf)
+    i_max, r_max = np.full(n_unit, -np.inf), np.full(n_unit, -np.inf)
+    for mulai in range(0, len(bobot), blok):
+        indeks = _indeks_grid(nilai, bobot[mulai:mulai + blok], target[mulai:mulai + blok])
+        peringkat = _peringkat(indeks)
+        ada = ~np.isnan(indeks)
+        statistik["n"] += ada.sum(axis=0)
+        statistik["i_sum"] += np.where(ada, indeks, 0.0).sum(axis=0)
+        statistik["i_sq"] += np.where(ada, indeks ** 2, 0.0).sum(axis=0)
+        statistik["r_sum"] += np.where(ada, peringkat, 0.0).sum(axis=0)
+        statistik["r_sq"] += np.where(ada, peringkat ** 2, 0.0).sum(axis=0)
+        i_min = np.minimum(i_min, np.min(indeks, axis=0, initial=np.inf, where=ada))
+        i_max = np.maximum(i_max, np.max(indeks, axis=0, initial=-np.inf, where=ada))
+        r_min = np.minimum(r_min, np.min(peringkat, axis=0, initial=np.inf, where=ada))
+        r_max = np.maximum(r_max, np.max(peringkat, axis=0, initial=-np.inf, where=ada))
+
+    n = statistik["n"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        i_mean, r_mean = statistik["i_sum"] / n, statistik["r_sum"] / n
+        i_std = np.sqrt(np.maximum(statistik["i_sq"] / n - i_mean ** 2, 0.0))
+        r_std = np.sqrt(np.maximum(statistik["r_sq"] / n - r_mean ** 2, 0.0))
+    kosong = n == 0
+    hasil = df[["unit"]].copy() if "unit" in df.columns else df.iloc[:, :0].copy()
+    hasil["n_scored"] = n.astype(int)
+    for nama, arr in (("index_min", i_min), ("index_max", i_max), ("index_mean", i_mean), ("index_std", i_std),
+                      ("rank_best", r_min), ("rank_worst", r_max), ("rank_mean", r_mean), ("rank_std", r_std)):
+        hasil[nama] = np.where(kosong, np.nan, arr)
+    return hasil
@@ -0,0 +1,112 @@
+"""
+Load test for the job runner or a compute service: N simulated sessions at once.
+
+Each session thread submits national cube requests as the apps do, with a user, a
+dedup key and run_task, and polls until its job finishes. The report gives latency
+percentiles (submit to finished, as a user waits for it), throughput, and how many
+jobs actually ran for the requests sent:
+
+    python -m productivity loadtest --sessions 30 --distinct 3 --rows 1e6
+    python -m productivity loadtest --sessions 30 --address 127.0.0.1:8765   # against `serve`
+
+Requests cycle over `distinct` period windows, so sessions asking for the same window
+should share one job. Keys carry a per-run salt, so an earlier run's cached results do
+not hide the compute.
+"""
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .jobs import DONE, FINISHED
+from .result_cache import fingerprint
+from .serving import run_task
+
+
+def prepare_store(rows: int, directory: Optional[str] = None, seed: int = 0):
+    """Ingest a synthetic national dataset of `rows` rows into a store (a temporary directory by default)."""
+    from . import synthetic
+    from .national_store import ingest
+
+    directory = directory or tempfile.mkdtemp(prefix="productivity-loadtest-")
+    source = f"{directory}/national.parquet"
+    synthetic.national_dataset(rows, seed=seed).to_parquet(source, index=False)
+    return ingest(source, f"{directory}/store")
+
+
+def request_filters(periods: List[str], distinct: int) -> List[Dict]:
+    """`distinct` period windows (each the first half of the periods, shifted by one per variant)."""
+    width = max(len(periods) // 2, 1)
+    first = [i % len(periods) for i in range(distinct)]
+    return [{"period_range": (periods[i], periods[min(i + width, len(periods)) - 1])} for i in first]
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_s": float("nan"), "p95_s": float("nan"), "p99_s": float("nan"), "max_s": float("nan"),
+                "mean_s": float("nan")}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_s": float(p50), "p95_s": float(p95), "p99_s": float(p99), "max_s": float(max(latencies)),
+            "mean_s": float(np.mean(latencies))}
+
+
+def run_load_test(runner, store, sessions: int = 30, requests: int = 1, distinct: int = 3,
+                  users: Optional[int] = None, workers: int = 1, poll_s: float = 0.05,
+                  log: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    `sessions` threads each send `requests` requests through `runner` (a JobRunner or
+    ComputeClient), as users user0 … user{users-1} (default: one user per session).
+    """
+    users = users or sessions
+    variants = request_filters(store.periods, distinct)
+    salt = uuid.uuid4().hex
+    latencies: List[float] = []
+    job_ids, failures = set(), []
+    lock = threading.Lock()
+    start = threading.Barrier(sessions)
+
+    def session(i: int) -> None:
+        start.wait()
+        for r in range(requests):
+            filters = variants[(i * requests + r) % len(variants)]
+            key = fingerprint("loadtest", salt, store.directory, workers, settings=filters)
+            sent = time.perf_counter()
+            job_id = runner.submit("Load test cube", run_task, "national_cube", key, store.directory, filters,
+                                   workers, key=key, user=f"user{i % users}")
+            job = runner.get(job_id)
+            while job is not None and job.status not in FINISHED:
+                time.sleep(poll_s)
+                job = runner.get(job_id)
+            waited = time.perf_counter() - sent
+            with lock:
+                job_ids.add(job_id)
+                if job is not None and job.status == DONE:
+                    latencies.append(waited)
+                else:
+                    # A finished job can be trimmed from a busy runner before this poll sees it
+                    failures.append("job expired" if job is None else job.error or job.status)
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - began
+    report = {
+        "sessions": sessions,
+        "users": users,
+        "requests": sessions * requests,
+        "distinct": len(variants),
+        "jobs_run": len(job_ids),
+        "failed": len(failures),
+        "wall_s": wall,
+        "requests_per_s": sessions * requests / wall if wall > 0 else float("inf"),
+        **_percentiles(latencies),
+    }
+    if failures and log:
+        log(f"First failure: {failures[0]}")
+    return report
@@ -0,0 +1,411 @@
+"""
+Productivity metrics for one products table + one inputs table.
+
+Output is aggregated by value (Σ qty × price) or quantity, optionally in standard hours;
+inputs are costed and split into partial-productivity categories (labor, machine,
+materials, energy, overhead).
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+from .schema import prepare_inputs, prepare_products
+
+
+def example_products() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {"product": "A", "quantity": 1000, "price": 50.0, "std_hours": 0.2},
+            {"product": "B", "quantity": 400, "price": 120.0, "std_hours": 0.5},
+            {"product": "C", "quantity": 200, "price": 200.0, "std_hours": 1.2},
+        ]
+    )
+
+
+def example_inputs() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {"resource": "Labor", "quantity": 120.0, "unit_cost": 6.0, "unit": "hours"},
+            {"resource": "Machine", "quantity": 75.0, "unit_cost": 20.0, "unit": "machine_hours"},
+            {"resource": "Materials", "quantity": 1.0, "unit_cost": 30000.0, "unit": "currency"},
+            {"resource": "Energy", "quantity": 1.0, "unit_cost": 5000.0, "unit": "currency"},
+            {"resource": "Overhead", "quantity": 1.0, "unit_cost": 12000.0, "unit": "currency"},
+        ]
+    )
+
+
+# Columns loaded from uploaded product / input tables (others are ignored)
+PRODUCT_COLUMNS: List[str] = ["product", "quantity", "price", "std_hours"]
+INPUT_COLUMNS: List[str] = ["resource", "quantity", "unit_cost", "unit"]
+
+
+def _normalize_products(df: pd.DataFrame) -> pd.DataFrame:
+    # Tables already passed through prepare_products are used as-is (no copy)
+    return prepare_products(df, categorical=False)
+
+
+def _normalize_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    return prepare_inputs(df, categorical=False)
+
+
+def compute_output_value(products: pd.DataFrame, use_prices: bool = True) -> float:
+    if use_prices and "price" in products.columns and products["price"].notna().any():
+        return float((products["quantity"] * products["price"]).sum())
+    # Fallback: price-less output proxy = sum of quantities (not ideal for mix; use std_hours if present)
+    return float(products["quantity"].sum())
+
+
+def compute_output_standard_hours(products: pd.DataFrame) -> Optional[float]:
+    if "std_hours" in products.columns and products["std_hours"].notna().any():
+        return float((products["quantity"] * products["std_hours"]).sum())
+    return None
+
+
+def compute_input_cost(inputs_df: pd.DataFrame) -> float:
+    return float((inputs_df["quantity"] * inputs_df["unit_cost"]).sum())
+
+
+# Map common resource names to categories for partial productivity.
+# Order matters: the first category with a matching keyword wins.
+PARTIAL_INPUT_MAPPING: Dict[str, List[str]] = {
+    "labor": ["labor", "tenaga kerja", "manhours", "jam kerja"],
+    "machine": ["machine", "mesin", "machine hour", "mh", "jam mesin"],
+    "materials": ["material", "materials", "bahan"],
+    "energy": ["energy", "energi", "listrik", "bbm"],
+    "overhead": ["overhead", "sewa", "depresiasi", "admin"],
+}
+PARTIAL_CATEGORIES: List[str] = list(PARTIAL_INPUT_MAPPING.keys())
+DEFAULT_CATEGORY = "overhead"
+
+# One compiled substring matcher per category, built once at import
+_CATEGORY_PATTERNS = [
+    (cat, re.compile("|".join(re.escape(k) for k in keys)))
+    for cat, keys in PARTIAL_INPUT_MAPPING.items()
+]
+
+
+@lru_cache(maxsize=65536)
+def categorize_resource(name: str) -> str:
+    name = name.strip().lower()
+    for cat, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(name):
+            return cat
+    # Sum to overhead if unknown
+    return DEFAULT_CATEGORY
+
+
+def categorize_resource_codes(resources: pd.Series) -> np.ndarray:
+    """Return an index into PARTIAL_CATEGORIES for every row of a resource column.
+
+    Each distinct resource name is classified only once; categorical columns (see
+    prepare_inputs) reuse their codes instead of hashing every row.
+    """
+    if isinstance(resources.dtype, pd.CategoricalDtype):
+        codes = resources.cat.codes.to_numpy()
+        # Missing values have code -1, which picks the trailing "nan" entry
+        names = [str(u) for u in resources.cat.categories] + [str(np.nan)]
+        cat_of_name = np.array([PARTIAL_CATEGORIES.index(categorize_resource(n)) for n in names], dtype=np.intp)
+        return cat_of_name[codes]
+    codes, uniques = pd.factorize(resources, use_na_sentinel=False)
+    cat_of_unique = np.array(
+        [PARTIAL_CATEGORIES.index(categorize_resource(str(u))) for u in uniques], dtype=np.intp
+    )
+    return cat_of_unique[codes] if len(codes) else np.zeros(0, dtype=np.intp)
+
+
+@timed("extract_partial_inputs")
+def extract_partial_inputs(inputs_df: pd.DataFrame) -> Dict[str, float]:
+    qty = inputs_df["quantity"].to_numpy(dtype=float, na_value=np.nan)
+    unit_cost = inputs_df["unit_cost"].to_numpy(dtype=float, na_value=np.nan)
+    total_cost = np.where(np.isnan(qty), 0.0, qty) * np.where(np.isnan(unit_cost), 0.0, unit_cost)
+    cats = categorize_resource_codes(inputs_df["resource"])
+    sums = np.bincount(cats, weights=total_cost, minlength=len(PARTIAL_CATEGORIES))
+    return {cat: float(s) for cat, s in zip(PARTIAL_CATEGORIES, sums)}
+
+
+def deflate_value(value: float, deflator: Optional[float]) -> float:
+    if deflator is None or deflator == 0:
+        return value
+    return value / deflator
+
+
+@timed("productivity_metrics")
+def productivity_metrics(products: pd.DataFrame,
+                         inputs_df: pd.DataFrame,
+                         *,
+                         use_price_output: bool = True,
+                         use_standard_hour_output: bool = False,
+                         price_deflator: Optional[float] = None,
+                         input_deflator: Optional[float] = None) -> Dict[str, float]:
+    products = _normalize_products(products)
+    inputs_df = _normalize_inputs(inputs_df)
+
+    # Output
+    output_val = compute_output_value(products, use_price_output)
+    std_hours_total = compute_output_standard_hours(products) if use_standard_hour_output else None
+
+    # Inputs
+    input_cost_total = compute_input_cost(inputs_df)
+    partials = extract_partial_inputs(inputs_df)
+
+    return _metrics_dict(output_val, std_hours_total, input_cost_total, partials,
+                         price_deflator=price_deflator, input_deflator=input_deflator)
+
+
+def _metrics_dict(output_val: float, std_hours_total: Optional[float], input_cost_total: float,
+                  partials: Dict[str, float], *, price_deflator: Optional[float] = None,
+                  input_deflator: Optional[float] = None) -> Dict[str, float]:
+    # Deflate if provided
+    real_output = deflate_value(output_val, price_deflator)
+    real_input_cost = deflate_value(input_cost_total, input_deflator)
+
+    # Partial denominators (cost-based). Labor hours PP usually use hours, but we generalize using costs to keep unit-consistency.
+    # Users can put labor quantity=hours and unit_cost=wage to reflect hours.
+
+    m = {
+        "gross_output_value": output_val,
+        "real_output_value": real_output,
+        "std_hours_output": std_hours_total if std_hours_total is not None else np.nan,
+        "total_input_cost": input_cost_total,
+        "real_input_cost": real_input_cost,
+        "TFP_value_based": (real_output / real_input_cost) if real_input_cost else np.nan,
+        # Partial productivity (value-based)
+        "PP_labor": (real_output / partials.get("labor", 0.0)) if partials.get("labor", 0.0) else np.nan,
+        "PP_machine": (real_output / partials.get("machine", 0.0)) if partials.get("machine", 0.0) else np.nan,
+        "PP_materials": (real_output / partials.get("materials", 0.0)) if partials.get("materials", 0.0) else np.nan,
+        "PP_energy": (real_output / partials.get("energy", 0.0)) if partials.get("energy", 0.0) else np.nan,
+        "PP_overhead": (real_output / partials.get("overhead", 0.0)) if partials.get("overhead", 0.0) else np.nan,
+    }
+
+    if std_hours_total is not None and std_hours_total > 0:
+        # Productivity per standard hour (if std_hours provided)
+        m["Productivity_per_std_hour"] = real_output / std_hours_total
+
+    return m
+
+
+class MetricsAccumulator:
+    """
+    Running sums behind productivity_metrics (Σqty×price, Σqty, Σqty×std_hours, input cost
+    per category), so edits can be applied as row deltas instead of full recomputation.
+    Row counts are kept next to every sum so emptied groups read as exactly zero.
+    """
+
+    def __init__(self):
+        self.output_value = 0.0
+        self.output_quantity = 0.0
+        self.std_hours = 0.0
+        self.price_rows = 0
+        self.std_hours_rows = 0
+        self.input_cost = 0.0
+        self.category_cost = {cat: 0.0 for cat in PARTIAL_CATEGORIES}
+        self.category_rows = {cat: 0 for cat in PARTIAL_CATEGORIES}
+
+    @classmethod
+    def from_frames(cls, products: pd.DataFrame, inputs_df: pd.DataFrame) -> "MetricsAccumulator":
+        acc = cls()
+        acc.update_products(products)
+        acc.update_inputs(inputs_df)
+        return acc
+
+    def copy(self) -> "MetricsAccumulator":
+        acc = MetricsAccumulator()
+        acc.__dict__.update(self.__dict__)
+        acc.category_cost = dict(self.category_cost)
+        acc.category_rows = dict(self.category_rows)
+        return acc
+
+    def update_products(self, products: pd.DataFrame, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) product rows."""
+        if products.empty:
+            return
+        products = _normalize_products(products)
+        qty = products["quantity"]
+        self.output_quantity += sign * float(qty.sum())
+        if "price" in products.columns:
+            self.output_value += sign * float((qty * products["price"]).sum())
+            self.price_rows += sign * int(products["price"].notna().sum())
+        if "std_hours" in products.columns:
+            self.std_hours += sign * float((qty * products["std_hours"]).sum())
+            self.std_hours_rows += sign * int(products["std_hours"].notna().sum())
+
+    def update_inputs(self, inputs_df: pd.DataFrame, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) input rows."""
+        if inputs_df.empty:
+            return
+        inputs_df = _normalize_inputs(inputs_df)
+        cost = (inputs_df["quantity"] * inputs_df["unit_cost"]).to_numpy(dtype=float)
+        self.input_cost += sign * float(cost.sum())
+        cats = categorize_resource_codes(inputs_df["resource"])
+        sums = np.bincount(cats, weights=cost, minlength=len(PARTIAL_CATEGORIES))
+        counts = np.bincount(cats, minlength=len(PARTIAL_CATEGORIES))
+        for i, cat in enumerate(PARTIAL_CATEGORIES):
+            self.category_cost[cat] += sign * float(sums[i])
+            self.category_rows[cat] += sign * int(counts[i])
+
+    def metrics(self, settings: Dict) -> Dict[str, float]:
+        if settings.get("use_price_output", True) and self.price_rows > 0:
+            output_val = self.output_value
+        else:
+            output_val = self.output_quantity
+        std_hours_total = None
+        if settings.get("use_standard_hour_output", False) and self.std_hours_rows > 0:
+            std_hours_total = self.std_hours
+        partials = {cat: self.category_cost[cat] if self.category_rows[cat] > 0 else 0.0
+                    for cat in PARTIAL_CATEGORIES}
+        input_cost_total = self.input_cost if any(self.category_rows.values()) else 0.0
+        return _metrics_dict(output_val, std_hours_total, input_cost_total, partials,
+                             price_deflator=settings.get("price_deflator"),
+                             input_deflator=settings.get("input_deflator"))
+
+
+def editor_delta(base: pd.DataFrame, state: Optional[Dict]):
+    """
+    Split a st.data_editor delta state (edited_rows / added_rows / deleted_rows, positions
+    relative to `base`) into the rows it removes from and the rows it adds to `base`.
+    """
+    state = state or {}
+    edited = {int(k): v for k, v in state.get("edited_rows", {}).items() if int(k) < len(base)}
+    deleted = {int(i) for i in state.get("deleted_rows", []) if int(i) < len(base)}
+    touched = sorted(set(edited) | deleted)
+    removed = base.iloc[touched]
+    records = base.iloc[[i for i in touched if i not in deleted]].to_dict("records")
+    for record, pos in zip(records, [i for i in touched if i not in deleted]):
+        record.update(edited.get(pos, {}))
+    records.extend(state.get("added_rows", []))
+    added = pd.DataFrame.from_records(records, columns=base.columns) if records else base.iloc[0:0]
+    return removed, added
+
+
+def metrics_frame(met: Dict[str, float]) -> pd.DataFrame:
+    df = pd.DataFrame([met]).T.reset_index()
+    df.columns = ["metric", "value"]
+    return df
+
+
+@timed("kaizen_compare")
+def kaizen_compare(before_products: pd.DataFrame, before_inputs: pd.DataFrame,
+                   after_products: pd.DataFrame, after_inputs: pd.DataFrame,
+                   settings: Dict) -> pd.DataFrame:
+    before = productivity_metrics(before_products, before_inputs,
+                                  use_price_output=settings.get("use_price_output", True),
+                                  use_standard_hour_output=settings.get("use_standard_hour_output", False),
+                                  price_deflator=settings.get("price_deflator"),
+                                  input_deflator=settings.get("input_deflator"))
+    after = productivity_metrics(after_products, after_inputs,
+                                 use_price_output=settings.get("use_price_output", True),
+                                 use_standard_hour_output=settings.get("use_standard_hour_output", False),
+                                 price_deflator=settings.get("price_deflator"),
+                                 input_deflator=settings.get("input_deflator"))
+    return kaizen_frame(before, after)
+
+
+def kaizen_frame(before: Dict[str, float], after: Dict[str, float]) -> pd.DataFrame:
+    df = pd.DataFrame({"metric": list(after.keys()),
+                       "before": [before.get(k, np.nan) for k in after.keys()],
+                       "after": [after.get(k, np.nan) for k in after.keys()]})
+    df["change_abs"] = df["after"] - df["before"]
+    df["change_pct"] = np.where(df["before"].abs() > 0, (df["after"] / df["before"] - 1.0) * 100.0, np.nan)
+    return df
+
+
+SCENARIO_PARTS: List[str] = ["value", "change_abs", "change_pct"]
+
+
+def _scenario_codes(products: pd.DataFrame, inputs_df: pd.DataFrame, scenario_col: str):
+    for df, name in ((products, "Products"), (inputs_df, "Inputs")):
+        if scenario_col not in df.columns:
+            raise ValueError(f"{name} table missing required column: {scenario_col}")
+    # One factorisation over both tables, so a scenario present in only one of them still gets a row
+    keys = pd.concat([products[scenario_col], inputs_df[scenario_col]], ignore_index=True)
+    codes, scenarios = pd.factorize(keys, sort=True)
+    return codes[:len(products)], codes[len(products):], pd.Index(scenarios, name=scenario_col)
+
+
+@timed("scenario_metrics")
+def scenario_metrics(products: pd.DataFrame, inputs_df: pd.DataFrame, settings: Dict,
+                     scenario_col: str = "scenario") -> pd.DataFrame:
+    """
+    productivity_metrics for N scenarios in one vectorised pass.
+
+    `products` and `inputs_df` are stacked tables with a `scenario_col` column. Returns one
+    row per scenario ID (sorted), with the productivity_metrics keys as columns and the
+    same per-scenario rules. Productivity_per_std_hour is present when any scenario has
+    standard hours.
+    """
+    products = _normalize_products(products)
+    inputs_df = _normalize_inputs(inputs_df)
+    p_codes, i_codes, scenarios = _scenario_codes(products, inputs_df, scenario_col)
+    n = len(scenarios)
+
+    def group_sum(codes: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        valid = codes >= 0
+        return np.bincount(codes[valid], weights=None if weights is None else weights[valid], minlength=n)
+
+    # Products: NaN prices / std hours are skipped like pandas .sum() does in compute_output_*
+    qty = products["quantity"].to_numpy(dtype=float)
+    output_quantity = group_sum(p_codes, qty)
+    output_value = price_rows = std_hours = std_hours_rows = np.zeros(n)
+    if "price" in products.columns:
+        price = products["price"].to_numpy(dtype=float, na_value=np.nan)
+        has_price = ~np.isnan(price)
+        output_value = group_sum(p_codes, np.where(has_price, qty * price, 0.0))
+        price_rows = group_sum(p_codes, has_price.astype(float))
+    if "std_hours" in products.columns:
+        hours = products["std_hours"].to_numpy(dtype=float, na_value=np.nan)
+        has_hours = ~np.isnan(hours)
+        std_hours = group_sum(p_codes, np.where(has_hours, qty * hours, 0.0))
+        std_hours_rows = group_sum(p_codes, has_hours.astype(float))
+
+    # Inputs: total and per-category cost from one (scenario, category) bincount
+    cost = inputs_df["quantity"].to_numpy(dtype=float) * inputs_df["unit_cost"].to_numpy(dtype=float)
+    cats = categorize_resource_codes(inputs_df["resource"])
+    n_cats = len(PARTIAL_CATEGORIES)
+    valid = i_codes >= 0
+    by_cat = np.bincount(i_codes[valid] * n_cats + cats[valid], weights=cost[valid],
+                         minlength=n * n_cats).reshape(n, n_cats)
+    input_cost = group_sum(i_codes, cost)
+
+    output_val = np.where(settings.get("use_price_output", True) & (price_rows > 0), output_value, output_quantity)
+    std_total = np.where(settings.get("use_standard_hour_output", False) & (std_hours_rows > 0), std_hours, np.nan)
+    real_output = deflate_value(output_val, settings.get("price_deflator"))
+    real_input_cost = deflate_value(input_cost, settings.get("input_deflator"))
+
+    def _ratio(num, den):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(den != 0, num / den, np.nan)
+
+    m = {
+        "gross_output_value": output_val,
+        "real_output_value": real_output,
+        "std_hours_output": std_total,
+        "total_input_cost": input_cost,
+        "real_input_cost": real_input_cost,
+        "TFP_value_based": _ratio(real_output, real_input_cost),
+        **{f"PP_{cat}": _ratio(real_output, by_cat[:, i]) for i, cat in enumerate(PARTIAL_CATEGORIES)},
+    }
+    has_std = std_total > 0
+    if has_std.any():
+        m["Productivity_per_std_hour"] = np.where(has_std, _ratio(real_output, std_total), np.nan)
+    return pd.DataFrame(m, index=scenarios)
+
+
+def scenario_compare(metrics: pd.DataFrame, baseline) -> pd.DataFrame:
+    """
+    Compare every scenario row of scenario_metrics against the `baseline` row.
+
+    Columns are (part, metric) with part in SCENARIO_PARTS, so frame["change_pct"] is
+    the N × metrics matrix of percentage changes (same rules as kaizen_frame).
+    """
+    if baseline not in metrics.index:
+        raise ValueError(f"Unknown baseline scenario: {baseline!r}")
+    base = metrics.loc[baseline]
+    change_abs = metrics - base
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = (metrics / base - 1.0) * 100.0
+    change_pct.loc[:, ~(base.abs() > 0)] = np.nan
+    return pd.concat({"value": metrics, "change_abs": change_abs, "change_pct": change_pct}, axis=1)
@@ -0,0 +1,438 @@
+"""
+National aggregation over a long-form dataset (many companies and periods).
+
+Everything is reduced to additive per-group sums first (national_base_sums), so chunks
+and finer groups can be combined before the metrics are derived.
+
+With a deflator series in settings["deflators"] (see schema.prepare_deflators), the sums
+are taken per period (and sector, when the series has one). Each of those rows is deflated
+by its own entry before being summed up to the requested grouping.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .batch import MetricBatch
+from .instrumentation import timed
+from .jobs import process_pool, report_progress, shutdown_process_pool
+from .metrics import (PARTIAL_CATEGORIES, DEFAULT_CATEGORY, categorize_resource_codes, deflate_value,
+                      example_inputs, example_products)
+from .schema import DEFLATOR_KEYS, float_column, prepare_deflators
+from .tabular_io import iter_table_chunks, table_columns
+
+
+NATIONAL_SUM_COLUMNS: List[str] = [
+    "output_value", "output_quantity", "std_hours_output", "input_cost",
+    *[f"cost_{cat}" for cat in PARTIAL_CATEGORIES],
+    "product_rows", "input_rows", "price_rows", "std_hours_rows",
+]
+
+
+def _national_table_masks(dataset: pd.DataFrame):
+    table_col = "table" if "table" in dataset.columns else "type"
+    if table_col not in dataset.columns:
+        raise ValueError("National dataset missing required column: table")
+    table = dataset[table_col]
+    return (table == "product").to_numpy(dtype=bool), (table == "input").to_numpy(dtype=bool)
+
+
+def _national_group_keys(dataset: pd.DataFrame, by: List[str]) -> List[pd.Series]:
+    keys = []
+    for key in by:
+        if key in dataset.columns:
+            keys.append(dataset[key])
+        elif key == "period":
+            keys.append(pd.Series("ALL", index=dataset.index, name="period"))
+        else:
+            raise ValueError(f"National dataset missing grouping column: {key}")
+    return keys
+
+
+def _group_ids(keys: List[pd.Series], dropna: bool = True):
+    """
+    Dense group id per row and the sorted group index, as groupby(keys, sort=True,
+    observed=True, dropna=dropna) would produce them. With dropna, rows where any key is
+    missing get id -1.
+    """
+    codes, levels, gid, missing = [], [], None, None
+    for key in keys:
+        c, u = pd.factorize(key, sort=True, use_na_sentinel=dropna)
+        c = c.astype(np.int64, copy=False)
+        codes.append(c)
+        levels.append(u)
+        if dropna:
+            missing = c < 0 if missing is None else missing | (c < 0)
+            c = np.maximum(c, 0)
+        # Re-densify after every key, so the combined code stays below rows × cardinality
+        gid = c if gid is None else pd.factorize(gid * max(len(u), 1) + c, sort=True)[0]
+    if missing is not None and missing.any():
+        gid, combined = pd.factorize(np.where(missing, -1, gid), sort=True)
+        if len(combined) and combined[0] < 0:
+            gid = gid - 1
+    n_groups = int(gid.max()) + 1 if len(gid) else 0
+    # Decode every group's keys from its first row
+    rows = np.flatnonzero(gid >= 0)
+    first = np.empty(n_groups, dtype=np.int64)
+    first[gid[rows][::-1]] = rows[::-1]
+    arrays = [u.take(c[first]) for c, u in zip(codes, levels)]
+    names = [k.name for k in keys]
+    if len(arrays) == 1:
+        index = pd.Index(arrays[0], name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(arrays, names=names)
+    return gid, index
+
+
+@timed("national_base_sums")
+def national_base_sums(dataset: pd.DataFrame, by=("period",), dropna: bool = True) -> pd.DataFrame:
+    """
+    Additive base quantities of a long-form national dataset, one row per group.
+
+    Columns are NATIONAL_SUM_COLUMNS: output value/quantity, standard hours, total and
+    per-category input cost, plus row counts used to reproduce the per-period fallbacks.
+    Because every column is a plain sum, partial results (chunks, finer groups) can be
+    combined with another groupby-sum before calling national_metrics_from_sums.
+    With dropna=False, rows with a missing key form their own (NaN) group instead of
+    being dropped.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    is_product, is_input = _national_table_masks(dataset)
+    gid, index = _group_ids(_national_group_keys(dataset, by), dropna)
+    if (gid < 0).any():
+        keep = gid >= 0
+        dataset, gid, is_product, is_input = dataset[keep], gid[keep], is_product[keep], is_input[keep]
+    n_groups = len(index)
+
+    # Each sum is one weighted bincount, so only a few row-length temporaries are alive
+    # at a time (float64 views without copies when the dataset went through prepare_national).
+    def group_sum(weights) -> np.ndarray:
+        return np.bincount(gid, weights=weights, minlength=n_groups)
+
+    def group_count(mask) -> np.ndarray:
+        return np.bincount(gid[mask], minlength=n_groups)
+
+    qty = float_column(dataset, "quantity")
+    prod_qty = np.where(is_product, qty, 0.0)
+    cost = np.where(is_input, qty * float_column(dataset, "unit_cost"), 0.0)
+    if "resource" in dataset.columns:
+        cats = categorize_resource_codes(dataset["resource"])
+    else:
+        cats = np.full(len(dataset), PARTIAL_CATEGORIES.index(DEFAULT_CATEGORY))
+
+    sums = {
+        "output_value": group_sum(prod_qty * float_column(dataset, "price")),
+        "output_quantity": group_sum(prod_qty),
+        "std_hours_output": group_sum(prod_qty * float_column(dataset, "std_hours")),
+        "input_cost": group_sum(cost),
+    }
+    # Category costs: one pass over (group, category) pairs instead of a masked copy per category
+    n_cats = len(PARTIAL_CATEGORIES)
+    by_cat = np.bincount(gid * n_cats + cats, weights=cost, minlength=n_groups * n_cats)
+    by_cat = by_cat.reshape(n_groups, n_cats)
+    for i, cat in enumerate(PARTIAL_CATEGORIES):
+        sums[f"cost_{cat}"] = by_cat[:, i]
+    product_rows = group_count(is_product)
+    sums["product_rows"] = product_rows
+    sums["input_rows"] = group_count(is_input)
+    sums["price_rows"] = product_rows if "price" in dataset.columns else np.zeros(n_groups, dtype=np.int64)
+    sums["std_hours_rows"] = product_rows if "std_hours" in dataset.columns else np.zeros(n_groups, dtype=np.int64)
+
+    frame = pd.DataFrame(sums, index=index)
+    # Groups that only contain excluded rows never appear (groupby observed=True semantics)
+    return frame[NATIONAL_SUM_COLUMNS]
+
+
+@lru_cache(maxsize=1)
+def _example_base_sums() -> pd.Series:
+    # Cached: read-only, and rebuilding it dominated small national_metrics_from_sums calls
+    prods = example_products().assign(table="product")
+    inputs = example_inputs().assign(table="input")
+    return national_base_sums(pd.concat([prods, inputs], ignore_index=True)).iloc[0]
+
+
+# Added by deflate_sums; additive like the base sums, so they survive further groupby-sums
+REAL_SUM_COLUMNS: List[str] = ["real_output_value", "real_output_quantity", "real_input_cost"]
+
+
+def deflator_keys(deflators: pd.DataFrame) -> List[str]:
+    return [k for k in DEFLATOR_KEYS if k in deflators.columns]
+
+
+def _deflator_lookup(deflators: pd.DataFrame, column: str, keys: pd.DataFrame,
+                     fallback: Optional[float]) -> np.ndarray:
+    # Per-row deflator: the (period, sector) entry, else the period-wide entry (sector left
+    # empty), else the scalar setting. Zero or missing entries mean "not deflated", as in deflate_value.
+    fallback = 1.0 if fallback is None or fallback == 0 else float(fallback)
+    if column not in deflators.columns:
+        return np.full(len(keys), fallback)
+    as_str = lambda s: s.astype("string").astype(object).where(s.notna(), None)  # noqa: E731
+    period = as_str(keys["period"])
+    values = pd.Series(np.nan, index=keys.index)
+    if "sector" in deflators.columns and "sector" in keys.columns:
+        by_sector = deflators.dropna(subset=["sector"]).set_index(["period", "sector"])[column]
+        values = pd.Series(by_sector.reindex(pd.MultiIndex.from_arrays([period, as_str(keys["sector"])])).to_numpy(),
+                           index=keys.index)
+    period_wide = deflators[deflators["sector"].isna()] if "sector" in deflators.columns else deflators
+    values = values.fillna(pd.Series(period_wide.set_index("period")[column].reindex(period).to_numpy(),
+                                     index=keys.index))
+    out = values.to_numpy(dtype=float)
+    return np.where(np.isnan(out) | (out == 0), fallback, out)
+
+
+@timed("deflate_sums")
+def deflate_sums(sums: pd.DataFrame, settings: Dict) -> pd.DataFrame:
+    """
+    Base sums with REAL_SUM_COLUMNS added: each row deflated by the series entry for its
+    period (and sector). `sums` must be grouped by the series' keys.
+    """
+    deflators = prepare_deflators(settings["deflators"])
+    missing = [k for k in deflator_keys(deflators) if k not in sums.index.names and k != "sector"]
+    if missing:
+        raise ValueError(f"Deflating needs sums grouped by {missing}")
+    keys = sums.index.to_frame(index=False)
+    if "period" not in keys.columns:
+        keys["period"] = "ALL"
+    price = _deflator_lookup(deflators, "price_deflator", keys, settings.get("price_deflator"))
+    inputs = _deflator_lookup(deflators, "input_deflator", keys, settings.get("input_deflator"))
+    out = sums.copy()
+    out["real_output_value"] = sums["output_value"].to_numpy(dtype=float) / price
+    out["real_output_quantity"] = sums["output_quantity"].to_numpy(dtype=float) / price
+    out["real_input_cost"] = sums["input_cost"].to_numpy(dtype=float) / inputs
+    return out
+
+
+def national_sums(compute, by, settings: Dict, columns) -> pd.DataFrame:
+    """
+    Base sums grouped by `by` for national_metrics_from_sums; `compute(keys, dropna)`
+    computes national_base_sums from any source. Without a deflator series this is just
+    compute(by). With a series, the sums are also split by its keys, then deflated and
+    summed back to `by`.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if settings.get("deflators") is None:
+        return compute(by, True)
+    # A dataset without a period column is one "ALL" period (see _national_group_keys)
+    extra = [k for k in deflator_keys(prepare_deflators(settings["deflators"]))
+             if k not in by and (k in columns or k == "period")]
+    if not extra:
+        return deflate_sums(compute(by, True), settings)
+    # Keep missing extra keys as their own rows; missing `by` keys are dropped as compute(by) would
+    sums = compute(by + extra, False)
+    keep = sums.index.to_frame(index=False)[by].notna().all(axis=1).to_numpy()
+    return deflate_sums(sums[keep], settings).groupby(level=by, sort=True, observed=True).sum()
+
+
+def _metric_columns(sums: pd.DataFrame, settings: Dict) -> Dict[str, np.ndarray]:
+    sums = sums.astype(float)
+    # Groups without product or input rows fall back to the example tables (as before)
+    example = _example_base_sums()
+    product_cols = ["output_value", "output_quantity", "std_hours_output", "product_rows", "price_rows", "std_hours_rows"]
+    input_cols = ["input_cost", *[f"cost_{cat}" for cat in PARTIAL_CATEGORIES], "input_rows"]
+    deflated = "real_output_value" in sums.columns
+    if deflated:
+        # The example fallback rows are deflated by the scalar settings
+        example = pd.concat([example, pd.Series({
+            "real_output_value": deflate_value(example["output_value"], settings.get("price_deflator")),
+            "real_output_quantity": deflate_value(example["output_quantity"], settings.get("price_deflator")),
+            "real_input_cost": deflate_value(example["input_cost"], settings.get("input_deflator")),
+        })])
+        product_cols += ["real_output_value", "real_output_quantity"]
+        input_cols += ["real_input_cost"]
+    no_products = sums["product_rows"] == 0
+    no_inputs = sums["input_rows"] == 0
+    if no_products.any():
+        sums.loc[no_products, product_cols] = example[product_cols].to_numpy()
+    if no_inputs.any():
+        sums.loc[no_inputs, input_cols] = example[input_cols].to_numpy()
+
+    use_price = settings.get("use_price_output", True)
+    output_val = np.where(use_price & (sums["price_rows"] > 0), sums["output_value"], sums["output_quantity"])
+    if settings.get("use_standard_hour_output", False):
+        std_hours = np.where(sums["std_hours_rows"] > 0, sums["std_hours_output"], np.nan)
+    else:
+        std_hours = np.full(len(sums), np.nan)
+    input_cost = sums["input_cost"].to_numpy(dtype=float)
+    if deflated:
+        real_output = np.where(use_price & (sums["price_rows"] > 0), sums["real_output_value"],
+                               sums["real_output_quantity"])
+        real_input_cost = sums["real_input_cost"].to_numpy(dtype=float)
+    else:
+        real_output = deflate_value(output_val, settings.get("price_deflator"))
+        real_input_cost = deflate_value(input_cost, settings.get("input_deflator"))
+
+    def _ratio(num, den):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(den != 0, num / den, np.nan)
+
+    m = {
+        "gross_output_value": output_val,
+        "real_output_value": real_output,
+        "std_hours_output": std_hours,
+        "total_input_cost": input_cost,
+        "real_input_cost": real_input_cost,
+        "TFP_value_based": _ratio(real_output, real_input_cost),
+        **{f"PP_{cat}": _ratio(real_output, sums[f"cost_{cat}"].to_numpy(dtype=float)) for cat in PARTIAL_CATEGORIES},
+    }
+    has_std = std_hours > 0
+    if has_std.any():
+        m["Productivity_per_std_hour"] = np.where(has_std, _ratio(real_output, std_hours), np.nan)
+    return m
+
+
+@timed("national_metrics_from_sums")
+def national_metrics_from_sums(sums: pd.DataFrame, settings: Dict) -> pd.DataFrame:
+    """
+    Turn national_base_sums output into the productivity_metrics columns, one row per
+    group, with the group keys appended as the last columns.
+    """
+    m = _metric_columns(sums, settings)
+    out = pd.DataFrame(m, index=sums.index)
+    return out.reset_index()[[*m.keys(), *sums.index.names]]
+
+
+@timed("national_metrics_batch")
+def national_metrics_batch(sums: pd.DataFrame, settings: Dict) -> MetricBatch:
+    """national_metrics_from_sums as a MetricBatch; the group keys reuse the index codes."""
+    batch = MetricBatch(len(sums))
+    index = sums.index
+    if isinstance(index, pd.MultiIndex):
+        for name, codes, level in zip(index.names, index.codes, index.levels):
+            batch.set_key_codes(name, codes, level)
+    else:
+        batch.set_key(index.name, index)
+    for name, values in _metric_columns(sums, settings).items():
+        batch.set_metric(name, values)
+    return batch
+
+
+def national_base_sums_parallel(dataset: pd.DataFrame, by=("period",), workers: int = 2,
+                                shard_by: Optional[str] = None, dropna: bool = True) -> pd.DataFrame:
+    """
+    national_base_sums computed over a process pool.
+
+    Rows are split into shards by `shard_by` (default: the first grouping key, e.g. period;
+    use "company" to shard a single huge period). All rows sharing a shard key go to the
+    same shard, and shard results are folded in shard order, so the output is
+    deterministic for a given worker count.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    shard_by = shard_by or by[0]
+    if workers <= 1 or shard_by not in dataset.columns:
+        return national_base_sums(dataset, by, dropna)
+
+    needed = [c for c in dataset.columns if c in set(by) | {shard_by} | set(NATIONAL_VALUE_COLUMNS)]
+    dataset = dataset[needed]
+    n_shards = 2 * workers
+    shard = pd.factorize(dataset[shard_by], sort=True)[0] % n_shards
+    shards = (dataset[shard == i] for i in range(n_shards))
+    running = None
+    for partial in _map_chunks(shards, by, workers, dropna, total_rows=len(dataset)):
+        if partial.empty:
+            continue
+        running = partial if running is None else _combine_base_sums(running, partial)
+    return running if running is not None else national_base_sums(dataset, by, dropna)
+
+
+@timed("national_aggregate")
+def national_aggregate(dataset: pd.DataFrame, settings: Dict, by=("period",), workers: int = 1,
+                       shard_by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Expect long-form dataset with columns:
+    company, period, table, product/resource, quantity, price, std_hours, unit_cost
+    Where table in {"product","input"}. Flexible; missing cols tolerated.
+    Aggregation = sum of outputs and inputs across companies, then compute metrics.
+    `by` selects the grouping keys (default per period; e.g. ["period", "sector"]).
+    `workers` > 1 opts into process-pool execution (see national_base_sums_parallel).
+    """
+    def compute(keys, dropna):
+        if workers > 1:
+            return national_base_sums_parallel(dataset, keys, workers, shard_by, dropna)
+        return national_base_sums(dataset, keys, dropna)
+
+    return national_metrics_from_sums(national_sums(compute, by, settings, dataset.columns), settings)
+
+
+NATIONAL_VALUE_COLUMNS: List[str] = ["table", "type", "resource", "quantity", "price", "std_hours", "unit_cost"]
+
+
+def _combine_base_sums(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    levels = list(range(left.index.nlevels))
+    # dropna=False keeps the NaN-key groups of dropna=False base sums
+    return pd.concat([left, right]).groupby(level=levels, sort=True, observed=True, dropna=False).sum()
+
+
+@timed("national_base_sums_chunked")
+def national_base_sums_chunked(source, by=("period",), chunksize: int = 250_000, workers: int = 1,
+                               dropna: bool = True) -> pd.DataFrame:
+    """
+    Same result as national_base_sums, but reads a CSV/Parquet/Feather path or buffer in
+    chunks and folds each chunk into running per-group sums, so peak memory depends on the
+    chunk size and the number of groups rather than on the file size. Grouping keys are
+    read as strings so that chunks with different inferred dtypes still land in the same
+    group.
+
+    With workers > 1 the per-chunk sums run in a process pool (at most 2 × workers chunks
+    in flight); partial sums are still folded in file order, so the result is deterministic.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    needed = set(by) | set(NATIONAL_VALUE_COLUMNS)
+    chunks = iter_table_chunks(source, columns=needed, chunksize=chunksize, dtype={k: str for k in by})
+    running = None
+    for partial in _map_chunks(chunks, by, workers, dropna):
+        running = partial if running is None else _combine_base_sums(running, partial)
+    if running is None:
+        raise ValueError("National dataset is empty")
+    return running
+
+
+def _map_chunks(chunks, by: List[str], workers: int, dropna: bool = True, total_rows: Optional[int] = None):
+    # Progress (and cancellation, inside a background job) is reported per finished chunk
+    done = 0
+    if workers <= 1:
+        for chunk in chunks:
+            partial = national_base_sums(chunk, by, dropna)
+            done += len(chunk)
+            report_progress(done, total_rows)
+            yield partial
+        return
+
+    from collections import deque
+    from concurrent.futures.process import BrokenProcessPool
+
+    # Shared by concurrent jobs of this process, so they compete for one set of worker processes.
+    # Fetched per chunk: another job asking for more workers replaces it meanwhile
+    pool = None
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pool = process_pool(workers)
+            pending.append((pool.submit(national_base_sums, chunk, by, dropna), len(chunk)))
+            if len(pending) >= 2 * workers:
+                future, rows = pending.popleft()
+                partial = future.result()
+                done += rows
+                report_progress(done, total_rows)
+                yield partial
+        while pending:
+            future, rows = pending.popleft()
+            partial = future.result()
+            done += rows
+            report_progress(done, total_rows)
+            yield partial
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); the next call starts a fresh pool
+        shutdown_process_pool(pool)
+        raise
+    except BaseException:
+        # Cancelled or failed: do not wait for chunks that have not started
+        for future, _ in pending:
+            future.cancel()
+        raise
+
+
+def national_aggregate_chunked(source, settings: Dict, by=("period",), chunksize: int = 250_000,
+                               workers: int = 1) -> pd.DataFrame:
+    compute = lambda keys, dropna: national_base_sums_chunked(source, keys, chunksize, workers, dropna)  # noqa: E731
+    return national_metrics_from_sums(national_sums(compute, by, settings, table_columns(source)), settings)
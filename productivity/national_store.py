@@ -0,0 +1,423 @@
+"""
+Persistent local store for ingested national datasets.
+
+A store is a directory holding one uncompressed Arrow IPC file per period, with rows
+sorted by company and then table. Next to the files sit a manifest and a row-range
+index, with one entry per (period, company, table) run:
+
+    manifest.json             columns, periods, row counts, source fingerprint
+    index/*.npy               run period / company / table codes and start-stop rows
+    periods/00000.arrow       rows of the first period, and so on
+
+Opening a store reads only the manifest and memory-maps the index and period files. So
+it takes milliseconds whatever the dataset size. Selecting one period, a period range
+or a few companies touches only the matching row ranges.
+
+    store = open_or_ingest("national.parquet")
+    national_aggregate_store(store, settings, by=["company"], period_range=("2020Q1", "2021Q4"))
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import __version__
+from .instrumentation import timed
+from .national import (NATIONAL_VALUE_COLUMNS, _combine_base_sums, _map_chunks, national_metrics_from_sums,
+                       national_sums)
+from .quality import _numeric
+from .result_cache import fingerprint
+from .tabular_io import _require_pyarrow, iter_table_chunks, table_columns
+
+# 2: key columns read as text in every chunk (format 1 stores may hold "2020" and "2020.0")
+# 3: UNPARSED_COLUMN recorded per row
+_FORMAT = 3
+_FLOAT_COLUMNS = ["quantity", "price", "std_hours", "unit_cost"]
+_INDEX_ARRAYS = ["period", "company", "table", "start", "stop"]
+# Codes of the `table` column in the index; any other value is kept but never aggregated
+TABLE_CODES: Dict[str, int] = {"product": 0, "input": 1}
+_OTHER_TABLE = 2
+# Per-row bitmask of the numeric columns whose value was present but not a number (bit i:
+# _FLOAT_COLUMNS[i]). Such values are stored as NaN; quality.screen_store reports them.
+UNPARSED_COLUMN = "_unparsed"
+
+
+def default_store_root() -> str:
+    """Store directory root from PRODUCTIVITY_STORE_DIR (default ~/.cache/productivity/stores)."""
+    return os.environ.get("PRODUCTIVITY_STORE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "productivity", "stores"))
+
+
+def _normalize_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    if "table" not in chunk.columns:
+        if "type" not in chunk.columns:
+            raise ValueError("National dataset missing required column: table")
+        chunk = chunk.rename(columns={"type": "table"})
+    if "period" not in chunk.columns:
+        chunk = chunk.assign(period="ALL")
+    return chunk
+
+
+def _chunk_to_arrow(chunk: pd.DataFrame, names: List[str]):
+    import pyarrow as pa
+
+    missing = [c for c in names if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"National dataset chunk missing columns: {missing}")
+    arrays = []
+    unparsed = np.zeros(len(chunk), dtype=np.uint8)
+    for name in names:
+        s = chunk[name]
+        if name in _FLOAT_COLUMNS:
+            # NaN stays a float value (not an Arrow null), exactly as in the source frame
+            values, failed = _numeric(s)
+            if failed is not None:
+                unparsed[failed] |= np.uint8(1 << _FLOAT_COLUMNS.index(name))
+            arrays.append(pa.array(values))
+        else:
+            arrays.append(pa.array(s.astype("string"), type=pa.string(), from_pandas=True))
+    return pa.Table.from_arrays([*arrays, pa.array(unparsed)], names=[*names, UNPARSED_COLUMN])
+
+
+def parse_failures(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Column -> mask of the rows whose value did not parse as a number, from frame[UNPARSED_COLUMN]."""
+    bits = frame[UNPARSED_COLUMN].to_numpy(dtype=np.uint8)
+    return {c: (bits & (1 << i)) != 0 for i, c in enumerate(_FLOAT_COLUMNS) if c in frame.columns}
+
+
+def _dictionary_encode(table):
+    import pyarrow as pa
+
+    columns = [
+        col.combine_chunks().dictionary_encode() if pa.types.is_string(col.type) else col
+        for col in table.columns
+    ]
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+def _runs(table, has_company: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """(local company code, table code, start, stop, company labels) per run of a sorted period table."""
+    n = table.num_rows
+    if has_company:
+        company = table.column("company").combine_chunks()
+        labels = [str(v) for v in company.dictionary.to_pylist()]
+        company_codes = company.indices.fill_null(-1).to_numpy().astype(np.int64)
+    else:
+        labels, company_codes = [], np.full(n, -1, dtype=np.int64)
+    tables = table.column("table").combine_chunks()
+    code_of = np.array([TABLE_CODES.get(v, _OTHER_TABLE) for v in tables.dictionary.to_pylist()] + [_OTHER_TABLE],
+                       dtype=np.int64)
+    table_codes = code_of[tables.indices.fill_null(len(code_of) - 1).to_numpy()]
+
+    key = (company_codes + 1) * (_OTHER_TABLE + 1) + table_codes
+    change = np.flatnonzero(np.diff(key)) + 1
+    starts = np.concatenate([[0], change]) if n else np.zeros(0, dtype=np.int64)
+    stops = np.concatenate([change, [n]]) if n else np.zeros(0, dtype=np.int64)
+    return company_codes[starts], table_codes[starts], starts, stops, labels
+
+
+@timed("national_store.ingest")
+def ingest(source, directory: str, chunksize: int = 250_000) -> "NationalStore":
+    """
+    Build a store in `directory` from a CSV/Parquet/Feather path or uploaded file.
+
+    The source is read in chunks, and rows are spilled to one Arrow file per period.
+    Each period is then sorted by (company, table) and indexed, so peak memory follows
+    the largest period rather than the file. Rows without a period value go to a last
+    partition, which period filters skip and period groupings drop, as in
+    national_aggregate. The store appears atomically: concurrent ingests of the same
+    source leave one complete copy.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".ingest-")
+    try:
+        os.makedirs(os.path.join(tmp, "spill"))
+        names: Optional[List[str]] = None
+        writers: Dict[str, object] = {}
+        spill_files: Dict[Optional[str], str] = {}
+        # Keys and labels are read as text in every chunk: inferring each chunk's dtypes would
+        # turn a key column with a blank into floats, storing "2020.0" next to "2020"
+        text = {c: "string" for c in table_columns(source) if c not in _FLOAT_COLUMNS}
+        for chunk in iter_table_chunks(source, chunksize=chunksize, dtype=text):
+            chunk = _normalize_chunk(chunk)
+            if names is None:
+                names = list(chunk.columns)
+            table = _chunk_to_arrow(chunk, names)
+            codes, uniques = pd.factorize(chunk["period"].astype("string"))
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(-1, len(uniques) + 1))
+            table = table.take(pa.array(order))
+            for k, period in enumerate([None] + [str(u) for u in uniques]):
+                if bounds[k + 1] == bounds[k]:
+                    continue
+                if period not in writers:
+                    spill_files[period] = os.path.join(tmp, "spill", f"{len(spill_files):05d}.arrow")
+                    writers[period] = ipc.new_file(spill_files[period], table.schema)
+                writers[period].write_table(table.slice(bounds[k], bounds[k + 1] - bounds[k]))
+        for w in writers.values():
+            w.close()
+        if names is None:
+            raise ValueError("National dataset is empty")
+
+        has_company = "company" in names
+        sort_keys = [(c, "ascending") for c in ("company", "table") if c in names]
+        periods = sorted(p for p in spill_files if p is not None)
+        partitions = periods + ([None] if None in spill_files else [])
+        os.makedirs(os.path.join(tmp, "periods"))
+        period_rows, local_runs, all_labels = [], [], []
+        for i, period in enumerate(partitions):
+            with pa.memory_map(spill_files[period]) as src:
+                table = ipc.open_file(src).read_all().sort_by(sort_keys)
+            table = _dictionary_encode(table)
+            with ipc.new_file(os.path.join(tmp, "periods", f"{i:05d}.arrow"), table.schema) as w:
+                w.write_table(table, max_chunksize=chunksize)
+            os.remove(spill_files[period])
+            period_rows.append(table.num_rows)
+            company, table_code, start, stop, labels = _runs(table, has_company)
+            local_runs.append((i, company, table_code, start, stop, labels))
+            all_labels.extend(labels)
+            del table
+        shutil.rmtree(os.path.join(tmp, "spill"))
+
+        companies = np.unique(np.array(all_labels, dtype=str)) if all_labels else np.array([], dtype=str)
+        index = {name: [] for name in _INDEX_ARRAYS}
+        for i, company, table_code, start, stop, labels in local_runs:
+            # Per-period dictionary codes -> positions in the store-wide sorted company list
+            global_codes = np.full(len(company), -1, dtype=np.int32)
+            if labels:
+                known = company >= 0
+                global_codes[known] = np.searchsorted(companies, np.array(labels, dtype=str))[company[known]]
+            index["period"].append(np.full(len(start), i, dtype=np.int32))
+            index["company"].append(global_codes)
+            index["table"].append(table_code.astype(np.int8))
+            index["start"].append(start.astype(np.int64))
+            index["stop"].append(stop.astype(np.int64))
+        os.makedirs(os.path.join(tmp, "index"))
+        for name, parts in index.items():
+            np.save(os.path.join(tmp, "index", f"{name}.npy"), np.concatenate(parts))
+        np.save(os.path.join(tmp, "index", "companies.npy"), companies)
+
+        manifest = {
+            "format": _FORMAT,
+            "version": __version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": getattr(source, "name", str(source)),
+            "columns": names,
+            "periods": periods,
+            # One entry per partition: the periods, then the rows without a period (if any)
+            "period_rows": period_rows,
+            "missing_period_rows": period_rows[-1] if None in spill_files else 0,
+            "has_company": has_company,
+            "rows": int(sum(period_rows)),
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            # Another ingest of the same source finished first; keep that one
+            if not os.path.exists(os.path.join(directory, "manifest.json")):
+                raise
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+    return NationalStore(directory)
+
+
+def _source_key(source) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return fingerprint("national-store", _FORMAT, f)
+    return fingerprint("national-store", _FORMAT, source)
+
+
+def open_or_ingest(source, root: Optional[str] = None, chunksize: int = 250_000) -> "NationalStore":
+    """Open the store for this source (keyed by a hash of its content), ingesting it on first use."""
+    directory = os.path.join(root or default_store_root(), _source_key(source))
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        return NationalStore(directory)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return ingest(source, directory, chunksize)
+
+
+class NationalStore:
+    """Read-only view of an ingested national dataset (see ingest)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported national store format in {directory}")
+        self.index = {name: np.load(os.path.join(directory, "index", f"{name}.npy"), mmap_mode="r")
+                      for name in _INDEX_ARRAYS}
+        self.companies = np.load(os.path.join(directory, "index", "companies.npy"), mmap_mode="r")
+        self._tables: Dict[int, object] = {}
+
+    @property
+    def periods(self) -> List[str]:
+        return self.manifest["periods"]
+
+    @property
+    def columns(self) -> List[str]:
+        return self.manifest["columns"]
+
+    @property
+    def n_rows(self) -> int:
+        return self.manifest["rows"]
+
+    def _period_table(self, i: int):
+        table = self._tables.get(i)
+        if table is None:
+            import pyarrow as pa
+            import pyarrow.ipc as ipc
+
+            # Zero-copy: column buffers point into the memory-mapped file
+            table = ipc.open_file(pa.memory_map(os.path.join(self.directory, "periods", f"{i:05d}.arrow"))).read_all()
+            self._tables[i] = table
+        return table
+
+    def _period_positions(self, periods: Optional[Iterable[str]],
+                          period_range: Optional[Tuple[Optional[str], Optional[str]]]) -> List[int]:
+        if periods is None and period_range is None:
+            return list(range(len(self.manifest["period_rows"])))
+        positions = range(len(self.periods))
+        if periods is not None:
+            wanted = [str(p) for p in periods]
+            unknown = sorted(set(wanted) - set(self.periods))
+            if unknown:
+                raise ValueError(f"Unknown periods: {unknown[:10]}")
+            wanted = set(wanted)
+            positions = [i for i in positions if self.periods[i] in wanted]
+        if period_range is not None:
+            lo, hi = period_range
+            positions = [i for i in positions
+                         if (lo is None or self.periods[i] >= str(lo)) and (hi is None or self.periods[i] <= str(hi))]
+        return list(positions)
+
+    def _company_codes(self, companies: Iterable[str]) -> np.ndarray:
+        if not self.manifest["has_company"]:
+            raise ValueError("National dataset has no company column")
+        names = np.array([str(c) for c in companies], dtype=str)
+        codes = np.searchsorted(self.companies, names)
+        found = (codes < len(self.companies)) & (self.companies[np.minimum(codes, len(self.companies) - 1)] == names) \
+            if len(self.companies) else np.zeros(len(names), dtype=bool)
+        if not found.all():
+            raise ValueError(f"Unknown companies: {names[~found][:10].tolist()}")
+        return codes
+
+    def row_ranges(self, periods: Optional[Iterable[str]] = None, companies: Optional[Iterable[str]] = None,
+                   table: Optional[str] = None,
+                   period_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> Dict[int, List[Tuple[int, int]]]:
+        """Period position -> [(start, stop), ...] row ranges matching the filters, adjacent runs merged."""
+        positions = self._period_positions(periods, period_range)
+        if companies is None and table is None:
+            rows = self.manifest["period_rows"]
+            return {i: [(0, rows[i])] for i in positions if rows[i]}
+
+        idx = self.index
+        mask = np.isin(idx["period"], positions)
+        if companies is not None:
+            mask &= np.isin(idx["company"], self._company_codes(companies))
+        if table is not None:
+            if table not in TABLE_CODES:
+                raise ValueError(f"table must be one of {list(TABLE_CODES)}")
+            mask &= idx["table"] == TABLE_CODES[table]
+        sel = np.flatnonzero(mask)
+        period, start, stop = idx["period"][sel], idx["start"][sel], idx["stop"][sel]
+        # Runs are stored in (period, row) order; merge runs that continue the previous one
+        new = np.ones(len(sel), dtype=bool)
+        new[1:] = (period[1:] != period[:-1]) | (start[1:] != stop[:-1])
+        first = np.flatnonzero(new)
+        last = np.concatenate([first[1:], [len(sel)]]) - 1
+        ranges: Dict[int, List[Tuple[int, int]]] = {}
+        for a, b in zip(first, last):
+            ranges.setdefault(int(period[a]), []).append((int(start[a]), int(stop[b])))
+        return ranges
+
+    def _selected(self, columns: Optional[Sequence[str]]) -> List[str]:
+        # Stored columns in file order; UNPARSED_COLUMN only when asked for
+        if columns is None:
+            return list(self.columns)
+        wanted = set(columns)
+        return [c for c in [*self.columns, UNPARSED_COLUMN] if c in wanted]
+
+    def iter_chunks(self, columns: Optional[Sequence[str]] = None, chunksize: int = 250_000,
+                    **filters) -> Iterator[pd.DataFrame]:
+        """
+        Yield the rows matching `filters` (see row_ranges) as DataFrames of about `chunksize`
+        rows. Small selections from consecutive periods are packed into one frame, so a
+        one-company query yields a few frames rather than one per period.
+        """
+        import pyarrow as pa
+
+        selected = self._selected(columns)
+        parts, rows = [], 0
+        for i, ranges in self.row_ranges(**filters).items():
+            table = self._period_table(i).select(selected)
+            for a, b in ranges:
+                for start in range(a, b, chunksize):
+                    length = min(chunksize, b - start)
+                    parts.append(table.slice(start, length))
+                    rows += length
+                    if rows >= chunksize:
+                        yield pa.concat_tables(parts).to_pandas()
+                        parts, rows = [], 0
+        if parts:
+            yield pa.concat_tables(parts).to_pandas()
+
+    @timed("national_store.select")
+    def select(self, columns: Optional[Sequence[str]] = None, **filters) -> pd.DataFrame:
+        """Matching rows as one DataFrame (string columns come back as categoricals)."""
+        frames = list(self.iter_chunks(columns, **filters))
+        if not frames:
+            return pd.DataFrame(columns=self._selected(columns))
+        return pd.concat(frames, ignore_index=True)
+
+    def partitions(self, columns: Optional[Sequence[str]] = None,
+                   **filters) -> Iterator[Tuple[Optional[str], pd.DataFrame]]:
+        """(period, rows) per period matching `filters`; rows without a period come last, as period None."""
+        import pyarrow as pa
+
+        selected = self._selected(columns)
+        for i, ranges in self.row_ranges(**filters).items():
+            table = self._period_table(i).select(selected)
+            period = self.periods[i] if i < len(self.periods) else None
+            yield period, pa.concat_tables([table.slice(a, b - a) for a, b in ranges]).to_pandas()
+
+
+@timed("national_base_sums_store")
+def national_base_sums_store(store: NationalStore, by=("period",), workers: int = 1, chunksize: int = 250_000,
+                             dropna: bool = True, **filters) -> pd.DataFrame:
+    """
+    national_base_sums over the store rows matching `filters` (periods, period_range,
+    companies), chunk by chunk, so only the selected row ranges are read.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    total_rows = sum(b - a for ranges in store.row_ranges(**filters).values() for a, b in ranges)
+    frames = store.iter_chunks(set(by) | set(NATIONAL_VALUE_COLUMNS), chunksize, **filters)
+    running = None
+    for partial in _map_chunks(frames, by, workers, dropna, total_rows):
+        running = partial if running is None else _combine_base_sums(running, partial)
+    if running is None:
+        raise ValueError("No national rows match the selection")
+    return running
+
+
+def national_aggregate_store(store: NationalStore, settings: Dict, by=("period",), workers: int = 1,
+                             chunksize: int = 250_000, **filters) -> pd.DataFrame:
+    compute = lambda keys, dropna: national_base_sums_store(store, keys, workers, chunksize, dropna,  # noqa: E731
+                                                            **filters)
+    return national_metrics_from_sums(national_sums(compute, by, settings, store.columns), settings)
@@ -0,0 +1,69 @@
+"""
+Server-side filtering, sorting and paging of typed DataFrames for table views.
+
+Filters and sorts work on the typed columns. Numbers compare as numbers, and categoricals
+are matched once per category rather than per row. A view is a row-position array, and
+only the rows of the visible page are sliced out of the frame.
+"""
+import operator
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+_NUMERIC_FILTER = re.compile(r"^\s*(>=|<=|!=|==|=|>|<)?\s*([-+]?[\d_,]*\.?\d+(?:[eE][-+]?\d+)?)\s*$")
+_OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+}
+
+
+def filter_mask(column: pd.Series, text: str) -> np.ndarray:
+    """
+    Rows of `column` matching `text`. Numeric columns take a comparison (">= 1000",
+    "< 0.5", "= 3"; a bare number means equality); other columns match a case-insensitive
+    substring.
+    """
+    text = text.strip()
+    if not text:
+        return np.ones(len(column), dtype=bool)
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        m = _NUMERIC_FILTER.match(text)
+        if m is None:
+            raise ValueError(f"Numeric filter must look like '>= 1000', got {text!r}")
+        value = float(m.group(2).replace(",", "").replace("_", ""))
+        return _OPERATORS[m.group(1) or "="](column.to_numpy(dtype=float, na_value=np.nan), value)
+    needle = text.casefold()
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        hits = np.array([needle in str(c).casefold() for c in column.cat.categories] + [False], dtype=bool)
+        # code -1 (missing) picks the trailing False
+        return hits[column.cat.codes.to_numpy()]
+    return column.astype("string").str.casefold().str.contains(needle, regex=False).fillna(False).to_numpy(dtype=bool)
+
+
+def view_positions(df: pd.DataFrame, sort_by: Optional[str] = None, ascending: bool = True,
+                   filter_column: Optional[str] = None, filter_text: str = "") -> Optional[np.ndarray]:
+    """Row positions of the filtered and sorted view, or None when neither is active (frame order)."""
+    positions = None
+    if filter_column is not None and filter_text.strip():
+        positions = np.flatnonzero(filter_mask(df[filter_column], filter_text))
+    if sort_by is not None:
+        column = df[sort_by] if positions is None else df[sort_by].iloc[positions]
+        order = (column.reset_index(drop=True)
+                 .sort_values(ascending=ascending, na_position="last", kind="stable")
+                 .index.to_numpy())
+        positions = order if positions is None else positions[order]
+    return positions
+
+
+def page_count(n_rows: int, page_size: int) -> int:
+    return max(1, -(-n_rows // page_size))
+
+
+def page_rows(df: pd.DataFrame, page: int, page_size: int, positions: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Rows of the 1-based `page` of the view."""
+    start = (page - 1) * page_size
+    if positions is None:
+        return df.iloc[start:start + page_size]
+    return df.iloc[positions[start:start + page_size]]
@@ -0,0 +1,313 @@
+"""
+Vectorised data-quality screening, run before tables reach the aggregations.
+
+prepare_* and the metric functions silently turn unparsable numbers into 0 / NaN and
+sum whatever is left. screen() looks at the raw table first and flags each row in one
+pass, as a bitmask of issues:
+
+- not_numeric: a value is present but does not parse as a number (it would become 0)
+- missing: a required value is empty
+- negative: a quantity, price, cost, … below zero
+- zero: a denominator that must be positive (workers of a unit) is zero
+- unknown_table: a national row whose table is neither product nor input (never summed)
+- outlier: robust z-score |x − median| / (MAD / 0.6745) above z_max, on log prices or
+  unit costs per product / resource and period (per period for units' rates). Groups
+  with fewer than min_group values are not scored; a group whose MAD is 0 falls back
+  to the mean absolute deviation.
+
+Flags are kept as one byte per row. The report has one row per (check, column); the
+flagged rows can be dropped (passed) or set aside with a readable issues column
+(quarantined).
+
+    screening = screen(inputs_df, "inputs")
+    screening.report()
+    metrics = productivity_metrics(products, screening.passed(inputs_df))
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+from .national import _group_ids
+
+NOT_NUMERIC, MISSING, NEGATIVE, ZERO, UNKNOWN_TABLE, OUTLIER = 1, 2, 4, 8, 16, 32
+ISSUES: Dict[int, str] = {NOT_NUMERIC: "not_numeric", MISSING: "missing", NEGATIVE: "negative", ZERO: "zero",
+                          UNKNOWN_TABLE: "unknown_table", OUTLIER: "outlier"}
+
+# kind -> numeric columns screened, required columns (missing flagged), columns that must be > 0
+_RULES: Dict[str, Tuple[List[str], List[str], List[str]]] = {
+    "products": (["quantity", "price", "std_hours"], ["quantity"], []),
+    "inputs": (["quantity", "unit_cost"], ["quantity", "unit_cost"], []),
+    "national": (["quantity", "price", "std_hours", "unit_cost"], ["quantity"], []),
+    "units": (["output", "workers", "hours", "labour_cost"], ["output", "workers", "labour_cost"], ["workers"]),
+}
+
+# kind -> [(label, numerator, denominator or None, item key or None, national table)] for outlier scores
+_OUTLIER_RATES = {
+    "products": [("price", "price", None, "product", None)],
+    "inputs": [("unit_cost", "unit_cost", None, "resource", None)],
+    "national": [("price", "price", None, "product", "product"),
+                 ("unit_cost", "unit_cost", None, "resource", "input")],
+    "units": [("output/workers", "output", "workers", None, None),
+              ("labour_cost/workers", "labour_cost", "workers", None, None)],
+}
+
+# National columns that only mean something on one kind of row
+_NATIONAL_SCOPE = {"price": "product", "std_hours": "product", "unit_cost": "input"}
+
+_EXAMPLES = 5
+
+
+class Screening:
+    """Issue bitmask per row of a screened table (0 = clean) and the per-check counts."""
+
+    def __init__(self, kind: str, flags: np.ndarray, checks: List[Dict]):
+        self.kind = kind
+        self.flags = flags
+        self.checks = checks
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    @property
+    def n_flagged(self) -> int:
+        return int(np.count_nonzero(self.flags))
+
+    def report(self) -> pd.DataFrame:
+        """One row per check and column that flagged anything: rows, share of rows, example row labels."""
+        n = max(len(self.flags), 1)
+        rows = [{**c, "share_pct": 100.0 * c["rows"] / n} for c in self.checks if c["rows"]]
+        return pd.DataFrame(rows, columns=["check", "column", "rows", "share_pct", "examples"])
+
+    def _check_frame(self, df: pd.DataFrame) -> None:
+        if len(df) != len(self.flags):
+            raise ValueError(f"Screening covers {len(self.flags):,} rows, table has {len(df):,}")
+
+    def passed(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of the screened table without any issue (the table itself when all are clean)."""
+        self._check_frame(df)
+        return df if not self.n_flagged else df[self.flags == 0]
+
+    def quarantined(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Flagged rows of the screened table, with an `issues` column (e.g. "negative;outlier")."""
+        self._check_frame(df)
+        bad = self.flags != 0
+        return df[bad].assign(issues=describe(self.flags[bad]))
+
+
+def describe(flags: np.ndarray) -> np.ndarray:
+    """Issue names per flag value, joined by ";" (one string built per distinct value)."""
+    values, inverse = np.unique(flags, return_inverse=True)
+    names = np.array([";".join(name for bit, name in ISSUES.items() if v & bit) for v in values], dtype=object)
+    return names[inverse]
+
+
+def _numeric(s: pd.Series) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # (values as float64, mask of present-but-unparsable values or None when the column is numeric)
+    if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        return s.to_numpy(dtype=np.float64, na_value=np.nan), None
+    values = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    failed = np.isnan(values)
+    if failed.any():
+        raw = s[failed]
+        blank = raw.isna().to_numpy() | (raw.astype("string").str.strip() == "").to_numpy(dtype=bool, na_value=True)
+        failed[np.flatnonzero(failed)[blank]] = False
+    return values, failed
+
+
+def _group_sorted(values: np.ndarray, g: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Values sorted by group, then by value, in one value sort: the key is offset by group
+    # (exact to about 1e-9 of the value range, plenty for medians of log prices)
+    lo = values.min()
+    span = (values.max() - lo) * 1.001 + 1.0
+    group_of_sorted = np.repeat(np.arange(len(counts)), counts)
+    return np.sort(g * span + (values - lo)) - group_of_sorted * span + lo
+
+
+def _group_median(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Median per group of values sorted within each group; NaN for empty groups
+    last = len(sorted_values) - 1
+    lo = np.minimum(starts + (counts - 1) // 2, last)
+    hi = np.minimum(starts + counts // 2, last)
+    return np.where(counts > 0, 0.5 * (sorted_values[lo] + sorted_values[hi]), np.nan)
+
+
+def robust_z(values: np.ndarray, gid: np.ndarray, n_groups: int, min_group: int = 5) -> np.ndarray:
+    """
+    Robust z-score of log(values) within each group (gid -1 = no group). Non-positive, infinite
+    or NaN values, and groups with fewer than min_group scored values, get NaN.
+    """
+    z = np.full(len(values), np.nan)
+    rows = np.flatnonzero((values > 0) & np.isfinite(values) & (gid >= 0))
+    if not len(rows):
+        return z
+    x, g = np.log(values[rows]), gid[rows]
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    median = _group_median(_group_sorted(x, g, counts), starts, counts)
+    dev = np.abs(x - median[g])
+    mad = _group_median(_group_sorted(dev, g, counts), starts, counts)
+    mean_ad = np.bincount(g, weights=dev, minlength=n_groups) / np.maximum(counts, 1)
+    # 0.6745 = normal quantile at 0.75, sqrt(pi/2) = 1.2533 for the mean absolute deviation
+    scale = np.where(mad > 0, mad / 0.6745, mean_ad * 1.2533)[g]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scored = np.where(scale > 0, (x - median[g]) / scale, 0.0)
+    scored[counts[g] < min_group] = np.nan
+    z[rows] = scored
+    return z
+
+
+@timed("screen")
+def screen(df: pd.DataFrame, kind: str, z_max: float = 3.5, min_group: int = 5,
+           parse_failures: Optional[Dict[str, np.ndarray]] = None) -> Screening:
+    """
+    Screen a raw products / inputs / national / units table (before prepare_*). Every check
+    is a column operation; outlier scores need two value sorts per rate. z_max=None skips them.
+    For columns already parsed to numbers, parse_failures gives the mask of values that did
+    not parse (as recorded by national_store.ingest).
+    """
+    if kind not in _RULES:
+        raise ValueError(f"kind must be one of {list(_RULES)}")
+    numeric, required, positive = _RULES[kind]
+    n = len(df)
+    flags = np.zeros(n, dtype=np.uint8)
+    checks: List[Dict] = []
+    labels = df.index
+
+    def flag(check: str, column: str, mask: np.ndarray, bit: int) -> None:
+        hits = np.flatnonzero(mask)
+        flags[hits] |= bit
+        checks.append({"check": check, "column": column, "rows": len(hits),
+                       "examples": ", ".join(str(v) for v in labels[hits[:_EXAMPLES]])})
+
+    scope = {}
+    if kind == "national":
+        table_col = "table" if "table" in df.columns else "type"
+        if table_col not in df.columns:
+            raise ValueError("National dataset missing required column: table")
+        table = df[table_col]
+        scope = {"product": (table == "product").to_numpy(dtype=bool), "input": (table == "input").to_numpy(dtype=bool)}
+        flag("unknown_table", table_col, ~(scope["product"] | scope["input"]), UNKNOWN_TABLE)
+
+    values = {}
+    for col in numeric:
+        if col not in df.columns:
+            if col in required:
+                raise ValueError(f"Table missing required column: {col}")
+            continue
+        v, failed = _numeric(df[col])
+        if parse_failures is not None and col in parse_failures:
+            failed = parse_failures[col]
+        values[col] = v
+        applies = scope.get(_NATIONAL_SCOPE.get(col)) if kind == "national" else None
+        within = (lambda m: m & applies) if applies is not None else (lambda m: m)
+        if failed is not None:
+            flag("not_numeric", col, within(failed), NOT_NUMERIC)
+        if col in required:
+            empty = np.isnan(v) if failed is None else np.isnan(v) & ~failed
+            flag("missing", col, within(empty), MISSING)
+        flag("negative", col, within(v < 0), NEGATIVE)
+        if col in positive:
+            flag("zero", col, within(v == 0), ZERO)
+
+    if z_max is not None:
+        for label, num, den, item, table_kind in _OUTLIER_RATES[kind]:
+            if num not in values or (den is not None and den not in values) or (item and item not in df.columns):
+                continue
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rate = values[num] / values[den] if den is not None else values[num]
+            keys = [df[k] for k in ([item] if item else []) + (["period"] if "period" in df.columns else [])]
+            if keys:
+                gid, index = _group_ids(keys)
+                n_groups = len(index)
+            else:
+                gid, n_groups = np.zeros(n, dtype=np.int64), 1
+            if table_kind is not None:
+                gid = np.where(scope[table_kind], gid, -1)
+            z = robust_z(rate, gid, n_groups, min_group)
+            with np.errstate(invalid="ignore"):
+                flag("outlier", label, np.abs(z) > z_max, OUTLIER)
+    return Screening(kind, flags, checks)
+
+
+def _screen_partitions(store, z_max: float, min_group: int, **filters):
+    # (period, rows, screening) per store partition, with the parse failures recorded at ingest
+    from .national_store import UNPARSED_COLUMN, parse_failures
+
+    for period, frame in store.partitions([*store.columns, UNPARSED_COLUMN], **filters):
+        failures = parse_failures(frame) if UNPARSED_COLUMN in frame.columns else None
+        frame = frame.drop(columns=UNPARSED_COLUMN, errors="ignore")
+        yield period, frame, screen(frame, "national", z_max, min_group, parse_failures=failures)
+
+
+@timed("screen_store")
+def screen_store(store, z_max: float = 3.5, min_group: int = 5, **filters) -> pd.DataFrame:
+    """
+    Screening report of the NationalStore rows matching `filters` (see row_ranges), one
+    period in memory at a time; outlier groups are per period, so this equals screening
+    the whole selection. Values were parsed at ingest; not_numeric comes from the parse
+    failures recorded then. Rows without a period are skipped. Examples read "period#row".
+    """
+    from .jobs import report_progress
+
+    totals: Dict[Tuple[str, str], Dict] = {}
+    ranges = store.row_ranges(**filters)
+    total = sum(b - a for spans in ranges.values() for a, b in spans)
+    done = 0
+    for period, frame, screening in _screen_partitions(store, z_max, min_group, **filters):
+        if period is None:
+            continue
+        for c in screening.checks:
+            entry = totals.setdefault((c["check"], c["column"]), {**c, "rows": 0, "examples": []})
+            entry["rows"] += c["rows"]
+            if c["rows"]:
+                entry["examples"] += [f"{period}#{e}" for e in c["examples"].split(", ")]
+        done += len(frame)
+        report_progress(done, total)
+    rows = [{**e, "share_pct": 100.0 * e["rows"] / max(done, 1), "examples": ", ".join(e["examples"][:_EXAMPLES])}
+            for e in totals.values() if e["rows"]]
+    return pd.DataFrame(rows, columns=["check", "column", "rows", "share_pct", "examples"])
+
+
+@timed("quarantine_store")
+def quarantine_store(store, z_max: float = 3.5, min_group: int = 5):
+    """
+    NationalStore of the rows of `store` that pass the screen, to aggregate without the
+    flagged ones. It is built next to `store` once per threshold, one period in memory at
+    a time, and reopened afterwards.
+    """
+    import tempfile
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from .jobs import report_progress
+    from .national_store import _FLOAT_COLUMNS, NationalStore, ingest
+    from .result_cache import fingerprint
+
+    parent = os.path.dirname(os.path.abspath(store.directory))
+    directory = os.path.join(parent, f"{os.path.basename(store.directory)}.passed-"
+                                     f"{fingerprint('quarantine', z_max, min_group)[:16]}")
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        return NationalStore(directory)
+
+    schema = pa.schema([(c, pa.float64() if c in _FLOAT_COLUMNS else pa.string()) for c in store.columns])
+    fd, path = tempfile.mkstemp(dir=parent, prefix=".passed-", suffix=".parquet")
+    os.close(fd)
+    try:
+        kept = done = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for _, frame, screening in _screen_partitions(store, z_max, min_group):
+                passed = screening.passed(frame)
+                text = {c: "string" for c in passed.columns if c not in _FLOAT_COLUMNS}
+                writer.write_table(pa.Table.from_pandas(passed.astype(text), schema=schema, preserve_index=False))
+                kept += len(passed)
+                done += len(frame)
+                report_progress(done, store.n_rows)
+        if not kept:
+            raise ValueError("Every row was flagged by the data-quality screen")
+        return ingest(path, directory)
+    finally:
+        os.remove(path)
@@ -0,0 +1,155 @@
+"""
+In-memory registry of parsed tables, shared by every tab and session of a server process.
+
+An upload is hashed by content once; Streamlit's file_id remembers the hash, so later
+reruns skip even the hash. The parsed frame is kept under that hash, so the same file
+uploaded in another tab, or by another user, is parsed once and shared by reference.
+Entries are evicted least-recently-used first once their total in-memory size exceeds
+the budget.
+
+The registry itself is not scoped to a user. Front ends list to each session only the
+digests that session loaded (see datasets(digests=…)); a digest is only known to those
+who had the content.
+
+Registered frames are shared: treat them as read-only (derive new frames instead of
+assigning into them), as with prepared frames (see schema).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .instrumentation import timed
+from .result_cache import fingerprint
+from .tabular_io import _rewind, read_table
+
+
+class Dataset:
+    __slots__ = ("digest", "name", "frame", "size_bytes", "loaded", "last_used")
+
+    def __init__(self, digest: str, name: str, frame: pd.DataFrame):
+        self.digest = digest
+        self.name = name
+        self.frame = frame
+        self.size_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+        self.loaded = self.last_used = time.time()
+
+    def columns(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """The frame, or only the listed columns that it has (missing ones are skipped, as in read_table)."""
+        if columns is None:
+            return self.frame
+        return self.frame[[c for c in columns if c in self.frame.columns]]
+
+
+class DatasetRegistry:
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Dataset]" = OrderedDict()
+        # file_id -> content digest, so an upload is hashed only once
+        self._digests: Dict[str, str] = {}
+        # digest -> event set when an in-flight parse finishes
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DatasetRegistry":
+        """Memory budget from PRODUCTIVITY_REGISTRY_MAX_MB (default 1024)."""
+        return cls(int(float(os.environ.get("PRODUCTIVITY_REGISTRY_MAX_MB", "1024")) * 1024 * 1024))
+
+    def digest(self, source) -> str:
+        file_id = getattr(source, "file_id", None)
+        with self._lock:
+            known = self._digests.get(file_id) if file_id is not None else None
+        if known is not None:
+            return known
+        if isinstance(source, (str, os.PathLike)):
+            # Paths are identified by location, size and modification time instead of a full read
+            stat = os.stat(source)
+            digest = fingerprint("path", os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+        else:
+            digest = fingerprint(source)
+        if file_id is not None:
+            with self._lock:
+                self._digests[file_id] = digest
+        return digest
+
+    @timed("registry.read")
+    def read(self, source) -> Dataset:
+        """
+        The registered dataset for `source` (path or uploaded file), parsing it only if no
+        session has registered the same content yet. Concurrent reads of one file parse it once.
+        """
+        digest = self.digest(source)
+        while True:
+            with self._lock:
+                entry = self._entries.get(digest)
+                if entry is not None:
+                    self._entries.move_to_end(digest)
+                    entry.last_used = time.time()
+                    self.hits += 1
+                    return entry
+                waiting = self._loading.get(digest)
+                if waiting is None:
+                    self._loading[digest] = threading.Event()
+                    self.misses += 1
+                    break
+            waiting.wait()
+        try:
+            # All columns are kept, so tabs needing different subsets share one parse
+            _rewind(source)
+            entry = Dataset(digest, getattr(source, "name", str(source)), read_table(source))
+            with self._lock:
+                self._entries[digest] = entry
+                self._evict()
+            return entry
+        finally:
+            with self._lock:
+                self._loading.pop(digest).set()
+
+    def get(self, digest: str) -> Optional[Dataset]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                entry.last_used = time.time()
+            return entry
+
+    def datasets(self, digests: Optional[Iterable[str]] = None) -> List[Dataset]:
+        """Registered datasets (only those among `digests`, if given), most recently used first."""
+        with self._lock:
+            entries = list(reversed(self._entries.values()))
+        if digests is None:
+            return entries
+        wanted = set(digests)
+        return [e for e in entries if e.digest in wanted]
+
+    def _evict(self) -> None:
+        # Caller holds the lock; the newest entry stays even if it alone exceeds the budget
+        total = sum(e.size_bytes for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size_bytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": sum(e.size_bytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,200 @@
+"""
+Persistent, content-addressed result cache.
+
+Results are stored as Arrow IPC files in a directory (which may be shared between
+replicas), keyed by a hash of the input data and the settings dict. Reading an entry
+only decodes column data and the pandas index metadata, so a writable shared directory
+cannot make readers run code, unlike pickles. The total size on disk is bounded;
+least-recently-used entries are evicted first (file mtime is the recency clock,
+refreshed on every hit).
+
+Every fingerprint includes CACHE_VERSION, so entries written by code that computed
+results differently are never served; bump it whenever a cached result changes meaning.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from .tabular_io import _require_pyarrow
+
+# Version of the cached results' semantics and layout, hashed into every fingerprint.
+# 1: national cube sums with store filters, per-period deflators, data-quality screen
+#    reports and sampled cube sums
+# 2: entries stored as Arrow IPC instead of pickles
+CACHE_VERSION = 2
+
+_SUFFIX = ".arrow"
+_HASH_BLOCK = 1 << 20
+
+
+def _update_with_frame(h, df: pd.DataFrame) -> None:
+    h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+
+def _update_with_file(h, f) -> None:
+    if hasattr(f, "getvalue"):
+        h.update(f.getvalue())
+        return
+    pos = f.tell()
+    f.seek(0)
+    for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+        h.update(block)
+    f.seek(pos)
+
+
+def _write_frame(df: pd.DataFrame, path: str) -> None:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    # The index (e.g. the cube's dimension levels) travels in the schema's pandas metadata
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_frame(path: str) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    with pa.OSFile(path, "rb") as source:
+        return ipc.open_file(source).read_all().to_pandas()
+
+
+def fingerprint(*parts, settings: Optional[Dict] = None) -> str:
+    """
+    Hash DataFrames, file-like objects (hashed by content), bytes and plain values
+    together with a settings dict and CACHE_VERSION into a hex digest.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"v{CACHE_VERSION}".encode("ascii"))
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            h.update(b"df")
+            _update_with_frame(h, part)
+        elif isinstance(part, (bytes, bytearray)):
+            h.update(b"bytes")
+            h.update(part)
+        elif hasattr(part, "read"):
+            h.update(b"file")
+            _update_with_file(h, part)
+        else:
+            h.update(b"value")
+            h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    # Tables inside settings (e.g. a deflator series) are hashed by content, not by repr
+    settings = {k: fingerprint(v) if isinstance(v, pd.DataFrame) else v for k, v in (settings or {}).items()}
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        _require_pyarrow()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Directory from PRODUCTIVITY_CACHE_DIR, size limit from PRODUCTIVITY_CACHE_MAX_MB."""
+        directory = os.environ.get("PRODUCTIVITY_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "productivity"))
+        max_mb = float(os.environ.get("PRODUCTIVITY_CACHE_MAX_MB", "512"))
+        return cls(directory, int(max_mb * 1024 * 1024))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        try:
+            result = _read_frame(path)
+            os.utime(path)
+        except FileNotFoundError:
+            result = None
+        except Exception:
+            # Truncated/corrupt entry: drop it and recompute
+            result = None
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result: pd.DataFrame) -> None:
+        # Write-then-rename so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            _write_frame(result, tmp)
+            os.replace(tmp, self._path(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        for path, st in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= st.st_size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        for path, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        entries = list(self._entries())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_bytes": sum(st.st_size for _, st in entries),
+            "max_bytes": self.max_bytes,
+        }
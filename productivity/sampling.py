@@ -0,0 +1,166 @@
+"""
+Sampled quick look at national metrics, refined towards the exact cube.
+
+Companies are sampled independently (Poisson sampling) with inclusion probability
+`fraction`. Every period of a sampled company is kept, so each period (stratum) is
+estimated from the same panel of companies and trends are not blurred by changes in
+membership. Whether a company is in the sample depends only on a hash of its name and
+the seed. Samples are therefore nested: the 10% sample contains the 2% sample, and a
+refinement reads only the newly added companies' rows (from a store, only their row
+ranges).
+
+Totals are Horvitz–Thompson estimates (sampled sums / fraction). Ratios such as TFP are
+ratio estimates; the weights cancel, so they come straight from the sampled sums. The
+confidence intervals use the Poisson-sampling variances:
+
+    var(Ŷ) = (1 − f) / f² · Σ y_i²        var(R̂) = (1 − f) · Σ (y_i − R̂ x_i)² / (Σ x_i)²
+
+with one term per sampled company in the group. Groups without sampled companies are
+missing from an estimate.
+
+    sample = sample_cube(store, 0.02)
+    sample.estimate(settings, by=["period"])          # TFP_value_based, TFP_value_based_lo/_hi, …
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .cube import CUBE_DIMENSIONS, NationalCube, _dimensions
+from .instrumentation import timed
+from .metrics import deflate_value
+from .national import _combine_base_sums, national_base_sums_parallel, national_metrics_from_sums
+
+# Sample fractions of the quick-look stages before the exact cube
+QUICK_LOOK_FRACTIONS: List[float] = [0.02, 0.1, 0.3]
+
+# A stage is only worth running when it is expected to sample at least this many companies
+MIN_SAMPLED_COMPANIES = 30
+
+# Estimated metrics that get a confidence interval (ratios of output to input cost, and the totals)
+CI_METRICS: List[str] = ["real_output_value", "real_input_cost", "TFP_value_based"]
+
+
+def quick_look_fractions(n_companies: int) -> List[float]:
+    """The QUICK_LOOK_FRACTIONS stages that sample enough of n_companies (none for small panels)."""
+    return [f for f in QUICK_LOOK_FRACTIONS if f * n_companies >= MIN_SAMPLED_COMPANIES]
+
+
+def company_draws(companies, seed: int = 0) -> np.ndarray:
+    """Uniform [0, 1) draw per company, fixed by its name and the seed."""
+    labels = np.asarray(pd.Index(companies).astype(str), dtype=object)
+    hashes = pd.util.hash_array(labels, hash_key=f"{seed:016x}"[-16:])
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def sample_companies(companies, fraction: float, seed: int = 0, above: float = 0.0) -> List:
+    """Companies whose draw falls in [above, fraction): the sample at `fraction` minus the one at `above`."""
+    companies = pd.Index(companies)
+    draws = company_draws(companies, seed)
+    return companies[(draws >= above) & (draws < fraction)].tolist()
+
+
+@timed("sample_base_sums")
+def sample_base_sums(source, fraction: float, seed: int = 0, previous: Optional[pd.DataFrame] = None,
+                     previous_fraction: float = 0.0, workers: int = 1, **filters) -> pd.DataFrame:
+    """
+    Cube base sums (finest grain) of the companies sampled at `fraction`, from a
+    NationalStore (filters as in row_ranges) or an in-memory dataset. With the sums of
+    the sample at previous_fraction, only the companies added since are read.
+    """
+    if previous is None:
+        previous_fraction = 0.0
+    if hasattr(source, "row_ranges"):
+        from .national_store import national_base_sums_store
+
+        dims = _dimensions(source.columns, CUBE_DIMENSIONS)
+        if "company" not in dims:
+            raise ValueError("Sampling needs a company column")
+        pool = filters.pop("companies", None)
+        added = sample_companies(source.companies if pool is None else pool, fraction, seed, previous_fraction)
+        new = national_base_sums_store(source, dims, workers, dropna=False, companies=added, **filters) if added else None
+    else:
+        if filters:
+            raise ValueError("Filters need a NationalStore")
+        dims = _dimensions(source.columns, CUBE_DIMENSIONS)
+        if "company" not in dims:
+            raise ValueError("Sampling needs a company column")
+        codes, companies = pd.factorize(source["company"])
+        draws = company_draws(companies, seed)
+        picked = (draws >= previous_fraction) & (draws < fraction)
+        rows = (codes >= 0) & picked[np.maximum(codes, 0)]
+        new = national_base_sums_parallel(source[rows], dims, workers, dropna=False) if rows.any() else None
+    if new is None:
+        if previous is None:
+            raise ValueError(f"No companies sampled at fraction {fraction:g}; use a larger fraction")
+        return previous
+    return (new if previous is None else _combine_base_sums(previous, new)).sort_index()
+
+
+class SampledCube:
+    """Cube base sums of a company sample drawn with inclusion probability `fraction`."""
+
+    def __init__(self, sums: pd.DataFrame, fraction: float):
+        self.sums = sums
+        self.fraction = min(float(fraction), 1.0)
+
+    @property
+    def cube(self) -> NationalCube:
+        return NationalCube(self.sums)
+
+    @timed("sampled_cube.estimate")
+    def estimate(self, settings: Dict, by: Sequence[str] = (), z: float = 1.96, **filters) -> pd.DataFrame:
+        """
+        Estimated metrics per group (national_metrics_from_sums columns), with
+        `{metric}_lo` / `{metric}_hi` at ±z standard errors for CI_METRICS, plus
+        companies_sampled and sample_fraction.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        f = self.fraction
+        per_company = self.cube._deflated(settings).rollup([*by, "company"], **filters)
+        if by:
+            totals = per_company.groupby(level=by, sort=True, observed=True).sum()
+            group = per_company.index.droplevel("company")
+            position = totals.index.get_indexer(group)
+        else:
+            totals = per_company.sum().to_frame().T
+            totals.index = pd.Index(["ALL"], name="nation")
+            position = np.zeros(len(per_company), dtype=np.int64)
+        out = national_metrics_from_sums(totals / f, settings)
+
+        # Per-company linear variables, chosen like the group-level output/input columns
+        use_price = settings.get("use_price_output", True) & (totals["price_rows"].to_numpy() > 0)[position]
+        if "real_output_value" in per_company.columns:
+            y = np.where(use_price, per_company["real_output_value"], per_company["real_output_quantity"])
+            x = per_company["real_input_cost"].to_numpy(dtype=float)
+        else:
+            y = deflate_value(np.where(use_price, per_company["output_value"], per_company["output_quantity"]),
+                              settings.get("price_deflator"))
+            x = deflate_value(per_company["input_cost"].to_numpy(dtype=float), settings.get("input_deflator"))
+        n_groups = len(totals)
+
+        def group_sum(values) -> np.ndarray:
+            return np.bincount(position, weights=values, minlength=n_groups)
+
+        sum_y, sum_x = group_sum(y), group_sum(x)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(sum_x != 0, sum_y / sum_x, np.nan)
+            se = {
+                "real_output_value": np.sqrt((1 - f) / f ** 2 * group_sum(y ** 2)),
+                "real_input_cost": np.sqrt((1 - f) / f ** 2 * group_sum(x ** 2)),
+                "TFP_value_based": np.sqrt((1 - f) * group_sum((y - ratio[position] * x) ** 2)) / np.abs(sum_x),
+            }
+        # Groups left to the example fallback (no sampled product or input rows) get no interval
+        fallback = (totals["product_rows"].to_numpy() == 0) | (totals["input_rows"].to_numpy() == 0)
+        for metric in CI_METRICS:
+            se[metric] = np.where(fallback, np.nan, se[metric])
+            out[f"{metric}_lo"] = out[metric] - z * se[metric]
+            out[f"{metric}_hi"] = out[metric] + z * se[metric]
+        out["companies_sampled"] = np.bincount(position, minlength=n_groups)
+        out["sample_fraction"] = f
+        return out
+
+
+def sample_cube(source, fraction: float, seed: int = 0, workers: int = 1, **filters) -> SampledCube:
+    """SampledCube of a NationalStore selection or an in-memory national dataset."""
+    return SampledCube(sample_base_sums(source, fraction, seed, workers=workers, **filters), fraction)
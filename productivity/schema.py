@@ -0,0 +1,128 @@
+"""
+One-time schema validation and coercion for products, inputs, national and deflator tables.
+
+prepare_* returns a frame whose numeric columns are float64 (with the NaN rules of the
+metric functions already applied) and whose name/key columns are categoricals. The
+result is tagged as prepared, and the metric functions use tagged frames as-is, so
+calling them repeatedly on the same table does not copy or re-coerce it.
+
+Prepared frames are meant to be read-only: derive a new table (and prepare it again)
+rather than assigning into one.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+
+_PREPARED_ATTR = "productivity_prepared"
+
+# kind -> (required columns, float columns with NaN -> 0, float columns keeping NaN, categoricals)
+_SCHEMAS = {
+    "products": (["product", "quantity"], ["quantity"], ["price", "std_hours"], ["product"]),
+    "inputs": (["resource", "quantity", "unit_cost"], ["quantity", "unit_cost"], [], ["resource", "unit"]),
+    "national": ([], ["quantity", "price", "std_hours", "unit_cost"], [],
+                 ["table", "type", "product", "resource", "unit", "company", "sector", "region"]),
+    "deflators": (["period"], [], ["price_deflator", "input_deflator"], []),
+}
+
+_TABLE_NAMES = {"products": "Products", "inputs": "Inputs", "national": "National dataset",
+                "deflators": "Deflator"}
+
+# Key columns of a deflator series; sector is optional
+DEFLATOR_KEYS = ["period", "sector"]
+DEFLATOR_COLUMNS = ["price_deflator", "input_deflator"]
+
+
+def is_prepared(df: pd.DataFrame, kind: str) -> bool:
+    if df.attrs.get(_PREPARED_ATTR) != kind:
+        return False
+    # Cheap guard against frames edited after preparation
+    _, zero_filled, keep_nan, _ = _SCHEMAS[kind]
+    return all(df[c].dtype == np.float64 for c in zero_filled + keep_nan if c in df.columns)
+
+
+def _as_float(s: pd.Series) -> pd.Series:
+    if s.dtype == np.float64:
+        return s
+    return pd.to_numeric(s, errors="coerce").astype(np.float64)
+
+
+def _as_category(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    return s.astype("category")
+
+
+def _prepare(df: pd.DataFrame, kind: str, categorical: bool) -> pd.DataFrame:
+    if is_prepared(df, kind):
+        return df
+    required, zero_filled, keep_nan, categoricals = _SCHEMAS[kind]
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(f"{_TABLE_NAMES[kind]} table missing required column: {col}")
+
+    # Shallow copy: untouched columns are shared, replaced columns never write into `df`
+    out = df.copy(deep=False)
+    for col in zero_filled:
+        if col in out.columns:
+            s = _as_float(out[col])
+            out[col] = s.fillna(0.0) if s.hasnans else s
+    for col in keep_nan:
+        if col in out.columns:
+            out[col] = _as_float(out[col])
+    if kind == "inputs" and "unit" not in out.columns:
+        out["unit"] = "unit"
+    if categorical:
+        for col in categoricals:
+            if col in out.columns:
+                out[col] = _as_category(out[col])
+    out.attrs[_PREPARED_ATTR] = kind
+    return out
+
+
+@timed("prepare_products")
+def prepare_products(df: pd.DataFrame, categorical: bool = True) -> pd.DataFrame:
+    return _prepare(df, "products", categorical)
+
+
+@timed("prepare_inputs")
+def prepare_inputs(df: pd.DataFrame, categorical: bool = True) -> pd.DataFrame:
+    return _prepare(df, "inputs", categorical)
+
+
+@timed("prepare_national")
+def prepare_national(df: pd.DataFrame, categorical: bool = True) -> pd.DataFrame:
+    """Coerce a long-form national table once (numeric NaN -> 0, as national_aggregate does)."""
+    return _prepare(df, "national", categorical)
+
+
+@timed("prepare_deflators")
+def prepare_deflators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deflator series: period, optional sector, and price_deflator and/or input_deflator.
+    Keys become strings (so 2020 and "2020" match); one row per key is required.
+    """
+    if is_prepared(df, "deflators"):
+        return df
+    if not any(c in df.columns for c in DEFLATOR_COLUMNS):
+        raise ValueError(f"Deflator table needs at least one of: {DEFLATOR_COLUMNS}")
+    out = _prepare(df, "deflators", categorical=False)
+    keys = [k for k in DEFLATOR_KEYS if k in out.columns]
+    for key in keys:
+        out[key] = out[key].astype("string").astype(object).where(out[key].notna(), None)
+    duplicated = out.duplicated(subset=keys, keep=False)
+    if duplicated.any():
+        raise ValueError(f"Deflator table has {int(duplicated.sum())} rows with duplicate {keys}")
+    return out[[*keys, *[c for c in DEFLATOR_COLUMNS if c in out.columns]]].reset_index(drop=True)
+
+
+def float_column(df: pd.DataFrame, col: str, fill: Optional[float] = 0.0) -> np.ndarray:
+    """Column as a float64 array, without copying when it already is one and needs no fill."""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    s = _as_float(df[col])
+    if fill is not None and s.hasnans:
+        s = s.fillna(fill)
+    return s.to_numpy(dtype=np.float64, copy=False)
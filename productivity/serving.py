@@ -0,0 +1,179 @@
+"""
+Shared local compute service for multi-user serving.
+
+By default every Streamlit server process runs its own JobRunner. In serving mode one
+compute service owns the job threads and the process pool, and every front end (all
+sessions, any number of Streamlit processes on the host) submits to it:
+
+    PRODUCTIVITY_COMPUTE_AUTHKEY=… python -m productivity serve --address 127.0.0.1:8765 --workers 4
+    PRODUCTIVITY_COMPUTE_ADDRESS=127.0.0.1:8765 PRODUCTIVITY_COMPUTE_AUTHKEY=… streamlit run soal_inter1.py
+
+The service is a JobRunner behind a multiprocessing manager. Identical requests (same key)
+share one job across all front ends, the per-user limit applies across them too, and
+results also go through the shared on-disk ResultCache. Work is sent as run_task(task,
+key, …) with plain arguments (store directories, filters). Large inputs stay on disk:
+national uploads are already ingested into stores named by content hash.
+
+compute_runner() returns a client for the configured service, or the given local
+runner when PRODUCTIVITY_COMPUTE_ADDRESS is unset. Both offer submit / get / cancel /
+stats, so callers do not care which one they have.
+"""
+import os
+from functools import lru_cache
+from multiprocessing.managers import BaseManager
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .jobs import Job, JobRunner
+from .result_cache import ResultCache
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Set by an authenticating reverse proxy, first match wins (see request_user)
+PROXY_USER_HEADERS = ["X-Forwarded-User", "X-Forwarded-Email"]
+
+
+def _national_store(directory: str, quarantine_z: Optional[float]):
+    # The store at `directory`, or the rows of it that pass the data-quality screen
+    from .national_store import NationalStore
+    from .quality import quarantine_store
+
+    store = NationalStore(directory)
+    return store if quarantine_z is None else quarantine_store(store, quarantine_z)
+
+
+def _national_cube(directory: str, filters: Dict, workers: int = 1,
+                   quarantine_z: Optional[float] = None) -> pd.DataFrame:
+    from .cube import build_cube_from_store
+
+    return build_cube_from_store(_national_store(directory, quarantine_z), workers=workers, **filters).sums
+
+
+def _national_screen(directory: str, z_max: float, filters: Dict) -> pd.DataFrame:
+    from .national_store import NationalStore
+    from .quality import screen_store
+
+    return screen_store(NationalStore(directory), z_max, **filters)
+
+
+def _national_sample(directory: str, filters: Dict, fraction: float, previous_key: Optional[str] = None,
+                     previous_fraction: float = 0.0, seed: int = 0, workers: int = 1,
+                     quarantine_z: Optional[float] = None) -> pd.DataFrame:
+    from .sampling import sample_base_sums
+
+    # A refinement extends the previous stage's cached sums (recomputed from scratch if evicted)
+    previous = shared_result_cache().get(previous_key) if previous_key else None
+    return sample_base_sums(_national_store(directory, quarantine_z), fraction, seed, previous, previous_fraction,
+                            workers, **filters)
+
+
+# Work a front end may send to the service: name -> function of plain, picklable arguments
+TASKS: Dict[str, Callable[..., pd.DataFrame]] = {
+    "national_cube": _national_cube,
+    "national_screen": _national_screen,
+    "national_sample": _national_sample,
+}
+
+
+@lru_cache(maxsize=1)
+def shared_result_cache() -> ResultCache:
+    """The process-wide ResultCache (PRODUCTIVITY_CACHE_DIR), also used by run_task."""
+    return ResultCache.from_env()
+
+
+def run_task(task: str, key: str, *args) -> pd.DataFrame:
+    """Run TASKS[task](*args) through the shared result cache under `key`."""
+    if task not in TASKS:
+        raise ValueError(f"Unknown compute task {task!r} (choose from {list(TASKS)})")
+    return shared_result_cache().get_or_compute(key, lambda: TASKS[task](*args))
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _authkey() -> bytes:
+    key = os.environ.get("PRODUCTIVITY_COMPUTE_AUTHKEY")
+    if not key:
+        raise ValueError("Set PRODUCTIVITY_COMPUTE_AUTHKEY (the same secret for the service and its front ends)")
+    return key.encode("utf-8")
+
+
+class ComputeService:
+    """The object served to front ends; method arguments and results travel pickled."""
+
+    def __init__(self, runner: JobRunner):
+        self.runner = runner
+
+    def submit(self, name: str, fn: Callable, args: tuple, kwargs: Dict, key: Optional[str],
+               user: Optional[str]) -> str:
+        return self.runner.submit(name, fn, *args, key=key, user=user, **kwargs)
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        # A pickled snapshot: the front end polls again for updates
+        return self.runner.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        return self.runner.cancel(job_id)
+
+    def stats(self) -> Dict[str, object]:
+        return self.runner.stats()
+
+
+class _Manager(BaseManager):
+    pass
+
+
+def serve(address: str = DEFAULT_ADDRESS, runner: Optional[JobRunner] = None) -> None:
+    """Serve a JobRunner (default: JobRunner.from_env()) at host:port until interrupted."""
+    service = ComputeService(runner or JobRunner.from_env())
+    _Manager.register("service", callable=lambda: service)
+    manager = _Manager(address=parse_address(address), authkey=_authkey())
+    manager.get_server().serve_forever()
+
+
+class ComputeClient:
+    """Front-end side of the service, with the JobRunner methods the apps use."""
+
+    def __init__(self, address: str):
+        self.address = address
+        _Manager.register("service")
+        manager = _Manager(address=parse_address(address), authkey=_authkey())
+        manager.connect()
+        self._service = manager.service()
+
+    def submit(self, name: str, fn: Callable, *args, key: Optional[str] = None, user: Optional[str] = None,
+               **kwargs) -> str:
+        """`fn` and its arguments are pickled, so pass module-level functions such as run_task."""
+        return self._service.submit(name, fn, args, kwargs, key, user)
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        return self._service.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        return self._service.cancel(job_id)
+
+    def stats(self) -> Dict[str, object]:
+        return self._service.stats()
+
+
+def request_user(headers, session_id: str, trust_proxy: bool) -> str:
+    """
+    User for per-user job limits: the proxy-authenticated user from the request `headers`
+    when trust_proxy is set, else the browser session. Only a proxy that overwrites these
+    headers makes them trustworthy; otherwise any client could send a new user name per
+    request and escape the job limit.
+    """
+    if trust_proxy:
+        for name in PROXY_USER_HEADERS:
+            user = (headers.get(name) or "").strip()
+            if user:
+                return user
+    return session_id
+
+
+def compute_runner(local: JobRunner):
+    """ComputeClient for PRODUCTIVITY_COMPUTE_ADDRESS when set, else `local`."""
+    address = os.environ.get("PRODUCTIVITY_COMPUTE_ADDRESS")
+    return ComputeClient(address) if address else local
@@ -0,0 +1,109 @@
+"""
+Synthetic data generators with the same schemas as the app inputs, for benchmarks and
+load tests. All generators are deterministic for a given seed.
+"""
+import numpy as np
+import pandas as pd
+
+from .metrics import PARTIAL_INPUT_MAPPING
+
+# Resource names that hit every category plus unknown names (-> overhead)
+_RESOURCE_STEMS = [k for keys in PARTIAL_INPUT_MAPPING.values() for k in keys] + ["misc", "services", "lainnya"]
+
+
+def resource_names(n_names: int) -> np.ndarray:
+    stems = np.array(_RESOURCE_STEMS, dtype=object)
+    idx = np.arange(n_names)
+    return np.array([f"{stems[i % len(stems)]} {i // len(stems)}" for i in idx], dtype=object)
+
+
+def labour_units(n: int, seed: int = 0) -> pd.DataFrame:
+    """sample1 multi-unit table: unit, output, workers, hours, labour_cost."""
+    rng = np.random.default_rng(seed)
+    workers = rng.integers(0, 500, n).astype(float)
+    hours = workers * rng.uniform(100, 600, n)
+    hours[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        "unit": np.char.add("U", np.arange(n).astype(str)),
+        "output": rng.lognormal(20, 1, n),
+        "workers": workers,
+        "hours": hours,
+        "labour_cost": rng.lognormal(19, 1, n),
+    })
+
+
+def products(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "product": np.char.add("P", np.arange(n).astype(str)),
+        "quantity": rng.integers(0, 10_000, n).astype(float),
+        "price": rng.lognormal(4, 1, n),
+        "std_hours": rng.uniform(0.05, 2.0, n),
+    })
+    df.loc[rng.random(n) < 0.02, "price"] = np.nan
+    return df
+
+
+def inputs(n: int, n_resources: int = 50, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = resource_names(n_resources)
+    return pd.DataFrame({
+        "resource": names[rng.integers(0, n_resources, n)],
+        "quantity": rng.uniform(0, 1_000, n),
+        "unit_cost": rng.lognormal(2, 1, n),
+        "unit": "unit",
+    })
+
+
+def national_dataset(n: int, n_companies: int = 1_000, n_periods: int = 40, n_resources: int = 50,
+                     n_sectors: int = 20, n_regions: int = 34, seed: int = 0) -> pd.DataFrame:
+    """Long-form national table (about half product rows, half input rows)."""
+    rng = np.random.default_rng(seed)
+    company = rng.integers(0, n_companies, n)
+    is_product = rng.random(n) < 0.5
+    periods = np.array([f"{2016 + q // 4}Q{q % 4 + 1}" for q in range(n_periods)], dtype=object)
+    names = resource_names(n_resources)
+    return pd.DataFrame({
+        "company": pd.Categorical.from_codes(company, [f"C{i:06d}" for i in range(n_companies)]),
+        "sector": pd.Categorical.from_codes(company % n_sectors, [f"S{i:02d}" for i in range(n_sectors)]),
+        "region": pd.Categorical.from_codes(company % n_regions, [f"R{i:02d}" for i in range(n_regions)]),
+        "period": periods[rng.integers(0, n_periods, n)],
+        "table": np.where(is_product, "product", "input"),
+        "product": np.where(is_product, np.char.add("P", rng.integers(0, 200, n).astype(str)), None),
+        "resource": np.where(is_product, None, names[rng.integers(0, n_resources, n)]),
+        "quantity": rng.uniform(0, 1_000, n),
+        "price": np.where(is_product, rng.lognormal(4, 1, n), np.nan),
+        "std_hours": np.where(is_product, rng.uniform(0.05, 2.0, n), np.nan),
+        "unit_cost": np.where(is_product, np.nan, rng.lognormal(2, 1, n)),
+        "unit": "unit",
+    })
+
+
+def scenarios(n: int, n_scenarios: int = 1_000, seed: int = 0) -> tuple:
+    """
+    Stacked (products, inputs) for scenario_metrics, about n rows in total. Every
+    scenario shares one plan and scales its quantities and prices by its own factors.
+    """
+    rng = np.random.default_rng(seed)
+    rows = max(n // (2 * n_scenarios), 1)
+    ids = np.array([f"S{i:05d}" for i in range(n_scenarios)], dtype=object)
+    base_p, base_i = products(rows, seed), inputs(rows, seed=seed)
+    scenario_p = np.repeat(ids, rows)
+    scenario_i = np.repeat(ids, rows)
+    scale = lambda base, col: np.tile(base[col].to_numpy(), n_scenarios) * np.repeat(  # noqa: E731
+        rng.uniform(0.8, 1.2, n_scenarios), rows)
+    stacked_p = pd.DataFrame({
+        "scenario": scenario_p,
+        "product": np.tile(base_p["product"].to_numpy(), n_scenarios),
+        "quantity": scale(base_p, "quantity"),
+        "price": scale(base_p, "price"),
+        "std_hours": np.tile(base_p["std_hours"].to_numpy(), n_scenarios),
+    })
+    stacked_i = pd.DataFrame({
+        "scenario": scenario_i,
+        "resource": np.tile(base_i["resource"].to_numpy(), n_scenarios),
+        "quantity": scale(base_i, "quantity"),
+        "unit_cost": scale(base_i, "unit_cost"),
+        "unit": "unit",
+    })
+    return stacked_p, stacked_i
@@ -0,0 +1,187 @@
+"""
+Tabular file I/O shared by the Streamlit apps.
+
+Supports CSV, Parquet and Arrow IPC (Feather). Parquet/Feather need pyarrow, which is
+imported lazily so CSV-only use does not pay for it.
+"""
+import io
+import os
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .instrumentation import timed
+
+# Extensions accepted by st.file_uploader
+UPLOAD_TYPES: List[str] = ["csv", "parquet", "feather", "arrow"]
+
+# Download label -> (file extension, mime type)
+DOWNLOAD_FORMATS: Dict[str, Tuple[str, str]] = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Feather (Arrow IPC)": ("feather", "application/vnd.apache.arrow.file"),
+}
+
+
+def table_format(name) -> str:
+    """Return "csv", "parquet" or "feather" based on a file name / uploaded file."""
+    name = getattr(name, "name", name)
+    ext = os.path.splitext(str(name))[1].lower().lstrip(".")
+    if ext in ("parquet", "pq"):
+        return "parquet"
+    if ext in ("feather", "arrow", "ipc"):
+        return "feather"
+    return "csv"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Feather support requires the 'pyarrow' package") from e
+
+
+def _rewind(source) -> None:
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _arrow_schema_names(source, fmt: str) -> List[str]:
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        names = pq.read_schema(source).names
+    else:
+        names = ipc.open_file(source).schema.names
+    _rewind(source)
+    return names
+
+
+def _select(names: Iterable[str], columns: Optional[Iterable[str]]) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return [c for c in names if c in wanted]
+
+
+def _apply_dtype(df: pd.DataFrame, dtype: Optional[Dict[str, object]]) -> pd.DataFrame:
+    if not dtype:
+        return df
+    return df.astype({k: v for k, v in dtype.items() if k in df.columns})
+
+
+@timed("io.read_table")
+def read_table(source, columns: Optional[Iterable[str]] = None,
+               dtype: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+    """
+    Read a CSV/Parquet/Feather path or uploaded file.
+
+    `columns` lists the columns to load (missing ones are skipped, so optional columns
+    can be requested); `dtype` maps column names to dtypes.
+    """
+    fmt = table_format(source)
+    if fmt == "csv":
+        wanted = None if columns is None else set(columns)
+        return pd.read_csv(source, usecols=None if wanted is None else (lambda c: c in wanted), dtype=dtype)
+
+    _require_pyarrow()
+    selected = _select(_arrow_schema_names(source, fmt), columns)
+    if fmt == "parquet":
+        df = pd.read_parquet(source, columns=selected)
+    else:
+        df = pd.read_feather(source, columns=selected)
+    return _apply_dtype(df, dtype)
+
+
+def table_columns(source) -> List[str]:
+    """Column names of a CSV/Parquet/Feather path or uploaded file, without reading rows."""
+    fmt = table_format(source)
+    if fmt == "csv":
+        names = list(pd.read_csv(source, nrows=0).columns)
+        _rewind(source)
+        return names
+    _require_pyarrow()
+    return _arrow_schema_names(source, fmt)
+
+
+@timed("io.read_table_preview")
+def read_table_preview(source, nrows: int) -> pd.DataFrame:
+    """Read at most `nrows` rows and rewind the source for a later full read."""
+    fmt = table_format(source)
+    if fmt == "csv":
+        df = pd.read_csv(source, nrows=nrows)
+    else:
+        df = next(iter_table_chunks(source, chunksize=nrows), pd.DataFrame())
+    _rewind(source)
+    return df
+
+
+def iter_table_chunks(source, columns: Optional[Iterable[str]] = None, chunksize: int = 250_000,
+                      dtype: Optional[Dict[str, object]] = None) -> Iterator[pd.DataFrame]:
+    """Yield the table in DataFrame chunks of at most `chunksize` rows."""
+    fmt = table_format(source)
+    if fmt == "csv":
+        wanted = None if columns is None else set(columns)
+        yield from pd.read_csv(source, chunksize=chunksize,
+                               usecols=None if wanted is None else (lambda c: c in wanted), dtype=dtype)
+        return
+
+    _require_pyarrow()
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    selected = _select(_arrow_schema_names(source, fmt), columns)
+    if fmt == "parquet":
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=selected)
+    else:
+        reader = ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        if selected is not None:
+            batches = (b.select(selected) for b in batches)
+    for batch in batches:
+        # IPC batches are written by the producer and may exceed chunksize
+        for start in range(0, max(batch.num_rows, 1), chunksize):
+            yield _apply_dtype(batch.slice(start, chunksize).to_pandas(), dtype)
+
+
+@timed("io.write_table")
+def write_table(df: pd.DataFrame, dest, fmt: str = "csv") -> None:
+    """Write `df` to a path or binary file object in the given format."""
+    if fmt == "csv":
+        df.to_csv(dest, index=False, encoding="utf-8")
+        return
+    _require_pyarrow()
+    if fmt == "parquet":
+        df.to_parquet(dest, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(dest)
+    else:
+        raise ValueError(f"Unsupported table format: {fmt}")
+
+
+def download_data(df: pd.DataFrame, label: str = "CSV") -> Callable[[], BinaryIO]:
+    """
+    Deferred payload for st.download_button (streamlit >= 1.52).
+
+    Serialisation only runs when the user clicks, not on every rerun. The payload is a
+    BytesIO, one of the types Streamlit's download converter accepts (it reads the
+    whole payload into bytes either way).
+    """
+    fmt = DOWNLOAD_FORMATS[label][0]
+
+    def _payload() -> BinaryIO:
+        buf = io.BytesIO()
+        write_table(df, buf, fmt)
+        buf.seek(0)
+        return buf
+
+    return _payload
+
+
+def download_file_name(stem: str, label: str = "CSV") -> str:
+    return f"{stem}.{DOWNLOAD_FORMATS[label][0]}"
+
+
+def download_mime(label: str = "CSV") -> str:
+    return DOWNLOAD_FORMATS[label][1]
@@ -0,0 +1,147 @@
+"""
+Period-over-period productivity growth and index numbers over national base sums.
+
+Input is national_base_sums output grouped by entity keys + period (e.g. company × period,
+or just period for the nation). Every entity's series is derived in one vectorised pass
+over the sorted rows, with no per-entity or per-pair metric calls. Links run between
+consecutive observed periods of an entity, in sorted period order.
+
+Columns per entity × period:
+
+- real_output, real_input, TFP (= real_output / real_input), tfp_index (100 × TFP / first TFP)
+- tfp_growth_pct: (TFP_t / TFP_t-1 − 1) × 100
+- output_growth: ln(Y_t / Y_t-1)
+- tornqvist_input_growth: Σ_k ½(s_k,t + s_k,t-1) · ln(X_k,t / X_k,t-1), over the input
+  categories (labor, machine, …) with cost in both periods; s = nominal cost shares,
+  X = real category costs
+- tornqvist_tfp_growth = output_growth − tornqvist_input_growth (log points)
+- tornqvist_tfp_index / fisher_tfp_index: 100 × chained TFP indexes (Fisher input index =
+  √(Laspeyres × Paasche) of the category volumes)
+- tfp_growth_ma: mean tfp_growth_pct over the last `window` periods (available values)
+
+A period without output or input rows has NaN levels. The chained indexes stay NaN from
+the first broken link onward, since later levels cannot be linked to the base.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+from .metrics import PARTIAL_CATEGORIES
+from .national import _metric_columns, national_base_sums, national_base_sums_parallel, national_sums
+
+TIMESERIES_COLUMNS: List[str] = [
+    "real_output", "real_input", "TFP", "tfp_index", "tfp_growth_pct", "output_growth",
+    "tornqvist_input_growth", "tornqvist_tfp_growth", "tornqvist_tfp_index", "fisher_tfp_index", "tfp_growth_ma",
+]
+
+
+def _chain(log_growth: np.ndarray, first: np.ndarray, group_start: np.ndarray) -> np.ndarray:
+    # 100 × exp(cumulative log growth) per entity; NaN from the first missing link onward
+    step = np.where(first, 0.0, log_growth)
+    broken = np.isnan(step)
+    cum = np.cumsum(np.where(broken, 0.0, step))
+    cum_broken = np.cumsum(broken)
+    # The first row of each entity contributes 0, so its cumulative value is the entity's base
+    level = cum - cum[group_start]
+    return np.where(cum_broken - cum_broken[group_start] > 0, np.nan, 100.0 * np.exp(level))
+
+
+def _moving_mean(values: np.ndarray, group_start: np.ndarray, window: int) -> np.ndarray:
+    # Mean of the non-NaN values among the last `window` rows of the same entity
+    valid = ~np.isnan(values)
+    csum = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+    i = np.arange(len(values))
+    lo = np.maximum(i + 1 - window, group_start)
+    total, count = csum[i + 1] - csum[lo], ccount[i + 1] - ccount[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+@timed("productivity_timeseries")
+def productivity_timeseries(sums: pd.DataFrame, settings: Dict, window: int = 4) -> pd.DataFrame:
+    """
+    Growth rates, chained TFP indexes and moving averages for every entity in `sums`
+    (national base sums indexed by entity keys + "period", period last).
+    """
+    names = list(sums.index.names)
+    if names[-1] != "period":
+        raise ValueError(f"Time series need sums grouped by entity keys + period, got {names}")
+    sums = sums.sort_index()
+    m = _metric_columns(sums, settings)
+    # Unlike the level metrics, a period without products or inputs gets no example fallback
+    missing = (sums["product_rows"].to_numpy() == 0) | (sums["input_rows"].to_numpy() == 0)
+    real_output = np.where(missing, np.nan, m["real_output_value"])
+    real_input = np.where(missing, np.nan, m["real_input_cost"])
+    nominal_input = sums["input_cost"].to_numpy(dtype=float)
+    costs = sums[[f"cost_{cat}" for cat in PARTIAL_CATEGORIES]].to_numpy(dtype=float)
+
+    n = len(sums)
+    entity = sums.index.droplevel("period") if len(names) > 1 else None
+    if entity is None:
+        first = np.arange(n) == 0
+    else:
+        ids = pd.factorize(entity)[0]
+        first = np.ones(n, dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    prev = np.maximum(np.arange(n) - 1, 0)
+
+    def lagged(a: np.ndarray) -> np.ndarray:
+        out = a[prev].astype(float)
+        out[first] = np.nan
+        return out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tfp = np.where(real_input > 0, real_output / real_input, np.nan)
+        tfp_index = 100.0 * tfp / tfp[group_start]
+        tfp_growth_pct = (tfp / lagged(tfp) - 1.0) * 100.0
+        output_growth = np.log(real_output / lagged(real_output))
+
+        # Category volumes: nominal category costs deflated like total input cost
+        deflator = np.where(nominal_input > 0, real_input / nominal_input, np.nan)
+        volume = costs * deflator[:, None]
+        shares = np.where(nominal_input[:, None] > 0, costs / nominal_input[:, None], np.nan)
+        prev_volume, prev_shares = volume[prev], shares[prev]
+
+        both = (volume > 0) & (prev_volume > 0)
+        weight = np.where(both, 0.5 * (shares + prev_shares), 0.0)
+        weight_sum = weight.sum(axis=1)
+        log_ratio = np.where(both, np.log(np.where(both, volume / prev_volume, 1.0)), 0.0)
+        tornqvist_input = np.where(weight_sum > 0, (weight * log_ratio).sum(axis=1) / weight_sum, np.nan)
+
+        laspeyres = np.where(prev_volume > 0, prev_shares * volume / prev_volume, 0.0).sum(axis=1)
+        paasche_inv = np.where(volume > 0, shares * prev_volume / volume, 0.0).sum(axis=1)
+        fisher_input = np.sqrt(laspeyres / paasche_inv)
+    tornqvist_input[first | np.isnan(output_growth)] = np.nan
+    tornqvist_tfp_growth = output_growth - tornqvist_input
+    fisher_tfp_growth = output_growth - np.log(fisher_input)
+
+    out = pd.DataFrame({
+        "real_output": real_output,
+        "real_input": real_input,
+        "TFP": tfp,
+        "tfp_index": tfp_index,
+        "tfp_growth_pct": tfp_growth_pct,
+        "output_growth": output_growth,
+        "tornqvist_input_growth": tornqvist_input,
+        "tornqvist_tfp_growth": tornqvist_tfp_growth,
+        "tornqvist_tfp_index": _chain(tornqvist_tfp_growth, first, group_start),
+        "fisher_tfp_index": _chain(fisher_tfp_growth, first, group_start),
+        "tfp_growth_ma": _moving_mean(tfp_growth_pct, group_start, window),
+    }, index=sums.index)
+    return out.reset_index()[[*names, *TIMESERIES_COLUMNS]]
+
+
+def national_timeseries(dataset: pd.DataFrame, settings: Dict, entity: Sequence[str] = ("company",),
+                        window: int = 4, workers: int = 1) -> pd.DataFrame:
+    """productivity_timeseries straight from a long-form national dataset."""
+    def compute(keys, dropna):
+        if workers > 1:
+            return national_base_sums_parallel(dataset, keys, workers, dropna=dropna)
+        return national_base_sums(dataset, keys, dropna)
+
+    by = [*entity, "period"]
+    return productivity_timeseries(national_sums(compute, by, settings, dataset.columns), settings, window)
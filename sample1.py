@@ -2,6 +2,42 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
+from productivity.instrumentation import prometheus_text, start_recording
+from productivity.labour import grid_bobot, grid_target, hitung_batch, hitung_indeks, hitung_indikator, hitung_sensitivitas
+from productivity.quality import Screening, screen
+from productivity.registry import DatasetRegistry
+from productivity.tabular_io import UPLOAD_TYPES, DOWNLOAD_FORMATS, download_data, download_file_name, download_mime
+from table_view import paged_dataframe
+
+LABEL_TABEL = {
+    "filter_column": "Kolom filter",
+    "filter": "Filter",
+    "filter_help": "Kolom teks: mengandung (tanpa beda huruf besar/kecil). Angka: >, >=, <, <=, =, != atau nilai.",
+    "sort_by": "Urutkan",
+    "descending": "Menurun",
+    "page_size": "Baris/halaman",
+    "page": "Halaman",
+    "caption": "Baris {first:,}–{last:,} dari {shown:,} (total {total:,})",
+}
+
+
+@st.cache_resource
+def get_dataset_registry() -> DatasetRegistry:
+    # File yang diunggah di-parse sekali per isi, dipakai bersama semua sesi (PRODUCTIVITY_REGISTRY_MAX_MB)
+    return DatasetRegistry.from_env()
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def periksa_kualitas(digest, _df) -> Screening:
+    # Sekali per isi file: nilai non-angka/kosong/negatif, workers = 0, dan outlier (robust z-score per periode)
+    return screen(_df, "units")
+
+
+@st.cache_data(show_spinner="Menghitung sensitivitas indeks…")
+def hitung_sensitivitas_cache(df, langkah_bobot, targets, faktor):
+    return hitung_sensitivitas(df, grid_bobot(langkah_bobot), grid_target(targets, faktor))
+
+
 # ----------------------------------
 # CONFIG DASHBOARD
 # ----------------------------------
@@ -9,6 +45,7 @@ st.set_page_config(
     page_title="Kalkulator Produktivitas",
     layout="wide",
 )
+timings = start_recording()
 
 st.title("📊 Kalkulator Produktivitas Tenaga Kerja")
 st.caption("Minimum Viable Product (MVP) – dirancang untuk perusahaan, manajer, dan pemangku kepentingan kebijakan")
@@ -67,35 +104,9 @@ target_wp = st.sidebar.number_input(
     format="%.4f",
 )
 
-# ----------------------------------
-# FUNGSI UTILITAS
-# ----------------------------------
-def hitung_indikator(output, workers, hours, labour_cost):
-    lp = output / workers if workers > 0 else np.nan
-    hp = output / hours if hours > 0 else np.nan
-    wp = output / labour_cost if labour_cost > 0 else np.nan
-    return lp, hp, wp
-
-def hitung_skor_indikator(value, target):
-    if target is None or target == 0 or np.isnan(value):
-        return np.nan
-    return min(100.0, (value / target) * 100.0)
-
-def hitung_indeks(lp, hp, wp, weights, targets):
-    w_lp, w_hp, w_wp = weights
-    t_lp, t_hp, t_wp = targets
-    s_lp = hitung_skor_indikator(lp, t_lp)
-    s_hp = hitung_skor_indikator(hp, t_hp)
-    s_wp = hitung_skor_indikator(wp, t_wp)
-
-    skor_list, bobot_list = [], []
-    if not np.isnan(s_lp) and w_lp > 0: skor_list.append(s_lp); bobot_list.append(w_lp)
-    if not np.isnan(s_hp) and w_hp > 0: skor_list.append(s_hp); bobot_list.append(w_hp)
-    if not np.isnan(s_wp) and w_wp > 0: skor_list.append(s_wp); bobot_list.append(w_wp)
-    if len(skor_list) == 0: return np.nan
-
-    bobot_arr = np.array(bobot_list) / np.sum(bobot_list)
-    return float(np.sum(bobot_arr * np.array(skor_list)))
+st.sidebar.markdown("---")
+tampilkan_waktu = st.sidebar.toggle("🐞 Panel waktu (debug)", value=False,
+                                    help="Tampilkan waktu, jumlah baris, dan perubahan memori tiap tahap perhitungan / I/O.")
 
 # ----------------------------------
 # MODE 1: INPUT MANUAL
@@ -151,34 +162,35 @@ if mode == "Input Manual (Single Perusahaan/Unit)":
 else:
     st.header("📂 Perhitungan Produktivitas – Multi Unit (CSV)")
     st.markdown("**Struktur CSV yang diharapkan:** `unit, output, workers, hours, labour_cost`")
+    st.caption("Format Parquet dan Feather (Arrow) juga didukung – lebih cepat untuk file besar.")
 
-    uploaded_file = st.file_uploader("Upload file CSV", type=["csv"])
+    uploaded_file = st.file_uploader("Upload file CSV / Parquet / Feather", type=UPLOAD_TYPES)
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
+            entry = get_dataset_registry().read(uploaded_file)
+            df = entry.columns(["unit", "output", "workers", "hours", "labour_cost"])
             required_cols = ["unit", "output", "workers", "labour_cost"]
             missing = [c for c in required_cols if c not in df.columns]
             if missing:
                 st.error(f"Kolom berikut wajib ada di CSV: {missing}")
             else:
+                pemeriksaan = periksa_kualitas(entry.digest, df)
+                if pemeriksaan.n_flagged:
+                    with st.expander(f"🔍 {pemeriksaan.n_flagged:,} dari {len(df):,} baris ditandai bermasalah"):
+                        st.dataframe(pemeriksaan.report(), use_container_width=True, hide_index=True)
+                        st.download_button("⬇️ Download baris bermasalah",
+                                           data=download_data(pemeriksaan.quarantined(df), "CSV"),
+                                           file_name=download_file_name("baris_bermasalah", "CSV"),
+                                           mime=download_mime("CSV"))
+                    if st.toggle("Keluarkan baris bermasalah dari perhitungan", value=False, key="karantina"):
+                        df = pemeriksaan.passed(df)
                 if "hours" not in df.columns: df["hours"] = np.nan
 
-                lp_list, hp_list, wp_list, idx_list = [], [], [], []
-                for _, row in df.iterrows():
-                    lp, hp, wp = hitung_indikator(row["output"], row["workers"], row["hours"], row["labour_cost"])
-                    idx = hitung_indeks(lp, hp, wp, weights, (target_lp, target_hp, target_wp))
-                    lp_list.append(lp); hp_list.append(hp); wp_list.append(wp); idx_list.append(idx)
-
-                df["prod_per_worker"], df["prod_per_hour"], df["prod_per_wage"], df["productivity_index"] = lp_list, hp_list, wp_list, idx_list
-
-                # Formatting angka
-                df_fmt = df.copy()
-                for col in ["output","workers","hours","labour_cost","prod_per_worker","prod_per_hour","prod_per_wage","productivity_index"]:
-                    if col in df_fmt.columns:
-                        df_fmt[col] = df_fmt[col].apply(lambda x: f"{x:,.2f}" if pd.notna(x) else "")
+                df = hitung_batch(df, weights, (target_lp, target_hp, target_wp))
 
+                # Per halaman: angka diformat oleh tabel (format "%,.2f"), bukan diubah jadi teks
                 st.subheader("📋 Hasil Perhitungan per Unit")
-                st.dataframe(df_fmt)
+                paged_dataframe(df, key="hasil", labels=LABEL_TABEL)
 
                 st.markdown("### 📊 Grafik Produktivitas per Unit")
                 st.bar_chart(df.set_index("unit")["prod_per_worker"])
@@ -186,12 +198,42 @@ else:
                     st.markdown("### ⭐ Indeks Produktivitas per Unit")
                     st.bar_chart(df.set_index("unit")["productivity_index"])
 
-                # Optional: download CSV hasil
-                csv_out = df.to_csv(index=False).encode("utf-8")
-                st.download_button("⬇️ Download Hasil CSV", data=csv_out, file_name="hasil_kalkulator_produktivitas.csv", mime="text/csv")
+                # Optional: download hasil (CSV / Parquet / Feather)
+                format_unduh = st.selectbox("Format file hasil", list(DOWNLOAD_FORMATS))
+                st.download_button("⬇️ Download Hasil", data=download_data(df, format_unduh),
+                                   file_name=download_file_name("hasil_kalkulator_produktivitas", format_unduh),
+                                   mime=download_mime(format_unduh))
+
+                with st.expander("🎯 Analisis sensitivitas bobot & target"):
+                    st.caption("Indeks dihitung untuk semua kombinasi bobot (kelipatan langkah, jumlah 100%) × "
+                               "target (target sidebar × faktor), lalu diringkas per unit: rentang indeks dan "
+                               "stabilitas peringkat (1 = indeks tertinggi).")
+                    kol_langkah, kol_faktor, kol_n = st.columns(3)
+                    langkah = kol_langkah.select_slider("Langkah bobot", [0.05, 0.1, 0.2, 0.25, 0.5], value=0.1,
+                                                        format_func=lambda v: f"{v:.0%}")
+                    faktor_min, faktor_max = kol_faktor.slider("Faktor target", 0.5, 2.0, (0.8, 1.2), 0.05)
+                    n_faktor = kol_n.number_input("Jumlah faktor per target", 1, 9, 5)
+                    faktor = tuple(np.linspace(faktor_min, faktor_max, int(n_faktor)))
+                    n_komb = len(grid_bobot(langkah)) * len(faktor) ** 3
+                    st.caption(f"{n_komb:,} kombinasi × {len(df):,} unit")
+                    if st.toggle("Jalankan analisis", key="sensitivitas"):
+                        sens = hitung_sensitivitas_cache(df[["unit", "output", "workers", "hours", "labour_cost"]],
+                                                         langkah, (target_lp, target_hp, target_wp), faktor)
+                        paged_dataframe(sens, key="sensitivitas_tabel", labels=LABEL_TABEL)
+                        st.download_button("⬇️ Download Sensitivitas", data=download_data(sens, format_unduh),
+                                           file_name=download_file_name("sensitivitas_indeks", format_unduh),
+                                           mime=download_mime(format_unduh))
 
         except Exception as e:
-            st.error(f"Terjadi error saat membaca CSV: {e}")
+            st.error(f"Terjadi error saat membaca file: {e}")
+
+if tampilkan_waktu:
+    with st.expander(f"🐞 Waktu rerun ini ({timings.total_ms():,.1f} ms terukur)", expanded=True):
+        st.dataframe(pd.DataFrame(timings.records()))
+        st.download_button("⬇️ Download spans (JSON lines)", data=timings.to_json_lines(),
+                           file_name="timings.jsonl", mime="application/x-ndjson")
+        st.caption("Total per proses (format teks Prometheus)")
+        st.code(prometheus_text(), language="text")
 
 # ----------------------------------
 # FOOTER
@@ -1,11 +1,28 @@
-import io
-import json
+import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 
-import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+
+from productivity.instrumentation import prometheus_text, start_recording
+from productivity.jobs import CANCELLED, DONE, FAILED, Job, JobRunner
+from productivity.metrics import (INPUT_COLUMNS, PRODUCT_COLUMNS, MetricsAccumulator, editor_delta,
+                                  example_inputs, example_products, kaizen_frame, metrics_frame, scenario_compare,
+                                  scenario_metrics)
+from productivity.cube import NationalCube, build_cube
+from productivity.national_store import NationalStore, open_or_ingest
+from productivity.quality import Screening, screen
+from productivity.schema import (DEFLATOR_COLUMNS, DEFLATOR_KEYS, prepare_deflators, prepare_inputs, prepare_national,
+                                 prepare_products)
+from productivity.registry import DatasetRegistry
+from productivity.result_cache import ResultCache, fingerprint
+from productivity.sampling import SampledCube, quick_look_fractions
+from productivity.serving import ComputeClient, compute_runner, request_user, run_task, shared_result_cache
+from productivity.tabular_io import (UPLOAD_TYPES, DOWNLOAD_FORMATS, read_table_preview,
+                                     download_data, download_file_name, download_mime)
+from table_view import paged_dataframe
 
 __VERSION__ = "1.0.0"
 
@@ -13,227 +30,187 @@ __VERSION__ = "1.0.0"
 # Helpers
 # --------------------------------------------------------------------------------------
 
-def _example_products() -> pd.DataFrame:
-    return pd.DataFrame(
-        [
-            {"product": "A", "quantity": 1000, "price": 50.0, "std_hours": 0.2},
-            {"product": "B", "quantity": 400, "price": 120.0, "std_hours": 0.5},
-            {"product": "C", "quantity": 200, "price": 200.0, "std_hours": 1.2},
-        ]
-    )
+@st.cache_data(show_spinner=False)
+def compute_scenario_metrics(products: pd.DataFrame, inputs_df: pd.DataFrame, settings: Dict) -> pd.DataFrame:
+    return scenario_metrics(products, inputs_df, settings)
 
 
-def _example_inputs() -> pd.DataFrame:
-    return pd.DataFrame(
-        [
-            {"resource": "Labor", "quantity": 120.0, "unit_cost": 6.0, "unit": "hours"},
-            {"resource": "Machine", "quantity": 75.0, "unit_cost": 20.0, "unit": "machine_hours"},
-            {"resource": "Materials", "quantity": 1.0, "unit_cost": 30000.0, "unit": "currency"},
-            {"resource": "Energy", "quantity": 1.0, "unit_cost": 5000.0, "unit": "currency"},
-            {"resource": "Overhead", "quantity": 1.0, "unit_cost": 12000.0, "unit": "currency"},
-        ]
-    )
+def demo_scenarios(n: int) -> tuple:
+    # The example plan under n uniform volume changes from -20% to +20%; input use scales less than output
+    products, inputs_df = example_products(), example_inputs()
+    ids = [f"S{i:03d}" for i in range(n)]
+    scale = pd.Series([0.8 + 0.4 * i / max(n - 1, 1) for i in range(n)], index=ids)
+    stacked_p = pd.concat({s: products.assign(quantity=products["quantity"] * f) for s, f in scale.items()},
+                          names=["scenario"]).reset_index(level=0)
+    stacked_i = pd.concat({s: inputs_df.assign(quantity=inputs_df["quantity"] * (1 + (f - 1) / 2)) for s, f in scale.items()},
+                          names=["scenario"]).reset_index(level=0)
+    return stacked_p, stacked_i
 
 
-def _normalize_products(df: pd.DataFrame) -> pd.DataFrame:
-    required = ["product", "quantity"]
-    for col in required:
-        if col not in df.columns:
-            raise ValueError(f"Products table missing required column: {col}")
-    # Ensure numeric types
-    df = df.copy()
-    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0.0)
-    if "price" in df.columns:
-        df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(np.nan)
-    if "std_hours" in df.columns:
-        df["std_hours"] = pd.to_numeric(df["std_hours"], errors="coerce").fillna(np.nan)
-    return df
-
-
-def _normalize_inputs(df: pd.DataFrame) -> pd.DataFrame:
-    required = ["resource", "quantity", "unit_cost"]
-    for col in required:
-        if col not in df.columns:
-            raise ValueError(f"Inputs table missing required column: {col}")
-    df = df.copy()
-    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0.0)
-    df["unit_cost"] = pd.to_numeric(df["unit_cost"], errors="coerce").fillna(0.0)
-    if "unit" not in df.columns:
-        df["unit"] = "unit"
-    return df
-
-
-def compute_output_value(products: pd.DataFrame, use_prices: bool = True) -> float:
-    if use_prices and "price" in products.columns and products["price"].notna().any():
-        return float((products["quantity"] * products["price"]).sum())
-    # Fallback: price-less output proxy = sum of quantities (not ideal for mix; use std_hours if present)
-    return float(products["quantity"].sum())
-
-
-def compute_output_standard_hours(products: pd.DataFrame) -> Optional[float]:
-    if "std_hours" in products.columns and products["std_hours"].notna().any():
-        return float((products["quantity"] * products["std_hours"]).sum())
-    return None
+# --------------------------------------------------------------------------------------
+# UI
+# --------------------------------------------------------------------------------------
 
+st.set_page_config(page_title="National-Scale Productivity & Kaizen Analyzer", layout="wide")
+timings = start_recording()
 
-def compute_input_cost(inputs_df: pd.DataFrame) -> float:
-    return float((inputs_df["quantity"] * inputs_df["unit_cost"]).sum())
 
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # Disk-backed and shared across sessions (and replicas, if the directory is shared);
+    # the same instance serves run_task when national jobs run in this process
+    return shared_result_cache()
 
-def extract_partial_inputs(inputs_df: pd.DataFrame) -> Dict[str, float]:
-    # Try to map common resource names to categories for partial productivity
-    mapping = {
-        "labor": ["labor", "tenaga kerja", "manhours", "jam kerja"],
-        "machine": ["machine", "mesin", "machine hour", "mh", "jam mesin"],
-        "materials": ["material", "materials", "bahan"],
-        "energy": ["energy", "energi", "listrik", "bbm"],
-        "overhead": ["overhead", "sewa", "depresiasi", "admin"],
-    }
-    totals: Dict[str, float] = {k: 0.0 for k in mapping.keys()}
-
-    for _, r in inputs_df.iterrows():
-        name = str(r["resource"]).strip().lower()
-        qty = float(r["quantity"]) if pd.notna(r["quantity"]) else 0.0
-        unit_cost = float(r["unit_cost"]) if pd.notna(r["unit_cost"]) else 0.0
-        total_cost = qty * unit_cost
-        placed = False
-        for cat, keys in mapping.items():
-            if any(k in name for k in keys):
-                totals[cat] += total_cost
-                placed = True
-                break
-        if not placed:
-            # Sum to overhead if unknown
-            totals["overhead"] += total_cost
-    return totals
-
-
-def deflate_value(value: float, deflator: Optional[float]) -> float:
-    if deflator is None or deflator == 0:
-        return value
-    return value / deflator
-
-
-def productivity_metrics(products: pd.DataFrame,
-                         inputs_df: pd.DataFrame,
-                         *,
-                         use_price_output: bool = True,
-                         use_standard_hour_output: bool = False,
-                         price_deflator: Optional[float] = None,
-                         input_deflator: Optional[float] = None) -> Dict[str, float]:
-    products = _normalize_products(products)
-    inputs_df = _normalize_inputs(inputs_df)
-
-    # Output
-    output_val = compute_output_value(products, use_price_output)
-    std_hours_total = compute_output_standard_hours(products) if use_standard_hour_output else None
-
-    # Inputs
-    input_cost_total = compute_input_cost(inputs_df)
-    partials = extract_partial_inputs(inputs_df)
-
-    # Deflate if provided
-    real_output = deflate_value(output_val, price_deflator)
-    real_input_cost = deflate_value(input_cost_total, input_deflator)
-
-    # Partial denominators (cost-based). Labor hours PP usually use hours, but we generalize using costs to keep unit-consistency.
-    # Users can put labor quantity=hours and unit_cost=wage to reflect hours.
-
-    m = {
-        "gross_output_value": output_val,
-        "real_output_value": real_output,
-        "std_hours_output": std_hours_total if std_hours_total is not None else np.nan,
-        "total_input_cost": input_cost_total,
-        "real_input_cost": real_input_cost,
-        "TFP_value_based": (real_output / real_input_cost) if real_input_cost else np.nan,
-        # Partial productivity (value-based)
-        "PP_labor": (real_output / partials.get("labor", 0.0)) if partials.get("labor", 0.0) else np.nan,
-        "PP_machine": (real_output / partials.get("machine", 0.0)) if partials.get("machine", 0.0) else np.nan,
-        "PP_materials": (real_output / partials.get("materials", 0.0)) if partials.get("materials", 0.0) else np.nan,
-        "PP_energy": (real_output / partials.get("energy", 0.0)) if partials.get("energy", 0.0) else np.nan,
-        "PP_overhead": (real_output / partials.get("overhead", 0.0)) if partials.get("overhead", 0.0) else np.nan,
-    }
 
-    if std_hours_total is not None and std_hours_total > 0:
-        # Productivity per standard hour (if std_hours provided)
-        m["Productivity_per_std_hour"] = real_output / std_hours_total
+result_cache = get_result_cache()
 
-    return m
 
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    # One bounded pool per server process, shared by all sessions
+    return JobRunner.from_env()
 
-@st.cache_data(show_spinner=False)
-def compute_metrics_df(products: pd.DataFrame, inputs_df: pd.DataFrame,
-                       settings: Dict) -> pd.DataFrame:
-    met = productivity_metrics(
-        products,
-        inputs_df,
-        use_price_output=settings.get("use_price_output", True),
-        use_standard_hour_output=settings.get("use_standard_hour_output", False),
-        price_deflator=settings.get("price_deflator"),
-        input_deflator=settings.get("input_deflator"),
-    )
-    df = pd.DataFrame([met]).T.reset_index()
-    df.columns = ["metric", "value"]
-    return df
-
-
-def kaizen_compare(before_products: pd.DataFrame, before_inputs: pd.DataFrame,
-                   after_products: pd.DataFrame, after_inputs: pd.DataFrame,
-                   settings: Dict) -> pd.DataFrame:
-    before = productivity_metrics(before_products, before_inputs,
-                                  use_price_output=settings.get("use_price_output", True),
-                                  use_standard_hour_output=settings.get("use_standard_hour_output", False),
-                                  price_deflator=settings.get("price_deflator"),
-                                  input_deflator=settings.get("input_deflator"))
-    after = productivity_metrics(after_products, after_inputs,
-                                 use_price_output=settings.get("use_price_output", True),
-                                 use_standard_hour_output=settings.get("use_standard_hour_output", False),
-                                 price_deflator=settings.get("price_deflator"),
-                                 input_deflator=settings.get("input_deflator"))
-    df = pd.DataFrame({"metric": list(after.keys()),
-                       "before": [before.get(k, np.nan) for k in after.keys()],
-                       "after": [after.get(k, np.nan) for k in after.keys()]})
-    df["change_abs"] = df["after"] - df["before"]
-    df["change_pct"] = np.where(df["before"].abs() > 0, (df["after"] / df["before"] - 1.0) * 100.0, np.nan)
-    return df
-
-
-def national_aggregate(dataset: pd.DataFrame, settings: Dict) -> pd.DataFrame:
+
+job_runner = get_job_runner()
+
+
+@st.cache_resource
+def get_compute_runner():
+    # National jobs go to the shared compute service when PRODUCTIVITY_COMPUTE_ADDRESS is
+    # set (python -m productivity serve), else to this process's job runner
+    return compute_runner(job_runner)
+
+
+compute = get_compute_runner()
+
+
+# Only an authenticating reverse proxy that overwrites the user headers makes them trustworthy
+TRUST_PROXY_USER = os.environ.get("PRODUCTIVITY_TRUST_PROXY_USER", "0") == "1"
+
+
+def session_user() -> str:
     """
-    Expect long-form dataset with columns:
-    company, period, table, product/resource, quantity, price, std_hours, unit_cost
-    Where table in {"product","input"}. Flexible; missing cols tolerated.
-    Aggregation = sum of outputs and inputs across companies, then compute metrics.
+    User for per-user job limits: this browser session, or the proxy-authenticated user
+    when PRODUCTIVITY_TRUST_PROXY_USER=1.
     """
-    df = dataset.copy()
-    for c in ["quantity", "price", "std_hours", "unit_cost"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-
-    # Build nationwide products & inputs for each (period)
-    results = []
-    for period, group in df.groupby(df.get("period", "ALL")):
-        prods = group[group["table"] == "product"][['product','quantity','price','std_hours']].copy() if 'table' in group.columns else group[group['type']=='product'][['product','quantity','price','std_hours']]
-        inputs = group[group["table"] == "input"][['resource','quantity','unit_cost','unit']].copy() if 'table' in group.columns else group[group['type']=='input'][['resource','quantity','unit_cost','unit']]
-        if prods.empty:
-            prods = _example_products()
-        if inputs.empty:
-            inputs = _example_inputs()
-        m = productivity_metrics(prods, inputs,
-                                 use_price_output=settings.get("use_price_output", True),
-                                 use_standard_hour_output=settings.get("use_standard_hour_output", False),
-                                 price_deflator=settings.get("price_deflator"),
-                                 input_deflator=settings.get("input_deflator"))
-        m["period"] = period
-        results.append(m)
-    return pd.DataFrame(results)
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
 
+    return request_user(st.context.headers, get_script_run_ctx().session_id, TRUST_PROXY_USER)
 
-# --------------------------------------------------------------------------------------
-# UI
-# --------------------------------------------------------------------------------------
 
-st.set_page_config(page_title="National-Scale Productivity & Kaizen Analyzer", layout="wide")
+@st.cache_resource
+def get_dataset_registry() -> DatasetRegistry:
+    # Parsed uploads, shared by all tabs and sessions (PRODUCTIVITY_REGISTRY_MAX_MB)
+    return DatasetRegistry.from_env()
+
+
+dataset_registry = get_dataset_registry()
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def get_screening(digest: str, kind: str, columns: tuple, z_max: float, _table: pd.DataFrame) -> Screening:
+    # One screening per loaded table, kind and threshold, shared like the registry entry itself
+    return screen(_table, kind, z_max=z_max)
+
+
+def session_tables() -> Dict[str, str]:
+    """Digest -> file name of the tables this session loaded; the only ones it may pick again."""
+    return st.session_state.setdefault("_loaded_tables", {})
+
+
+def table_input(label: str, key: str, columns, default: Optional[pd.DataFrame] = None, container=st,
+                kind: Optional[str] = None):
+    """
+    An uploader plus a picker of the tables this session already loaded (in any tab).
+    Uploads are parsed once per content on this server, also across sessions, but a
+    session only lists its own. Returns (table, source id), or (default, None) when
+    neither is used.
+
+    With a `kind` (see quality.screen), the loaded table is screened and a summary shown;
+    when quarantining is switched on, flagged rows are left out of the returned table.
+    """
+    upload = container.file_uploader(label, type=UPLOAD_TYPES, key=key)
+    if upload is not None:
+        entry = dataset_registry.read(upload)
+        session_tables()[entry.digest] = entry.name
+    else:
+        loaded = {e.digest: e for e in dataset_registry.datasets(session_tables())}
+        digest = container.selectbox(
+            "…or a loaded table", [None, *loaded], key=f"{key}_loaded",
+            format_func=lambda d: "—" if d is None else f"{loaded[d].name} ({len(loaded[d].frame):,} rows)",
+        ) if loaded else None
+        entry = dataset_registry.get(digest) if digest else None
+    if entry is None:
+        return default, None
+    table = entry.columns(columns)
+    if kind is None:
+        return table, entry.digest
+    screening = get_screening(entry.digest, kind, tuple(columns), screen_z_max, table)
+    if screening.n_flagged:
+        with container.expander(f"🔍 {screening.n_flagged:,} of {len(table):,} rows flagged"):
+            st.dataframe(screening.report(), use_container_width=True, hide_index=True)
+    if quarantine_rows and screening.n_flagged:
+        return screening.passed(table), f"{entry.digest}:passed:{screen_z_max}"
+    return table, entry.digest
+
+
+def edited_accumulator(source_id, products_base: pd.DataFrame, products_key: str,
+                       inputs_base: pd.DataFrame, inputs_key: str) -> MetricsAccumulator:
+    """
+    Accumulator for the current contents of a products + inputs pair of data editors.
+
+    The full tables are summed once per uploaded source; after that only the editors'
+    delta rows (edited / added / deleted) are applied on every rerun. Returns a copy, so
+    the caller may hand it to a background job.
+    """
+    bases = st.session_state.setdefault("_base_accumulators", {})
+    cached = bases.get((products_key, inputs_key))
+    if cached is None or cached[0] != source_id:
+        cached = (source_id, MetricsAccumulator.from_frames(prepare_products(products_base),
+                                                            prepare_inputs(inputs_base)))
+        bases[(products_key, inputs_key)] = cached
+    acc = cached[1].copy()
+    removed, added = editor_delta(products_base, st.session_state.get(products_key))
+    acc.update_products(removed, sign=-1)
+    acc.update_products(added)
+    removed, added = editor_delta(inputs_base, st.session_state.get(inputs_key))
+    acc.update_inputs(removed, sign=-1)
+    acc.update_inputs(added)
+    return acc
+
+
+def job_status(state_key: str, runner=job_runner) -> Optional[Job]:
+    """
+    Progress and cancel controls for the job whose id is in st.session_state[state_key].
+    Returns the job once it finished successfully; while it runs, the page refreshes itself.
+    """
+    job = runner.get(st.session_state.get(state_key))
+    if job is None:
+        return None
+    if job.status == DONE:
+        return job
+    if job.status == FAILED:
+        st.error(f"Error: {job.error}")
+        return None
+    if job.status == CANCELLED:
+        st.warning(f"{job.name} cancelled.")
+        return None
+    st_autorefresh(interval=1000, key=f"{state_key}_refresh")
+    rows = f" · {job.rows_done:,} rows" if job.rows_done else ""
+    text = f"{job.name}: {job.status}{rows} · {job.elapsed_s():.1f} s"
+    col_bar, col_cancel = st.columns([5, 1])
+    col_bar.progress(job.progress or 0.0, text=text)
+    if col_cancel.button("Cancel", key=f"{state_key}_cancel"):
+        runner.cancel(job.id)
+    return None
+
+
+@st.cache_resource(show_spinner="Indexing national dataset…")
+def get_national_store(file_id: str, _upload) -> NationalStore:
+    # Ingested once per file content (PRODUCTIVITY_STORE_DIR); later reruns, sessions and
+    # restarts open the memory-mapped store instead of re-reading the upload
+    return open_or_ingest(_upload)
+
 
 st.title("📈 National-Scale Productivity & Kaizen Analyzer")
 st.caption(
@@ -254,9 +231,58 @@ with st.sidebar:
                                      help="Real output = nominal output / deflator.")
     input_deflator = st.number_input("Input cost deflator (e.g., input price index)", min_value=0.0, value=1.0, step=0.01,
                                      help="Real input = nominal input / deflator.")
+    st.caption("Deflator series by period (national): columns period, optional sector, price_deflator and/or "
+               "input_deflator. Periods missing from the series use the values above.")
+    deflator_table, _ = table_input("Deflator series", "deflators", DEFLATOR_KEYS + DEFLATOR_COLUMNS)
+    deflator_series = None
+    if deflator_table is not None:
+        try:
+            deflator_series = prepare_deflators(deflator_table)
+            st.caption(f"{len(deflator_series):,} deflator rows loaded.")
+        except Exception as e:
+            st.error(f"Deflator series: {e}")
+    st.markdown("---")
+    st.subheader("Data quality")
+    quarantine_rows = st.toggle("Leave out flagged rows", value=False,
+                                help="Uploaded tables are screened for unparsable, missing or negative values and "
+                                     "price/cost outliers. When on, flagged rows are quarantined before any metric.")
+    screen_z_max = st.number_input("Outlier threshold (robust z-score)", min_value=1.0, value=3.5, step=0.5,
+                                   help="Median/MAD z-score of log price or unit cost per product/resource and period.")
     st.markdown("---")
     st.subheader("Download")
-    auto_filename = f"productivity_report_{datetime.now():%Y%m%d_%H%M%S}.csv"
+    download_format = st.selectbox("File format", list(DOWNLOAD_FORMATS),
+                                   help="Parquet / Feather are much faster than CSV for large tables.")
+    auto_filename = download_file_name(f"productivity_report_{datetime.now():%Y%m%d_%H%M%S}", download_format)
+    st.markdown("---")
+    with st.expander("🗄️ Result cache"):
+        cache_stats = result_cache.stats()
+        st.caption(f"{cache_stats['entries']} entries · {cache_stats['size_bytes'] / 1e6:,.1f} / "
+                   f"{cache_stats['max_bytes'] / 1e6:,.0f} MB")
+        st.caption(f"Hits {cache_stats['hits']} · misses {cache_stats['misses']} · "
+                   f"hit rate {cache_stats['hit_rate']:.0%} · evictions {cache_stats['evictions']}")
+        if st.button("Clear cache"):
+            result_cache.clear()
+    with st.expander("📦 Loaded tables"):
+        registry_stats = dataset_registry.stats()
+        st.caption(f"{registry_stats['entries']} tables · {registry_stats['size_bytes'] / 1e6:,.1f} / "
+                   f"{registry_stats['max_bytes'] / 1e6:,.0f} MB in memory")
+        st.caption(f"Parsed {registry_stats['misses']} · reused {registry_stats['hits']} · "
+                   f"evictions {registry_stats['evictions']}")
+        st.caption(f"{len(dataset_registry.datasets(session_tables()))} of them loaded in this session")
+        if st.button("Forget my loaded tables", help="Remove this session's tables from the “…or a loaded table” "
+                                                   "pickers; memory is freed least recently used first."):
+            session_tables().clear()
+    with st.expander("🧮 Compute jobs"):
+        job_stats = compute.stats()
+        where = f"service at {compute.address}" if isinstance(compute, ComputeClient) else "this server process"
+        st.caption(f"Running in {where}")
+        st.caption(f"Running {job_stats['running']} · queued {job_stats['queued']} · done {job_stats['done']} · "
+                   f"failed {job_stats['failed']} · cancelled {job_stats['cancelled']}")
+        my_jobs = job_stats["users"].get(session_user())
+        if my_jobs:
+            st.caption(f"Your jobs: {my_jobs['active']} started · {my_jobs['waiting']} waiting for a slot")
+    show_timings = st.toggle("🐞 Debug timing panel", value=False,
+                             help="Show wall time, rows and memory delta of each computation / I/O stage.")
 
 mode = st.tabs(["Single Period", "Kaizen Compare", "National Aggregation", "Help & Data Specs"])
 
@@ -270,22 +296,16 @@ with mode[0]:
     with col1:
         st.markdown("**Products** (one row per SKU/product)")
         st.caption("Required columns: product, quantity. Optional: price, std_hours.")
-        prod_file = st.file_uploader("Upload products CSV (optional)", type=["csv"], key="prod_single")
-        if prod_file:
-            products_df = pd.read_csv(prod_file)
-        else:
-            products_df = _example_products()
-        products_df = st.data_editor(products_df, num_rows="dynamic", use_container_width=True, key="prod_edit_single")
+        products_base, prod_source = table_input("Upload products CSV/Parquet/Feather (optional)", "prod_single",
+                                                 PRODUCT_COLUMNS, example_products(), kind="products")
+        products_df = st.data_editor(products_base, num_rows="dynamic", use_container_width=True, key="prod_edit_single")
 
     with col2:
         st.markdown("**Inputs/Resources** (labor, machine, materials, etc.)")
         st.caption("Required columns: resource, quantity, unit_cost. Optional: unit")
-        inp_file = st.file_uploader("Upload inputs CSV (optional)", type=["csv"], key="inp_single")
-        if inp_file:
-            inputs_df = pd.read_csv(inp_file)
-        else:
-            inputs_df = _example_inputs()
-        inputs_df = st.data_editor(inputs_df, num_rows="dynamic", use_container_width=True, key="inp_edit_single")
+        inputs_base, inp_source = table_input("Upload inputs CSV/Parquet/Feather (optional)", "inp_single",
+                                              INPUT_COLUMNS, example_inputs(), kind="inputs")
+        inputs_df = st.data_editor(inputs_base, num_rows="dynamic", use_container_width=True, key="inp_edit_single")
 
     settings = {
         "use_price_output": use_price_output,
@@ -295,12 +315,14 @@ with mode[0]:
     }
 
     try:
-        metrics_df = compute_metrics_df(products_df, inputs_df, settings)
+        single_acc = edited_accumulator((prod_source, inp_source), products_base, "prod_edit_single",
+                                        inputs_base, "inp_edit_single")
+        metrics_df = metrics_frame(single_acc.metrics(settings))
         st.success("Metrics computed.")
         st.dataframe(metrics_df, use_container_width=True)
 
-        csv = metrics_df.to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Download metrics CSV", data=csv, file_name=auto_filename, mime="text/csv")
+        st.download_button("⬇️ Download metrics", data=download_data(metrics_df, download_format),
+                           file_name=auto_filename, mime=download_mime(download_format))
     except Exception as e:
         st.error(f"Error computing metrics: {e}")
 
@@ -315,71 +337,270 @@ with mode[1]:
 
     with col1:
         st.markdown("**Before** – Products & Inputs")
-        bpf = st.file_uploader("Before products CSV", type=["csv"], key="bp")
-        bif = st.file_uploader("Before inputs CSV", type=["csv"], key="bi")
-        before_products = pd.read_csv(bpf) if bpf else _example_products()
-        before_inputs = pd.read_csv(bif) if bif else _example_inputs()
-        before_products = st.data_editor(before_products, num_rows="dynamic", use_container_width=True, key="bp_edit")
-        before_inputs = st.data_editor(before_inputs, num_rows="dynamic", use_container_width=True, key="bi_edit")
+        before_products_base, bp_source = table_input("Before products file", "bp", PRODUCT_COLUMNS, example_products(),
+                                                      kind="products")
+        before_inputs_base, bi_source = table_input("Before inputs file", "bi", INPUT_COLUMNS, example_inputs(),
+                                                    kind="inputs")
+        before_products = st.data_editor(before_products_base, num_rows="dynamic", use_container_width=True, key="bp_edit")
+        before_inputs = st.data_editor(before_inputs_base, num_rows="dynamic", use_container_width=True, key="bi_edit")
 
     with col2:
         st.markdown("**After** – Products & Inputs")
-        apf = st.file_uploader("After products CSV", type=["csv"], key="ap")
-        aif = st.file_uploader("After inputs CSV", type=["csv"], key="ai")
-        after_products = pd.read_csv(apf) if apf else _example_products()
-        after_inputs = pd.read_csv(aif) if aif else _example_inputs()
-        after_products = st.data_editor(after_products, num_rows="dynamic", use_container_width=True, key="ap_edit")
-        after_inputs = st.data_editor(after_inputs, num_rows="dynamic", use_container_width=True, key="ai_edit")
+        after_products_base, ap_source = table_input("After products file", "ap", PRODUCT_COLUMNS, example_products(),
+                                                     kind="products")
+        after_inputs_base, ai_source = table_input("After inputs file", "ai", INPUT_COLUMNS, example_inputs(),
+                                                   kind="inputs")
+        after_products = st.data_editor(after_products_base, num_rows="dynamic", use_container_width=True, key="ap_edit")
+        after_inputs = st.data_editor(after_inputs_base, num_rows="dynamic", use_container_width=True, key="ai_edit")
 
     settings2 = settings
 
     if st.button("Compute Kaizen Comparison", type="primary"):
         try:
-            kdf = kaizen_compare(before_products, before_inputs, after_products, after_inputs, settings2)
-            st.success("Kaizen comparison computed.")
-            st.dataframe(kdf, use_container_width=True)
-
-            # Highlights
-            tfp_row = kdf[kdf["metric"] == "TFP_value_based"].iloc[0] if not kdf[kdf["metric"] == "TFP_value_based"].empty else None
-            if tfp_row is not None:
-                st.metric("TFP change (%)", value=f"{tfp_row['change_pct']:.2f}%")
-
-            csv2 = kdf.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download Kaizen CSV", data=csv2,
-                               file_name=f"kaizen_compare_{datetime.now():%Y%m%d_%H%M%S}.csv", mime="text/csv")
+            kaizen_key = fingerprint("kaizen", before_products, before_inputs, after_products, after_inputs,
+                                     settings=settings2)
+            # Session state is only touched in this script run: the job gets the finished
+            # accumulators (private copies) and only computes and compares their metrics
+            before_acc = edited_accumulator((bp_source, bi_source), before_products_base, "bp_edit",
+                                            before_inputs_base, "bi_edit")
+            after_acc = edited_accumulator((ap_source, ai_source), after_products_base, "ap_edit",
+                                           after_inputs_base, "ai_edit")
+            st.session_state["kaizen_job"] = job_runner.submit(
+                "Kaizen comparison", result_cache.get_or_compute, kaizen_key,
+                lambda: kaizen_frame(before_acc.metrics(settings2), after_acc.metrics(settings2)),
+                key=kaizen_key, user=session_user())
         except Exception as e:
             st.error(f"Error: {e}")
 
+    kaizen_job = job_status("kaizen_job")
+    if kaizen_job is not None:
+        kdf = kaizen_job.result
+        st.success(f"Kaizen comparison computed ({datetime.fromtimestamp(kaizen_job.finished):%H:%M:%S}).")
+        st.dataframe(kdf, use_container_width=True)
+
+        # Highlights
+        tfp_row = kdf[kdf["metric"] == "TFP_value_based"].iloc[0] if not kdf[kdf["metric"] == "TFP_value_based"].empty else None
+        if tfp_row is not None:
+            st.metric("TFP change (%)", value=f"{tfp_row['change_pct']:.2f}%")
+
+        st.download_button("⬇️ Download Kaizen results", data=download_data(kdf, download_format),
+                           file_name=download_file_name(f"kaizen_compare_{datetime.now():%Y%m%d_%H%M%S}", download_format),
+                           mime=download_mime(download_format))
+
+    st.divider()
+    st.subheader("Scenarios vs Baseline")
+    st.caption("Stacked products and inputs tables with a `scenario` column; all scenarios are computed in one pass.")
+    col_sp, col_si = st.columns(2)
+    scenario_products, _ = table_input("Scenario products file", "sp", ["scenario", *PRODUCT_COLUMNS], container=col_sp,
+                                       kind="products")
+    scenario_inputs, _ = table_input("Scenario inputs file", "si", ["scenario", *INPUT_COLUMNS], container=col_si,
+                                     kind="inputs")
+    try:
+        if scenario_products is None or scenario_inputs is None:
+            n_demo = st.number_input("Demo scenarios (example tables, volume −20% … +20%)", min_value=2,
+                                     max_value=5_000, value=21, step=1)
+            scenario_products, scenario_inputs = demo_scenarios(int(n_demo))
+        scenario_table = compute_scenario_metrics(scenario_products, scenario_inputs, settings2)
+        col_base, col_part = st.columns([2, 3])
+        baseline = col_base.selectbox("Baseline scenario", list(scenario_table.index), key="scenario_baseline")
+        part = col_part.radio("Show", ["value", "change_abs", "change_pct"], horizontal=True, key="scenario_part",
+                              format_func={"value": "Values", "change_abs": "Change (abs)",
+                                           "change_pct": "Change (%)"}.get)
+        scenario_cmp = scenario_compare(scenario_table, baseline)
+        paged_dataframe(scenario_cmp[part].reset_index(), key="scenarios", use_container_width=True)
+        flat = scenario_cmp.copy()
+        flat.columns = [f"{p}_{metric}" for p, metric in flat.columns]
+        st.download_button("⬇️ Download scenario comparison", data=download_data(flat.reset_index(), download_format),
+                           file_name=download_file_name(f"scenarios_{datetime.now():%Y%m%d_%H%M%S}", download_format),
+                           mime=download_mime(download_format))
+    except Exception as e:
+        st.error(f"Error: {e}")
+
 # --------------------------------------------------------------------------------------
 # Tab 3: National Aggregation
 # --------------------------------------------------------------------------------------
 with mode[2]:
     st.subheader("National Aggregation (Multi-company, Multi-period)")
     st.caption("Upload a long-form dataset with columns: company, period, table (product/input), product/resource, quantity, price, std_hours, unit_cost, unit")
-    nat = st.file_uploader("Upload national dataset CSV", type=["csv"], key="nat")
+    nat = st.file_uploader("Upload national dataset (CSV, Parquet or Feather)", type=UPLOAD_TYPES, key="nat")
+    preview_rows = 1000
 
     if nat:
-        nat_df = pd.read_csv(nat)
+        # Only a bounded preview is parsed here; the full file is aggregated from the store
+        nat_df = read_table_preview(nat, preview_rows)
+        nat_store = get_national_store(nat.file_id, nat)
     else:
         # Build a small demo dataset
-        demo_prods = _example_products(); demo_prods["company"] = "DemoCo"; demo_prods["period"] = "2025Q3"; demo_prods["table"] = "product"
-        demo_inputs = _example_inputs(); demo_inputs["company"] = "DemoCo"; demo_inputs["period"] = "2025Q3"; demo_inputs["table"] = "input"
+        demo_prods = example_products(); demo_prods["company"] = "DemoCo"; demo_prods["period"] = "2025Q3"; demo_prods["table"] = "product"
+        demo_inputs = example_inputs(); demo_inputs["company"] = "DemoCo"; demo_inputs["period"] = "2025Q3"; demo_inputs["table"] = "input"
         nat_df = pd.concat([
             demo_prods.rename(columns={"product":"product"})[["company","period","table","product","quantity","price","std_hours"]],
             demo_inputs[["company","period","table","resource","quantity","unit_cost","unit"]],
         ], ignore_index=True)
 
-    st.dataframe(nat_df, use_container_width=True)
+    if nat:
+        st.caption(f"Preview: first {len(nat_df):,} rows")
+    paged_dataframe(nat_df, key="nat_preview", use_container_width=True)
+
+    nat_workers = st.number_input("Worker processes", min_value=1, max_value=max(os.cpu_count() or 1, 1),
+                                  value=1, step=1,
+                                  help="Split the work by period across processes (1 = run in this session).")
+    nat_filters = {}
+    if nat:
+        st.caption(f"Indexed store: {nat_store.n_rows:,} rows · {len(nat_store.periods):,} periods · "
+                   f"{len(nat_store.companies):,} companies")
+        if len(nat_store.periods) > 1:
+            period_range = st.select_slider("Periods", options=nat_store.periods,
+                                            value=(nat_store.periods[0], nat_store.periods[-1]))
+            if period_range != (nat_store.periods[0], nat_store.periods[-1]):
+                nat_filters["period_range"] = period_range
+        company_text = st.text_input("Companies (comma-separated, blank = all)")
+        companies = [c.strip() for c in company_text.split(",") if c.strip()]
+        if companies:
+            nat_filters["companies"] = companies
+        # Screened from the store one period at a time, with the parse failures recorded at ingest
+        screen_key = fingerprint("national_screen", nat_store.directory, screen_z_max, settings=nat_filters)
+        if st.button("🔍 Screen data quality"):
+            st.session_state["screen_job"] = compute.submit(
+                "Data-quality screen", run_task, "national_screen", screen_key, nat_store.directory, screen_z_max,
+                dict(nat_filters), key=screen_key, user=session_user())
+        screen_job = job_status("screen_job", compute)
+        if screen_job is not None and screen_job.key == screen_key:
+            if screen_job.result.empty:
+                st.success("No rows flagged.")
+            else:
+                st.dataframe(screen_job.result, use_container_width=True, hide_index=True)
+                st.caption("Turn on **Leave out flagged rows** in the sidebar to compute the metrics without these rows.")
+    else:
+        nat_screening = screen(nat_df, "national", z_max=screen_z_max)
+        if nat_screening.n_flagged:
+            with st.expander(f"🔍 {nat_screening.n_flagged:,} of {len(nat_df):,} rows flagged"):
+                st.dataframe(nat_screening.report(), use_container_width=True, hide_index=True)
+            if quarantine_rows:
+                nat_df = nat_screening.passed(nat_df)
+
+    # Uploads leave out flagged rows by aggregating a screened copy of their store
+    quarantine_z = screen_z_max if nat and quarantine_rows else None
+    selection = nat_filters if quarantine_z is None else {**nat_filters, "quarantine_z": quarantine_z}
+    # The cube holds base sums at the finest grain; settings, grouping and drill-down are
+    # derived from it, so only the data selection is part of its key.
+    # Store directories are named after the upload's content hash.
+    cube_key = fingerprint("national_cube", nat_store.directory if nat else nat_df, settings=selection)
+    # Uploads are built from their store, by the shared compute service in serving mode;
+    # the in-memory demo table is built by this process's runner
+    national_runner = compute if nat else job_runner
+
+    def submit_national_cube() -> None:
+        if nat:
+            st.session_state["national_job"] = compute.submit(
+                "National cube", run_task, "national_cube", cube_key, nat_store.directory, dict(nat_filters),
+                nat_workers, quarantine_z, key=cube_key, user=session_user())
+        else:
+            build = lambda df=nat_df, w=nat_workers: build_cube(prepare_national(df), workers=w).sums  # noqa: E731
+            st.session_state["national_job"] = job_runner.submit("National cube", result_cache.get_or_compute,
+                                                                 cube_key, build, key=cube_key, user=session_user())
 
     if st.button("Compute National Metrics", type="primary"):
+        submit_national_cube()
+
+    exact_ready = st.session_state.get("national_cube", (None,))[0] == cube_key
+    quick_look = nat and st.toggle(
+        "⚡ Quick look", value=False,
+        help="Estimate metrics per period from a sample of companies within a second, with 95% confidence "
+             "intervals, then refine the sample in the background until the exact results replace it.")
+    if quick_look and not exact_ready:
+        # Stage i samples fractions[i] of the companies and extends stage i-1's sums, so each
+        # refinement only reads the companies it adds; the exact cube follows the last stage
+        fractions = quick_look_fractions(len(nat_filters.get("companies", nat_store.companies)))
+        stage_keys = [fingerprint("national_sample", nat_store.directory, f, settings=selection)
+                      for f in fractions]
+
+        def submit_stage(i: int) -> None:
+            st.session_state["quick_look_job"] = compute.submit(
+                f"Quick look ({fractions[i]:.0%} sample)", run_task, "national_sample", stage_keys[i],
+                nat_store.directory, dict(nat_filters), fractions[i], stage_keys[i - 1] if i else None,
+                fractions[i - 1] if i else 0.0, 0, nat_workers, quarantine_z, key=stage_keys[i], user=session_user())
+
+        latest = st.session_state.get("quick_look")
+        if latest is not None and latest[0] not in stage_keys:
+            latest = None
+        done = stage_keys.index(latest[0]) if latest is not None else -1
+        stage_job = compute.get(st.session_state.get("quick_look_job"))
+        if stage_job is not None and stage_job.key in stage_keys[done + 1:] and stage_job.status == DONE:
+            latest = (stage_job.key, stage_job.result)
+            st.session_state["quick_look"] = latest
+            done = stage_keys.index(stage_job.key)
+        if stage_job is None or stage_job.key not in stage_keys[done + 1:] or stage_job.status == DONE:
+            if done + 1 < len(stage_keys):
+                submit_stage(done + 1)
+            elif getattr(compute.get(st.session_state.get("national_job")), "key", None) != cube_key:
+                submit_national_cube()
+        job_status("quick_look_job", compute)
+
+        if latest is not None:
+            fraction = fractions[done]
+            try:
+                estimate = SampledCube(latest[1], fraction).estimate({**settings, "deflators": deflator_series},
+                                                                     by=["period"])
+            except ValueError as e:
+                st.error(f"Error: {e}")
+            else:
+                n_sampled = latest[1].index.get_level_values("company").nunique()
+                stage = "refining…" if done + 1 < len(stage_keys) else "computing the exact results…"
+                st.caption(f"⚡ Estimate from a {fraction:.0%} sample ({n_sampled:,} companies) · "
+                           f"95% confidence interval · {stage}")
+                st.line_chart(estimate.set_index("period")[
+                    ["TFP_value_based_lo", "TFP_value_based", "TFP_value_based_hi"]])
+                paged_dataframe(estimate, key="nat_quick_look", use_container_width=True)
+        elif not stage_keys:
+            st.caption("Too few companies to sample; computing the exact results.")
+    national_job = job_status("national_job", national_runner)
+    if national_job is not None and national_job.key == cube_key:
+        # Kept across reruns so grouping, drill-down and paging need no further click
+        st.session_state["national_cube"] = (cube_key, national_job.result)
+
+    national_cube = st.session_state.get("national_cube")
+    if national_cube is not None and national_cube[0] == cube_key:
+        cube = NationalCube(national_cube[1])
+        group_by = st.multiselect("Group by", cube.dimensions, default=["period"],
+                                  help="Metrics per combination of the selected keys; leave empty for the national total.")
+        drill = {}
+        drill_dims = [d for d in ["region", "sector"] if d in cube.dimensions]
+        for col, dim in zip(st.columns(len(drill_dims) or 1), drill_dims):
+            chosen = col.multiselect(f"Only {dim}", cube.values(dim), key=f"drill_{dim}")
+            if chosen:
+                drill[dim] = chosen
         try:
-            agg = national_aggregate(nat_df, settings)
-            st.dataframe(agg, use_container_width=True)
-            csv3 = agg.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download National Metrics CSV", data=csv3,
-                               file_name=f"national_metrics_{datetime.now():%Y%m%d_%H%M%S}.csv", mime="text/csv")
-        except Exception as e:
+            agg = cube.metrics({**settings, "deflators": deflator_series}, by=group_by, **drill)
+        except ValueError as e:
+            st.error(f"Error: {e}")
+        else:
+            paged_dataframe(agg, key="nat_metrics", use_container_width=True)
+            st.download_button("⬇️ Download National Metrics", data=download_data(agg, download_format),
+                               file_name=download_file_name(f"national_metrics_{datetime.now():%Y%m%d_%H%M%S}", download_format),
+                               mime=download_mime(download_format))
+
+        st.markdown("#### Trends")
+        entity_dims = [d for d in cube.dimensions if d != "period"]
+        tcol1, tcol2 = st.columns(2)
+        entity = tcol1.multiselect("Series per", entity_dims, default=[],
+                                   help="One growth/index series per combination; leave empty for the national series.")
+        window = tcol2.slider("Moving-average window (periods)", min_value=1, max_value=12, value=4)
+        try:
+            trends = cube.timeseries({**settings, "deflators": deflator_series}, entity=entity, window=window, **drill)
+        except ValueError as e:
             st.error(f"Error: {e}")
+        else:
+            n_series = len(trends.drop_duplicates(entity)) if entity else 1
+            if n_series <= 20:
+                chart = trends.assign(series=trends[entity].astype(str).agg(" / ".join, axis=1) if entity else "National")
+                st.line_chart(chart.pivot(index="period", columns="series", values="tornqvist_tfp_index"))
+            else:
+                st.caption(f"{n_series:,} series: chart shown for up to 20; filter or group coarser to plot.")
+            paged_dataframe(trends, key="nat_trends", use_container_width=True)
+            st.download_button("⬇️ Download Trends", data=download_data(trends, download_format),
+                               file_name=download_file_name(f"national_trends_{datetime.now():%Y%m%d_%H%M%S}", download_format),
+                               mime=download_mime(download_format))
 
 # --------------------------------------------------------------------------------------
 # Tab 4: Help
@@ -404,20 +625,81 @@ with mode[3]:
 
         ### Kaizen
         - Compare `Before` vs `After` states. App shows absolute and percentage change for each metric.
+        - **Scenarios vs Baseline**: upload products and inputs tables stacked with a `scenario` column to
+          compare many scenarios at once against a chosen baseline (also `python -m productivity scenarios`).
 
         ### National Aggregation
         - Upload long-form data combining many companies & periods. The app aggregates outputs & inputs and computes metrics per period.
+        - Uploads are ingested once into a local indexed store (`PRODUCTIVITY_STORE_DIR`): one memory-mapped
+          file per period, sorted by company. Filtering by period range or company only reads those rows.
+        - Only the first rows are shown as a preview.
+        - Optional `sector` / `region` columns can be used as extra grouping keys (e.g., per company × period).
+        - **Compute** builds a rollup cube once (base sums per period × region × sector × company). Changing the
+          grouping, drilling into regions/sectors or changing settings is then answered from the cube instantly.
+        - **Quick look** estimates the metrics per period from a sample of companies (2%, then 10% and 30%)
+          while the exact cube is built: all periods of a sampled company are used, totals are scaled by the
+          sample fraction and TFP is a ratio estimate, shown with a 95% confidence interval. Each stage only
+          reads the companies it adds; the exact results replace the estimate when ready
+          (also `python -m productivity national --sample 0.05`).
+        - **Trends** chain period-over-period growth per entity: TFP growth, Törnqvist input growth (cost-share
+          weighted over input categories), Törnqvist and Fisher TFP indexes (first period = 100) and a moving
+          average of TFP growth. Links run between consecutive periods present for the entity
+          (also `python -m productivity trends`).
+
+        ### Data quality
+        - Uploaded tables are screened before any metric: values that do not parse as numbers (otherwise
+          counted as 0), missing required values, negative quantities/prices/costs, national rows whose `table`
+          is neither product nor input, and outliers – a robust z-score (median / MAD of log price or unit cost
+          per product/resource and period) above the sidebar threshold.
+        - **Leave out flagged rows** quarantines them from every table, national uploads included: their metrics
+          are computed from a screened copy of the store, built once per threshold. Use `python -m productivity
+          screen` (or `national --screen`) to write a cleaned file and the quarantined rows with their issues.
+
+        ### Result cache
+        - National and Kaizen results are cached on disk, keyed by a hash of the data and settings, so
+          re-running the same file (even after a restart) is instant.
+        - Configure with `PRODUCTIVITY_CACHE_DIR` (use a shared volume across replicas) and `PRODUCTIVITY_CACHE_MAX_MB`.
+
+        ### Background jobs
+        - National and Kaizen computations run as background jobs (`PRODUCTIVITY_JOB_WORKERS`, default 2), so
+          using other widgets meanwhile does not restart them. The page refreshes itself while a job runs,
+          and the job can be cancelled; finished results are picked up on later reruns.
+        - Each user (the browser session; behind an authenticating proxy that sets `X-Forwarded-User`, set
+          `PRODUCTIVITY_TRUST_PROXY_USER=1` to use that header) runs at most `PRODUCTIVITY_JOBS_PER_USER` jobs
+          at once (default 2); further jobs wait for a slot. Identical requests from different users share one job.
+        - **Serving mode**: start `python -m productivity serve` and set `PRODUCTIVITY_COMPUTE_ADDRESS` (and the
+          same `PRODUCTIVITY_COMPUTE_AUTHKEY`) for every Streamlit process. National jobs then run in that one
+          shared service. `python -m productivity loadtest` simulates concurrent sessions and reports
+          p50/p95/p99 latency.
+
+        ### File formats
+        - Uploads accept CSV, Parquet and Feather (Arrow IPC); only the columns listed above are used.
+        - Each uploaded file is parsed once per server and kept in memory (`PRODUCTIVITY_REGISTRY_MAX_MB`,
+          least recently used tables are dropped first). Tables loaded in any tab of your session can be
+          picked under **…or a loaded table** instead of uploading them again; other users never see them.
+        - Pick the download format in the sidebar; Parquet/Feather keep dtypes and are much smaller/faster for big tables.
 
         ### Tips
         - Use consistent currency and units.
         - If your labor PP must be per **hour**, set `quantity = hours` and `unit_cost = average wage`. Interpret carefully.
         - Provide **deflators** (e.g., CPI, PPI) to get *real* productivity over time.
+        - For national data, upload a **deflator series** (`period`, optional `sector`, `price_deflator`,
+          `input_deflator`): every period (and sector) is deflated by its own entry within the same pass.
+          Rows with an empty sector apply to all sectors of that period.
         - You can extend the resource categories by renaming rows (mapping handled heuristically; unknowns go to overhead).
         """
     )
 
     st.info("This app is template-style and intentionally generic so it can fit manufacturing, services, healthcare, logistics, etc.")
 
+if show_timings:
+    with st.expander(f"🐞 Timings for this rerun ({timings.total_ms():,.1f} ms instrumented)", expanded=True):
+        st.dataframe(pd.DataFrame(timings.records()), use_container_width=True)
+        st.download_button("⬇️ Download spans (JSON lines)", data=timings.to_json_lines(),
+                           file_name=f"timings_{datetime.now():%Y%m%d_%H%M%S}.jsonl", mime="application/x-ndjson")
+        st.caption("Process-wide totals (Prometheus text format)")
+        st.code(prometheus_text(), language="text")
+
 st.toast("Ready. Load your data or edit the examples.", icon="✅")
 
 st.caption("Semoga ada masukan dan saran untuk penyempurnaan")
@@ -0,0 +1,75 @@
+"""
+Paginated table view for large frames, shared by both Streamlit apps.
+
+Filtering and sorting run on the server, on the typed frame (productivity.paging). Only
+the visible page is sent to the browser. The grid formats the numbers through
+column_config, so the frame is never converted to strings.
+"""
+from typing import Dict, Optional
+
+import pandas as pd
+import streamlit as st
+
+from productivity.instrumentation import span
+from productivity.paging import page_count, page_rows, view_positions
+
+PAGE_SIZES = [25, 50, 100, 500]
+
+LABELS: Dict[str, str] = {
+    "filter_column": "Filter column",
+    "filter": "Filter",
+    "filter_help": "Text columns: contains (case-insensitive). Numbers: >, >=, <, <=, =, != or a value.",
+    "sort_by": "Sort by",
+    "descending": "Descending",
+    "page_size": "Rows per page",
+    "page": "Page",
+    "caption": "Rows {first:,}–{last:,} of {shown:,} (total {total:,})",
+}
+
+
+def _number_config(df: pd.DataFrame, number_format: str) -> Dict:
+    config = {}
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            config[col] = st.column_config.NumberColumn(format=number_format)
+        elif pd.api.types.is_integer_dtype(df[col]):
+            config[col] = st.column_config.NumberColumn(format="%,d")
+    return config
+
+
+def paged_dataframe(df: pd.DataFrame, key: str, number_format: str = "%,.2f",
+                    labels: Optional[Dict[str, str]] = None, **dataframe_kwargs) -> None:
+    """Render `df` one page at a time, with server-side filter and sort controls."""
+    labels = {**LABELS, **(labels or {})}
+    columns = list(df.columns)
+    none_label = lambda c: "—" if c is None else str(c)  # noqa: E731
+
+    c_fcol, c_filter, c_sort, c_desc, c_size, c_page = st.columns([2, 3, 2, 1, 1, 1])
+    filter_column = c_fcol.selectbox(labels["filter_column"], [None] + columns, format_func=none_label,
+                                     key=f"{key}_filter_column")
+    filter_text = c_filter.text_input(labels["filter"], key=f"{key}_filter", help=labels["filter_help"],
+                                      disabled=filter_column is None)
+    sort_by = c_sort.selectbox(labels["sort_by"], [None] + columns, format_func=none_label, key=f"{key}_sort_by")
+    descending = c_desc.toggle(labels["descending"], key=f"{key}_descending")
+    page_size = c_size.selectbox(labels["page_size"], PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    try:
+        with span("view.positions", rows=len(df)):
+            positions = view_positions(df, sort_by, not descending, filter_column, filter_text)
+    except ValueError as e:
+        st.warning(str(e))
+        positions = None
+    n_rows = len(df) if positions is None else len(positions)
+    n_pages = page_count(n_rows, page_size)
+    page_key = f"{key}_page"
+    # A narrower filter or larger page can leave the stored page out of range
+    if st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    page = c_page.number_input(labels["page"], min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    window = page_rows(df, page, page_size, positions)
+    with span("render.page", rows=len(window)):
+        st.dataframe(window, column_config=_number_config(window, number_format), **dataframe_kwargs)
+    first = (page - 1) * page_size
+    st.caption(labels["caption"].format(first=min(first + 1, n_rows), last=first + len(window),
+                                        shown=n_rows, total=len(df)))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.batch import MetricBatch
+
+
+@pytest.mark.parametrize("values", [
+    ["u1", "u2", "u1", None],
+    ("u1", "u2", "u1", None),
+    np.array(["u1", "u2", "u1", None], dtype=object),
+    pd.Series(["u1", "u2", "u1", None]),
+    pd.Categorical(["u1", "u2", "u1", None]),
+    pd.Series(["u1", "u2", "u1", None], dtype="category"),
+])
+def test_set_key_accepts_raw_values(values):
+    batch = MetricBatch(4).set_key("unit", values)
+    codes, labels = batch.keys["unit"]
+    assert codes.tolist() == [0, 1, 0, -1]
+    assert labels.tolist() == ["u1", "u2"]
+    assert batch.to_pandas()["unit"].astype(object).tolist()[:3] == ["u1", "u2", "u1"]
+
+
+def test_set_key_accepts_numbers_and_empty_lists():
+    assert MetricBatch(3).set_key("period", [2024, 2025, 2024]).keys["period"][1].tolist() == [2024, 2025]
+    assert len(MetricBatch(0).set_key("unit", []).keys["unit"][0]) == 0
+
+
+def test_set_key_checks_length():
+    with pytest.raises(ValueError, match="batch has 3"):
+        MetricBatch(3).set_key("unit", ["a", "b"])
+
+
+def test_from_frame_round_trip():
+    df = pd.DataFrame({"unit": ["a", "b", "a"], "index": [1.0, np.nan, 3.0]})
+    out = MetricBatch.from_frame(df, ["unit"]).to_pandas()
+    assert out["unit"].astype(str).tolist() == ["a", "b", "a"]
+    np.testing.assert_array_equal(out["index"].to_numpy(), df["index"].to_numpy())
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import synthetic
+from productivity.cube import build_cube, build_cube_chunked
+from productivity.national import national_aggregate, national_base_sums
+from productivity.schema import prepare_deflators
+
+SETTINGS = {"use_price_output": True, "use_standard_hour_output": True}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    df = synthetic.national_dataset(8_000, seed=5)
+    df["company"] = df["company"].astype(str)
+    df.loc[df.sample(20, random_state=2).index, "region"] = None
+    return df
+
+
+@pytest.fixture(scope="module")
+def cube(dataset):
+    return build_cube(dataset)
+
+
+def assert_same(got, expected, keys):
+    got = got.reset_index()
+    if not keys:
+        got, expected = got.drop(columns="nation"), expected.reset_index(drop=True)
+    else:
+        got = got.astype({k: str for k in keys}).sort_values(keys).reset_index(drop=True)
+        expected = expected.astype({k: str for k in keys}).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("by", [["period"], ["region"], ["sector", "period"], ["region", "sector", "company"]])
+def test_rollups_match_direct_aggregation(cube, dataset, by):
+    assert_same(cube.metrics(SETTINGS, by=by), national_aggregate(dataset, SETTINGS, by=by), by)
+
+
+def test_drill_down_filters(cube, dataset):
+    regions = cube.values("region")[:2]
+    subset = dataset[dataset["region"].isin(regions) & (dataset["period"] == cube.values("period")[0])]
+    got = cube.metrics(SETTINGS, by=["sector"], region=regions, period=cube.values("period")[0])
+    assert_same(got, national_aggregate(subset, SETTINGS, by=["sector"]), ["sector"])
+
+
+def test_nation_total(cube, dataset):
+    whole = dataset.assign(period="ALL")
+    assert_same(cube.metrics(SETTINGS), national_aggregate(whole, SETTINGS).drop(columns="period"), [])
+
+
+def test_missing_keys_stay_in_coarser_levels(cube, dataset):
+    assert "None" not in [str(v) for v in cube.values("region")]
+    total = cube.rollup(by=["period"])["input_rows"].sum()
+    assert total == (dataset["table"] == "input").sum()
+    assert cube.rollup(by=["region"])["input_rows"].sum() < total
+
+
+def test_chunked_build_matches(cube, dataset, tmp_path):
+    path = tmp_path / "national.csv"
+    dataset.to_csv(path, index=False)
+    chunked = build_cube_chunked(str(path), chunksize=1_500)
+    for by in [["period"], ["region", "sector"]]:
+        assert_same(chunked.metrics(SETTINGS, by=by), cube.metrics(SETTINGS, by=by).reset_index(), by)
+
+
+def test_bad_queries(cube):
+    with pytest.raises(ValueError, match="Unknown cube dimensions"):
+        cube.metrics(SETTINGS, by=["country"])
+    with pytest.raises(ValueError, match="No cube rows"):
+        cube.metrics(SETTINGS, region="nowhere")
+
+
+@pytest.fixture(scope="module")
+def deflators(dataset):
+    periods = sorted(dataset["period"].unique())
+    sectors = sorted(dataset["sector"].unique())
+    rng = np.random.default_rng(0)
+    by_period = pd.DataFrame({"period": periods, "price_deflator": rng.uniform(0.8, 1.2, len(periods)),
+                              "input_deflator": rng.uniform(0.8, 1.2, len(periods))})
+    by_sector = pd.DataFrame([(p, s) for p in periods for s in sectors], columns=["period", "sector"])
+    by_sector["price_deflator"] = rng.uniform(0.8, 1.2, len(by_sector))
+    return {"period": by_period, "sector": by_sector}
+
+
+def test_period_deflators(cube, dataset, deflators):
+    series = deflators["period"]
+    settings = {**SETTINGS, "deflators": series}
+    got = cube.metrics(settings, by=["period"]).reset_index()
+    nominal = cube.metrics(SETTINGS, by=["period"]).reset_index()
+    factor = nominal["period"].map(series.set_index("period")["price_deflator"])
+    np.testing.assert_allclose(got["real_output_value"], nominal["gross_output_value"] / factor, rtol=1e-12)
+    np.testing.assert_allclose(got["gross_output_value"], nominal["gross_output_value"], rtol=1e-12)
+    assert_same(got, national_aggregate(dataset, settings, by=["period"]), ["period"])
+
+
+@pytest.mark.parametrize("by", [["period"], ["region"], []])
+def test_sector_deflators_applied_before_rollup(cube, dataset, deflators, by):
+    settings = {**SETTINGS, "deflators": deflators["sector"]}
+    got = cube.metrics(settings, by=by)
+    # Reference: deflate each period × sector group's output on its own, then add up
+    keys = [*by, "sector"] if "period" in by else [*by, "period", "sector"]
+    per_group = national_base_sums(dataset, keys).reset_index()
+    series = prepare_deflators(deflators["sector"]).set_index(["period", "sector"])["price_deflator"]
+    index = pd.MultiIndex.from_frame(per_group[["period", "sector"]].astype(str))
+    per_group["real"] = per_group["output_value"].to_numpy() / series.reindex(index).to_numpy()
+    expected = per_group.groupby(by)["real"].sum().to_numpy() if by else [per_group["real"].sum()]
+    np.testing.assert_allclose(got["real_output_value"].to_numpy(), expected, rtol=1e-9)
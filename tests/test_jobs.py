@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+import pytest
+
+from productivity import jobs
+
+
+@pytest.fixture
+def fresh_pool():
+    jobs.shutdown_process_pool()
+    yield
+    jobs.shutdown_process_pool()
+
+
+def test_process_pool_is_shared_and_grows(fresh_pool):
+    pool = jobs.process_pool(2)
+    assert jobs.process_pool(2) is pool
+    # A smaller request reuses the bigger pool
+    assert jobs.process_pool(1) is pool
+    assert pool.submit(os.getpid).result() != os.getpid()
+
+    bigger = jobs.process_pool(3)
+    assert bigger is not pool
+    assert jobs.process_pool(2) is bigger
+    # The replaced pool is shut down: it takes no more work
+    with pytest.raises(RuntimeError):
+        pool.submit(os.getpid)
+
+
+def test_shutdown_only_replaces_the_given_pool(fresh_pool):
+    pool = jobs.process_pool(1)
+    jobs.shutdown_process_pool(jobs.process_pool(1))
+    fresh = jobs.process_pool(1)
+    assert fresh is not pool
+    # A stale pool (e.g. broken, already replaced) leaves the current one alone
+    jobs.shutdown_process_pool(pool)
+    assert jobs.process_pool(1) is fresh
+
+
+def wait_for(runner, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while not runner.get(job_id).is_finished:
+        assert time.time() < deadline, f"job {job_id} did not finish"
+        time.sleep(0.01)
+    return runner.get(job_id)
+
+
+@pytest.fixture
+def runner():
+    runner = jobs.JobRunner(max_workers=4, max_per_user=1)
+    yield runner
+    runner.shutdown()
+
+
+def test_job_result_and_dedup_by_key(runner):
+    release = threading.Event()
+    first = runner.submit("sum", lambda: release.wait(5) and 42, key="k")
+    assert runner.submit("sum again", lambda: 0, key="k") == first
+    release.set()
+    job = wait_for(runner, first)
+    assert (job.status, job.result, job.progress) == (jobs.DONE, 42, 1.0)
+    # A finished job still answers for its key
+    assert runner.submit("sum again", lambda: 0, key="k") == first
+
+
+def test_failed_job_is_retried(runner):
+    failed = wait_for(runner, runner.submit("boom", lambda: 1 / 0, key="k"))
+    assert failed.status == jobs.FAILED and "ZeroDivisionError" in failed.error
+    retried = runner.submit("ok", lambda: 1, key="k")
+    assert retried != failed.id
+    assert wait_for(runner, retried).result == 1
+
+
+def test_cancel_stops_at_next_progress_report(runner):
+    started = threading.Event()
+
+    def work():
+        for i in range(1_000):
+            jobs.report_progress(i, 1_000)
+            if i == 10:
+                started.set()
+            time.sleep(0.01)
+        return "finished"
+
+    job_id = runner.submit("long", work)
+    assert started.wait(5)
+    assert runner.cancel(job_id)
+    job = wait_for(runner, job_id)
+    assert job.status == jobs.CANCELLED and job.result is None
+    assert 0.01 <= job.progress < 1
+    assert not runner.cancel(job_id)
+
+
+def test_report_progress_outside_a_job_does_nothing():
+    jobs.report_progress(5, 10)
+
+
+def test_per_user_limit(runner):
+    release = threading.Event()
+    a1 = runner.submit("a1", release.wait, 5, user="a")
+    a2 = runner.submit("a2", lambda: "a2", user="a")
+    b1 = runner.submit("b1", lambda: "b1", user="b")
+    # b is not held up by a's limit; a's second job waits for its first
+    assert wait_for(runner, b1).result == "b1"
+    assert runner.get(a2).status == jobs.QUEUED
+    assert runner.stats()["users"]["a"] == {"active": 1, "waiting": 1}
+    release.set()
+    assert wait_for(runner, a2).result == "a2"
+    assert wait_for(runner, a1).status == jobs.DONE
+    assert runner.stats()["users"] == {}
+
+
+def test_cancel_a_held_back_job(runner):
+    release = threading.Event()
+    first = runner.submit("a1", release.wait, 5, user="a")
+    held = runner.submit("a2", lambda: "a2", user="a")
+    assert runner.cancel(held)
+    assert runner.get(held).status == jobs.CANCELLED
+    release.set()
+    wait_for(runner, first)
+    assert runner.get(held).status == jobs.CANCELLED
+
+
+def test_finished_jobs_are_trimmed():
+    runner = jobs.JobRunner(max_workers=1, max_finished=3)
+    try:
+        ids = [wait_for(runner, runner.submit(f"job {i}", lambda i=i: i, key=str(i))).id for i in range(6)]
+        # The oldest finished jobs (and their keys) are dropped as new ones arrive
+        assert [j.id for j in runner.jobs()] == ids[2:]
+        assert runner.submit("job 0", lambda: 0, key="0") != ids[0]
+        assert runner.get(ids[0]) is None
+    finally:
+        runner.shutdown()
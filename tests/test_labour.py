@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.labour import (_peringkat, hitung_batch, hitung_indeks, hitung_indeks_batch, hitung_indikator,
+                                 hitung_indikator_batch, hitung_sensitivitas)
+
+# Baris tepi: pembagi 0 / negatif, NaN di setiap kolom, nilai di atas target (skor dipotong 100)
+UNITS = pd.DataFrame({
+    "unit": ["A", "B", "C", "D", "E", "F", "G", "H", "I"],
+    "output": [1000.0, 500.0, 0.0, np.nan, 800.0, 1e9, 250.0, 600.0, 300.0],
+    "workers": [10.0, 0.0, 5.0, 4.0, np.nan, 2.0, -3.0, 6.0, 0.0],
+    "hours": [1600.0, 800.0, 0.0, 640.0, 320.0, np.nan, 400.0, 0.0, 0.0],
+    "labour_cost": [5e4, 0.0, 2e4, 1e4, np.nan, 3e4, 1e4, 0.0, 0.0],
+})
+
+WEIGHTS = [(0.4, 0.3, 0.3), (1.0, 0.0, 0.0), (0.0, 0.0, 0.0), (0.0, 0.5, 0.5), (2.0, 1.0, 1.0)]
+TARGETS = [(100.0, 0.5, 0.02), (0.0, 0.5, None), (None, None, None), (0, 0, 0), (50.0, 1.0, 0.01)]
+
+
+def _per_baris(df, weights, targets):
+    # Jalur skalar lama (iterrows) sebagai acuan
+    rows = [hitung_indikator(r.output, r.workers, r.hours, r.labour_cost) for r in df.itertuples()]
+    lp, hp, wp = (np.array(v, dtype=float) for v in zip(*rows))
+    indeks = np.array([hitung_indeks(*r, weights, targets) for r in rows], dtype=float)
+    return lp, hp, wp, indeks
+
+
+def test_indikator_batch_matches_scalar():
+    expected = _per_baris(UNITS, WEIGHTS[0], TARGETS[0])[:3]
+    got = hitung_indikator_batch(UNITS["output"], UNITS["workers"], UNITS["hours"], UNITS["labour_cost"])
+    for e, g in zip(expected, got):
+        np.testing.assert_array_equal(g, e)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+@pytest.mark.parametrize("targets", TARGETS)
+def test_indeks_batch_matches_scalar(weights, targets):
+    lp, hp, wp, expected = _per_baris(UNITS, weights, targets)
+    np.testing.assert_allclose(hitung_indeks_batch(lp, hp, wp, weights, targets), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+@pytest.mark.parametrize("targets", TARGETS)
+def test_hitung_batch_matches_scalar(weights, targets):
+    lp, hp, wp, indeks = _per_baris(UNITS, weights, targets)
+    hasil = hitung_batch(UNITS, weights, targets)
+    expected = UNITS.assign(prod_per_worker=lp, prod_per_hour=hp, prod_per_wage=wp, productivity_index=indeks)
+    pd.testing.assert_frame_equal(hasil, expected, rtol=1e-12)
+
+
+def test_hitung_batch_without_hours():
+    weights, targets = WEIGHTS[0], TARGETS[0]
+    hasil = hitung_batch(UNITS.drop(columns="hours"), weights, targets)
+    assert hasil["prod_per_hour"].isna().all()
+    lp, _, wp, _ = _per_baris(UNITS, weights, targets)
+    expected = [hitung_indeks(a, np.nan, c, weights, targets) for a, c in zip(lp, wp)]
+    np.testing.assert_allclose(hasil["productivity_index"], expected, rtol=1e-12)
+
+
+def test_peringkat_ties_ignore_float_noise():
+    indeks = np.array([[100.0, np.nextafter(100.0, 0.0), 50.0, np.nan, 100.0 - 1e-12]])
+    np.testing.assert_array_equal(_peringkat(indeks), [[1.0, 1.0, 4.0, np.nan, 1.0]])
+
+
+def test_sensitivitas_ranks_equal_ratios_as_ties():
+    # 0.3 / 0.1 = 2.9999999999999996 dan 3 / 1 = 3.0: rasio sama, dihitung dengan urutan operasi berbeda
+    units = pd.DataFrame({"unit": ["A", "B", "C"], "output": [0.3, 3.0, 1.0], "workers": [0.1, 1.0, 1.0],
+                          "hours": [1.0, 10.0, 10.0], "labour_cost": [1.0, 10.0, 10.0]})
+    hasil = hitung_sensitivitas(units, [(1.0, 0.0, 0.0), (0.5, 0.25, 0.25)], [(2.0, 0.2, 0.2), (4.0, 1.0, 1.0)])
+    assert hasil["rank_best"].tolist() == [1.0, 1.0, 3.0]
+    assert hasil["rank_worst"].tolist() == [1.0, 1.0, 3.0]
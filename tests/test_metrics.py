@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.metrics import (PARTIAL_CATEGORIES, MetricsAccumulator, categorize_resource,
+                                  categorize_resource_codes, editor_delta, example_inputs, example_products,
+                                  kaizen_compare, productivity_metrics, scenario_compare, scenario_metrics)
+from productivity.schema import prepare_inputs
+
+SETTINGS = [
+    {"use_price_output": True, "use_standard_hour_output": True},
+    {"use_price_output": False, "use_standard_hour_output": False},
+    {"use_price_output": True, "price_deflator": 1.1, "input_deflator": 0.9},
+]
+
+
+def metrics_of(products, inputs_df, settings):
+    return productivity_metrics(products, inputs_df, **settings)
+
+
+def assert_same_metrics(got, expected):
+    assert got.keys() == expected.keys()
+    for k in expected:
+        np.testing.assert_allclose(got[k], expected[k], rtol=1e-12, err_msg=k)
+
+
+@pytest.mark.parametrize("name, category", [
+    ("Labor", "labor"), ("  Jam Kerja ", "labor"), ("Mesin CNC", "machine"), ("Bahan baku", "materials"),
+    ("Listrik PLN", "energy"), ("Sewa gedung", "overhead"), ("Consulting", "overhead"),
+    # The first matching category wins
+    ("Machine labor", "labor"),
+])
+def test_categorize_resource(name, category):
+    assert categorize_resource(name) == category
+
+
+def test_category_codes_match_per_row_categorisation():
+    resources = pd.Series(["Labor", "Energy", None, "Mesin", "Labor", "Other"])
+    expected = [PARTIAL_CATEGORIES.index(categorize_resource(str(r))) for r in resources]
+    assert list(categorize_resource_codes(resources)) == expected
+    assert list(categorize_resource_codes(resources.astype("category"))) == expected
+    assert len(categorize_resource_codes(resources.iloc[0:0])) == 0
+
+
+@pytest.mark.parametrize("settings", SETTINGS)
+def test_accumulator_matches_full_computation(settings):
+    products, inputs_df = example_products(), example_inputs()
+    acc = MetricsAccumulator.from_frames(products, inputs_df)
+    assert_same_metrics(acc.metrics(settings), metrics_of(products, inputs_df, settings))
+
+
+def test_editor_deltas_applied_incrementally():
+    products, inputs_df = example_products(), example_inputs()
+    base = MetricsAccumulator.from_frames(products, inputs_df)
+    products_state = {"edited_rows": {"1": {"quantity": 450}}, "deleted_rows": [2],
+                      "added_rows": [{"product": "D", "quantity": 10, "price": 80.0, "std_hours": 0.3}]}
+    inputs_state = {"edited_rows": {0: {"unit_cost": 7.5}}, "deleted_rows": [3], "added_rows": []}
+
+    acc = base.copy()
+    removed, added = editor_delta(products, products_state)
+    acc.update_products(removed, sign=-1)
+    acc.update_products(added)
+    removed, added = editor_delta(inputs_df, inputs_state)
+    acc.update_inputs(removed, sign=-1)
+    acc.update_inputs(added)
+
+    edited_products = products.copy()
+    edited_products.loc[1, "quantity"] = 450
+    edited_products = pd.concat([edited_products.drop(index=2),
+                                 pd.DataFrame(products_state["added_rows"])], ignore_index=True)
+    edited_inputs = inputs_df.copy()
+    edited_inputs.loc[0, "unit_cost"] = 7.5
+    edited_inputs = edited_inputs.drop(index=3)
+    for settings in SETTINGS:
+        assert_same_metrics(acc.metrics(settings), metrics_of(edited_products, edited_inputs, settings))
+    # The copy is independent of the base sums
+    assert_same_metrics(base.metrics(SETTINGS[0]), metrics_of(products, inputs_df, SETTINGS[0]))
+
+
+def test_emptied_category_reads_as_zero():
+    inputs_df = example_inputs()
+    acc = MetricsAccumulator.from_frames(example_products(), inputs_df)
+    acc.update_inputs(inputs_df[inputs_df["resource"] == "Energy"], sign=-1)
+    assert acc.category_cost["energy"] == 0.0
+    assert np.isnan(acc.metrics(SETTINGS[0])["PP_energy"])
+
+
+def scenarios(n=4):
+    rng = np.random.default_rng(3)
+    products, inputs_df = [], []
+    for s in range(n):
+        p = example_products().assign(scenario=f"S{s}")
+        p["quantity"] = p["quantity"] * rng.uniform(0.5, 1.5, len(p))
+        i = example_inputs().assign(scenario=f"S{s}")
+        i["unit_cost"] = i["unit_cost"] * rng.uniform(0.5, 1.5, len(i))
+        products.append(p)
+        inputs_df.append(i)
+    # S3 has no standard hours and no energy input
+    products[3]["std_hours"] = np.nan
+    inputs_df[3] = inputs_df[3][inputs_df[3]["resource"] != "Energy"]
+    return pd.concat(products, ignore_index=True), pd.concat(inputs_df, ignore_index=True)
+
+
+@pytest.mark.parametrize("settings", SETTINGS)
+def test_scenario_metrics_match_per_scenario(settings):
+    products, inputs_df = scenarios()
+    got = scenario_metrics(products, inputs_df, settings)
+    assert list(got.index) == ["S0", "S1", "S2", "S3"]
+    for s in got.index:
+        expected = metrics_of(products[products["scenario"] == s], inputs_df[inputs_df["scenario"] == s], settings)
+        for k, v in expected.items():
+            np.testing.assert_allclose(got.loc[s, k], v, rtol=1e-12, err_msg=f"{s} {k}")
+
+
+def test_scenario_compare_matches_kaizen():
+    products, inputs_df = scenarios()
+    settings = SETTINGS[0]
+    compare = scenario_compare(scenario_metrics(products, inputs_df, settings), "S0")
+    kaizen = kaizen_compare(products[products["scenario"] == "S0"], inputs_df[inputs_df["scenario"] == "S0"],
+                            products[products["scenario"] == "S2"], inputs_df[inputs_df["scenario"] == "S2"],
+                            settings).set_index("metric")
+    for part in ["change_abs", "change_pct"]:
+        np.testing.assert_allclose(compare[part].loc["S2", kaizen.index].to_numpy(dtype=float),
+                                   kaizen[part].to_numpy(dtype=float), rtol=1e-12)
+    assert (compare["change_abs"].loc["S0"].fillna(0) == 0).all()
+    with pytest.raises(ValueError, match="baseline"):
+        scenario_compare(scenario_metrics(products, inputs_df, settings), "missing")
+
+
+def test_scenario_column_required():
+    with pytest.raises(ValueError, match="scenario"):
+        scenario_metrics(example_products(), prepare_inputs(example_inputs()), SETTINGS[0])
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import synthetic
+from productivity.metrics import example_inputs, example_products, productivity_metrics
+from productivity.national import national_aggregate, national_aggregate_chunked
+
+SETTINGS = [
+    {"use_price_output": True, "use_standard_hour_output": True},
+    {"use_price_output": False, "use_standard_hour_output": False, "price_deflator": 1.1, "input_deflator": 0.9},
+]
+
+
+def groupby_aggregate(dataset, settings):
+    # The original per-period groupby + productivity_metrics implementation, as reference
+    df = dataset.copy()
+    for c in ["quantity", "price", "std_hours", "unit_cost"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
+    table = df["table"] if "table" in df.columns else df["type"]
+    period = df["period"] if "period" in df.columns else pd.Series("ALL", index=df.index)
+    results = []
+    for p, group in df.groupby(period):
+        kind = table.loc[group.index]
+        prods = group[kind == "product"].reindex(columns=["product", "quantity", "price", "std_hours"])
+        inputs = group[kind == "input"].reindex(columns=["resource", "quantity", "unit_cost", "unit"])
+        if prods.empty:
+            prods = example_products()
+        if inputs.empty:
+            inputs = example_inputs()
+        m = productivity_metrics(prods, inputs,
+                                 use_price_output=settings.get("use_price_output", True),
+                                 use_standard_hour_output=settings.get("use_standard_hour_output", False),
+                                 price_deflator=settings.get("price_deflator"),
+                                 input_deflator=settings.get("input_deflator"))
+        m["period"] = p
+        results.append(m)
+    return pd.DataFrame(results)
+
+
+def edge_dataset():
+    return pd.DataFrame([
+        # 2024Q1: products and inputs, unparsable and missing numbers
+        ("A", "2024Q1", "product", "P1", None, "10", "2.5", "1.5", None),
+        ("A", "2024Q1", "product", "P2", None, "x", "4", None, None),
+        ("B", "2024Q1", "input", None, "labor hours", "100", None, None, "20"),
+        ("B", "2024Q1", "input", None, "Machine time", "50", None, None, "bad"),
+        ("B", "2024Q1", "input", None, "steel", "7", None, None, "30"),
+        # 2024Q2: only products -> example inputs
+        ("A", "2024Q2", "product", "P1", None, "12", "2.5", "1.5", None),
+        # 2024Q3: only inputs -> example products
+        ("C", "2024Q3", "input", None, "electricity", "300", None, None, "0.2"),
+        # No period: left out of every group
+        ("C", None, "product", "P9", None, "1000", "1000", "10", None),
+        ("C", np.nan, "input", None, "overhead", "1", None, None, "1e6"),
+        # Neither product nor input
+        ("C", "2024Q1", "other", "P1", None, "99", "99", "9", None),
+    ], columns=["company", "period", "table", "product", "resource", "quantity", "price", "std_hours", "unit_cost"])
+
+
+def assert_same_metrics(got, expected):
+    pd.testing.assert_frame_equal(got.reset_index(drop=True)[expected.columns], expected,
+                                  check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("settings", SETTINGS)
+def test_matches_groupby_reference(settings):
+    df = edge_dataset()
+    assert_same_metrics(national_aggregate(df, settings), groupby_aggregate(df, settings))
+
+
+@pytest.mark.parametrize("settings", SETTINGS)
+def test_legacy_type_column(settings):
+    df = edge_dataset().rename(columns={"table": "type"})
+    assert_same_metrics(national_aggregate(df, settings), groupby_aggregate(df, settings))
+
+
+@pytest.mark.parametrize("settings", SETTINGS)
+def test_without_period_column(settings):
+    df = edge_dataset().drop(columns="period")
+    got = national_aggregate(df, settings)
+    assert got["period"].tolist() == ["ALL"]
+    assert_same_metrics(got, groupby_aggregate(df, settings))
+
+
+def test_synthetic_matches_groupby_reference():
+    df = synthetic.national_dataset(20_000, seed=3)
+    assert_same_metrics(national_aggregate(df, SETTINGS[0]), groupby_aggregate(df, SETTINGS[0]))
+
+
+@pytest.mark.parametrize("by", [["period"], ["company", "period"], ["sector"]])
+def test_workers_and_chunks_give_identical_frames(tmp_path, by):
+    df = synthetic.national_dataset(30_000, seed=5)
+    settings = SETTINGS[0]
+    expected = national_aggregate(df, settings, by=by)
+    pd.testing.assert_frame_equal(national_aggregate(df, settings, by=by, workers=2), expected)
+    pd.testing.assert_frame_equal(national_aggregate(df, settings, by=by, workers=2, shard_by="company"), expected)
+
+    path = tmp_path / "national.csv"
+    df.to_csv(path, index=False)
+    # Chunks read grouping keys as strings (the synthetic frame has categoricals)
+    as_text = {k: object for k in by}
+    for workers in (1, 2):
+        chunked = national_aggregate_chunked(str(path), settings, by=by, chunksize=4_000, workers=workers)
+        pd.testing.assert_frame_equal(chunked.astype(as_text), expected.astype(as_text), rtol=1e-9)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import synthetic
+from productivity.national import national_aggregate
+from productivity.national_store import NationalStore, ingest, national_aggregate_store
+
+pytest.importorskip("pyarrow")
+
+SETTINGS = {"use_price_output": True, "use_standard_hour_output": True}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    df = synthetic.national_dataset(20_000, seed=7)
+    df["company"] = df["company"].astype(str)
+    # A few rows without a period: skipped by period filters, dropped by period groupings
+    df.loc[df.sample(50, random_state=1).index, "period"] = None
+    return df
+
+
+@pytest.fixture(scope="module", params=["csv", "parquet"])
+def store(request, dataset, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(request.param)
+    source = directory / f"national.{request.param}"
+    if request.param == "csv":
+        dataset.to_csv(source, index=False)
+    else:
+        dataset.to_parquet(source, index=False)
+    # Small chunks, so periods are spilled across several chunks
+    ingest(str(source), str(directory / "store"), chunksize=3_000)
+    return NationalStore(str(directory / "store"))
+
+
+def assert_same(got, expected, keys):
+    as_text = {k: str for k in keys}
+    got = got.astype(as_text).sort_values(keys).reset_index(drop=True)
+    expected = expected.astype(as_text).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_store_metadata(store, dataset):
+    assert store.n_rows == len(dataset)
+    assert store.periods == sorted(dataset["period"].dropna().unique())
+    assert list(store.companies) == sorted(dataset["company"].unique())
+
+
+@pytest.mark.parametrize("by", [["period"], ["sector", "period"]])
+def test_store_matches_in_memory(store, dataset, by):
+    assert_same(national_aggregate_store(store, SETTINGS, by=by), national_aggregate(dataset, SETTINGS, by=by), by)
+
+
+def test_company_filter(store, dataset):
+    companies = sorted(dataset["company"].unique())[::25]
+    got = national_aggregate_store(store, SETTINGS, companies=companies)
+    assert_same(got, national_aggregate(dataset[dataset["company"].isin(companies)], SETTINGS), ["period"])
+    rows = sum(b - a for spans in store.row_ranges(companies=companies).values() for a, b in spans)
+    assert rows == dataset["company"].isin(companies).sum()
+
+
+def test_period_range(store, dataset):
+    lo, hi = store.periods[3], store.periods[10]
+    got = national_aggregate_store(store, SETTINGS, period_range=(lo, hi))
+    within = dataset["period"].notna() & (dataset["period"] >= lo) & (dataset["period"] <= hi)
+    assert_same(got, national_aggregate(dataset[within], SETTINGS), ["period"])
+    assert len(store.select(period_range=(lo, hi))) == within.sum()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_by_company_with_workers(store, dataset, workers):
+    got = national_aggregate_store(store, SETTINGS, by="company", workers=workers, chunksize=2_000)
+    assert_same(got, national_aggregate(dataset, SETTINGS, by=["company"]), ["company"])
+
+
+def test_select_returns_filtered_rows(store, dataset):
+    period = store.periods[0]
+    company = dataset.loc[dataset["period"] == period, "company"].iloc[0]
+    got = store.select(["company", "period", "quantity"], periods=[period], companies=[company])
+    expected = dataset[(dataset["company"] == company) & (dataset["period"] == period)]
+    assert len(got) == len(expected) > 0
+    np.testing.assert_allclose(np.sort(got["quantity"].to_numpy()), np.sort(expected["quantity"].to_numpy()))
+
+
+def test_unknown_filters_raise(store):
+    with pytest.raises(ValueError, match="Unknown companies"):
+        store.row_ranges(companies=["no-such-company"])
+    with pytest.raises(ValueError, match="Unknown periods"):
+        store.row_ranges(periods=["1900Q1"])
+
+
+@pytest.mark.parametrize("chunksize", [5, 1_000])
+def test_blank_keys_in_a_later_chunk(tmp_path, chunksize):
+    # Per-chunk dtype inference used to read the chunk with blanks as floats ("2020.0")
+    rows = []
+    for i in range(12):
+        rows.append(("A" if i % 2 else "B", str(2020 + i // 8), "product", "P1", None, 10.0 + i, 2.0, 1.0, None))
+        rows.append(("A" if i % 2 else "B", str(2020 + i // 8), "input", None, "labor", 5.0, None, None, 3.0 + i % 3))
+    rows[14] = (None,) + rows[14][1:]
+    rows[15] = (rows[15][0], None) + rows[15][2:]
+    df = pd.DataFrame(rows, columns=["company", "period", "table", "product", "resource", "quantity", "price",
+                                     "std_hours", "unit_cost"])
+    df.to_csv(tmp_path / "keys.csv", index=False)
+    store = ingest(str(tmp_path / "keys.csv"), str(tmp_path / "store"), chunksize=chunksize)
+    assert store.periods == ["2020", "2021"]
+    assert list(store.companies) == ["A", "B"]
+    expected = national_aggregate(pd.read_csv(tmp_path / "keys.csv", dtype={"company": str, "period": str}), SETTINGS)
+    assert_same(national_aggregate_store(store, SETTINGS), expected, ["period"])
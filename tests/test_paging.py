@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.paging import filter_mask, page_count, page_rows, view_positions
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "company": pd.Categorical(["Alpha", "beta", None, "ALPHA co", "Gamma", "beta"]),
+        "name": ["x1", "Y2", None, "x3", "z", "y"],
+        "value": [5.0, 1_500.0, np.nan, 20.0, -3.0, 1_000.0],
+    })
+
+
+@pytest.mark.parametrize("text, expected", [
+    (">= 1000", [1, 5]), ("<0", [4]), ("20", [3]), ("= 1,500", [1]), ("!= 5", [1, 2, 3, 4, 5]), ("", [0, 1, 2, 3, 4, 5]),
+])
+def test_numeric_filters(frame, text, expected):
+    assert list(np.flatnonzero(filter_mask(frame["value"], text))) == expected
+
+
+def test_bad_numeric_filter(frame):
+    with pytest.raises(ValueError, match=">= 1000"):
+        filter_mask(frame["value"], "big")
+
+
+@pytest.mark.parametrize("column", ["company", "name"])
+def test_text_filters_ignore_case_and_skip_missing(frame, column):
+    text = "alpha" if column == "company" else "Y"
+    expected = frame[column].astype("string").str.casefold().str.contains(text.casefold()).fillna(False)
+    assert list(filter_mask(frame[column], text)) == list(expected)
+
+
+def test_view_sorts_filtered_rows_missing_last(frame):
+    positions = view_positions(frame, sort_by="value", ascending=False, filter_column="company", filter_text="a")
+    assert list(frame.iloc[positions]["value"]) == [1_500.0, 1_000.0, 20.0, 5.0, -3.0]
+    positions = view_positions(frame, sort_by="value")
+    assert list(positions) == [4, 0, 3, 5, 1, 2]
+    assert view_positions(frame) is None
+
+
+def test_pages(frame):
+    assert page_count(0, 2) == 1
+    assert page_count(6, 2) == 3
+    assert page_count(7, 2) == 4
+    pd.testing.assert_frame_equal(page_rows(frame, 2, 4), frame.iloc[4:6])
+    positions = view_positions(frame, sort_by="value")
+    pd.testing.assert_frame_equal(page_rows(frame, 2, 2, positions), frame.iloc[[3, 5]])
+    assert page_rows(frame, 5, 2, positions).empty
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import synthetic
+from productivity.national import national_aggregate
+from productivity.quality import screen
+
+SETTINGS = {"use_price_output": True, "use_standard_hour_output": True}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    df = synthetic.national_dataset(6_000, seed=11)
+    df["company"] = df["company"].astype(str)
+    df = df.astype({c: object for c in ["quantity", "unit_cost"]})
+    products = np.flatnonzero(df["table"].eq("product").to_numpy())
+    inputs = np.flatnonzero(df["table"].eq("input").to_numpy())
+    df.iloc[products[:7], df.columns.get_loc("quantity")] = "x"
+    df.iloc[inputs[:5], df.columns.get_loc("unit_cost")] = "bad"
+    df.iloc[products[10:13], df.columns.get_loc("price")] = -1.0
+    return df
+
+
+@pytest.fixture(scope="module")
+def store(dataset, tmp_path_factory):
+    pytest.importorskip("pyarrow")
+    from productivity.national_store import ingest
+
+    directory = tmp_path_factory.mktemp("quality")
+    dataset.to_csv(directory / "national.csv", index=False)
+    return ingest(str(directory / "national.csv"), str(directory / "store"), chunksize=1_000)
+
+
+def rows(report, check, column):
+    hit = report[(report["check"] == check) & (report["column"] == column)]
+    return int(hit["rows"].sum())
+
+
+def test_screen_flags_unparsable_and_negative_values(dataset):
+    report = screen(dataset, "national").report()
+    assert rows(report, "not_numeric", "quantity") == 7
+    assert rows(report, "not_numeric", "unit_cost") == 5
+    assert rows(report, "missing", "quantity") == 0
+    assert rows(report, "negative", "price") == 3
+
+
+def test_screen_store_reports_parse_failures_recorded_at_ingest(store, dataset):
+    from productivity.quality import screen_store
+
+    got = screen_store(store).set_index(["check", "column"])["rows"]
+    expected = screen(dataset, "national").report().set_index(["check", "column"])["rows"]
+    assert got["not_numeric", "quantity"] == 7
+    assert got["not_numeric", "unit_cost"] == 5
+    pd.testing.assert_series_equal(got.sort_index(), expected[expected > 0].sort_index(), check_dtype=False)
+
+
+def test_quarantine_store_matches_screened_in_memory(store, dataset):
+    from productivity.national_store import national_aggregate_store
+    from productivity.quality import quarantine_store
+
+    passed = quarantine_store(store)
+    clean = screen(dataset, "national").passed(dataset)
+    assert passed.n_rows == len(clean)
+    clean = clean.astype({"quantity": float, "unit_cost": float})
+    got = national_aggregate_store(passed, SETTINGS).sort_values("period").reset_index(drop=True)
+    expected = national_aggregate(clean, SETTINGS).sort_values("period").reset_index(drop=True)
+    pd.testing.assert_frame_equal(got.astype({"period": str}), expected.astype({"period": str}),
+                                  check_dtype=False, rtol=1e-9)
+    # Built once per threshold, then reopened
+    assert quarantine_store(store).directory == passed.directory
+    assert quarantine_store(store, z_max=2.0).directory != passed.directory
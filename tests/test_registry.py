@@ -0,0 +1,63 @@
+import io
+import threading
+
+import pandas as pd
+
+from productivity.registry import DatasetRegistry
+
+
+class Upload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, data: bytes, file_id: str, name: str = "t.csv"):
+        super().__init__(data)
+        self.file_id = file_id
+        self.name = name
+
+
+def csv_bytes(n: int, offset: int = 0) -> bytes:
+    return pd.DataFrame({"product": [f"P{i}" for i in range(n)], "quantity": range(offset, offset + n)}) \
+        .to_csv(index=False).encode()
+
+
+def test_same_content_is_parsed_once_and_shared():
+    registry = DatasetRegistry()
+    first = registry.read(Upload(csv_bytes(10), "a"))
+    second = registry.read(Upload(csv_bytes(10), "b", "copy.csv"))
+    assert second is first
+    assert registry.stats()["misses"] == 1 and registry.stats()["hits"] == 1
+    assert list(first.columns(["quantity", "missing"]).columns) == ["quantity"]
+
+
+def test_concurrent_reads_parse_once():
+    registry = DatasetRegistry()
+    data = csv_bytes(50_000)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(registry.read(Upload(data, f"f{i}"))))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert registry.stats()["misses"] == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_datasets_can_be_scoped_to_a_session():
+    registry = DatasetRegistry()
+    mine = registry.read(Upload(csv_bytes(5), "mine"))
+    registry.read(Upload(csv_bytes(5, offset=100), "theirs", "secret.csv"))
+    assert [d.digest for d in registry.datasets([mine.digest])] == [mine.digest]
+    assert registry.datasets([]) == []
+    assert len(registry.datasets()) == 2
+
+
+def test_least_recently_used_is_evicted():
+    small = DatasetRegistry().read(Upload(csv_bytes(1_000), "x")).size_bytes
+    registry = DatasetRegistry(max_bytes=int(small * 2.5))
+    a = registry.read(Upload(csv_bytes(1_000, 0), "a"))
+    b = registry.read(Upload(csv_bytes(1_000, 1), "b"))
+    registry.get(a.digest)
+    registry.read(Upload(csv_bytes(1_000, 2), "c"))
+    assert registry.get(b.digest) is None and registry.get(a.digest) is a
+    assert registry.stats()["evictions"] == 1
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import result_cache, synthetic
+from productivity.cube import build_cube
+from productivity.metrics import example_inputs, example_products, kaizen_frame, productivity_metrics
+from productivity.quality import screen
+from productivity.result_cache import ResultCache, fingerprint
+from productivity.sampling import sample_base_sums
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+def cached_results():
+    national = synthetic.national_dataset(5_000, seed=2)
+    metrics = productivity_metrics(example_products(), example_inputs())
+    return {
+        "cube_sums": build_cube(national).sums,
+        "sample_sums": sample_base_sums(national, 0.3),
+        "screen_report": screen(national, "national").report(),
+        "kaizen": kaizen_frame(metrics, {k: v * 1.1 for k, v in metrics.items()}),
+    }
+
+
+@pytest.mark.parametrize("name", ["cube_sums", "sample_sums", "screen_report", "kaizen"])
+def test_round_trip(cache, name):
+    result = cached_results()[name]
+    cache.put(name, result)
+    pd.testing.assert_frame_equal(cache.get(name), result)
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_are_arrow_not_pickle(cache):
+    cache.put("k", pd.DataFrame({"a": [1.0, 2.0]}))
+    with open(os.path.join(cache.directory, "k.arrow"), "rb") as f:
+        assert f.read(6) == b"ARROW1"
+
+
+def test_corrupt_entry_is_dropped(cache):
+    path = os.path.join(cache.directory, "bad.arrow")
+    with open(path, "wb") as f:
+        f.write(b"not an arrow file")
+    assert cache.get("bad") is None
+    assert not os.path.exists(path)
+    assert cache.get_or_compute("bad", lambda: pd.DataFrame({"x": [1]}))["x"].tolist() == [1]
+
+
+def test_eviction_keeps_size_bounded(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=20_000)
+    for i in range(20):
+        cache.put(f"k{i}", pd.DataFrame({"x": np.arange(500, dtype=float) + i}))
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 20_000 and stats["evictions"] > 0
+    assert cache.get("k19") is not None
+
+
+def test_fingerprint_includes_cache_version(monkeypatch):
+    df = pd.DataFrame({"a": [1, 2]})
+    key = fingerprint("national_cube", df, settings={"x": 1})
+    assert key == fingerprint("national_cube", df.copy(), settings={"x": 1})
+    monkeypatch.setattr(result_cache, "CACHE_VERSION", result_cache.CACHE_VERSION + 1)
+    assert fingerprint("national_cube", df, settings={"x": 1}) != key
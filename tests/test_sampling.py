@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity import synthetic
+from productivity.cube import build_cube
+from productivity.sampling import CI_METRICS, quick_look_fractions, sample_base_sums, sample_companies, sample_cube
+
+SETTINGS = {"use_price_output": True}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    df = synthetic.national_dataset(30_000, seed=4)
+    df["company"] = df["company"].astype(str)
+    return df
+
+
+def test_quick_look_fractions():
+    assert quick_look_fractions(100) == [0.3]
+    assert quick_look_fractions(10_000) == [0.02, 0.1, 0.3]
+    assert quick_look_fractions(50) == []
+
+
+def test_samples_are_nested_and_reproducible(dataset):
+    companies = dataset["company"].unique()
+    small, large = sample_companies(companies, 0.1), sample_companies(companies, 0.3)
+    assert set(small) <= set(large)
+    assert sample_companies(companies, 0.1) == small
+    assert set(sample_companies(companies, 0.3, above=0.1)) == set(large) - set(small)
+    assert set(sample_companies(companies, 0.1, seed=1)) != set(small)
+    assert 0.2 < len(large) / len(companies) < 0.4
+
+
+def test_refinement_equals_a_fresh_sample(dataset):
+    first = sample_base_sums(dataset, 0.1)
+    refined = sample_base_sums(dataset, 0.3, previous=first, previous_fraction=0.1)
+    fresh = sample_base_sums(dataset, 0.3)
+    pd.testing.assert_frame_equal(refined, fresh, check_dtype=False, rtol=1e-12)
+
+
+def test_full_sample_is_exact(dataset):
+    exact = build_cube(dataset).metrics(SETTINGS, by=["period"])
+    estimate = sample_cube(dataset, 1.0).estimate(SETTINGS, by=["period"])
+    pd.testing.assert_frame_equal(estimate[exact.columns], exact, check_dtype=False, rtol=1e-9)
+    for metric in CI_METRICS:
+        np.testing.assert_allclose(estimate[f"{metric}_lo"], estimate[metric], rtol=1e-12)
+        np.testing.assert_allclose(estimate[f"{metric}_hi"], estimate[metric], rtol=1e-12)
+
+
+def test_store_and_in_memory_samples_agree(dataset, tmp_path):
+    pytest.importorskip("pyarrow")
+    from productivity.national_store import ingest
+
+    dataset.to_parquet(tmp_path / "national.parquet", index=False)
+    store = ingest(str(tmp_path / "national.parquet"), str(tmp_path / "store"))
+    got = sample_cube(store, 0.2).estimate(SETTINGS, by=["period"]).reset_index()
+    expected = sample_cube(dataset, 0.2).estimate(SETTINGS, by=["period"]).reset_index()
+    pd.testing.assert_frame_equal(got.astype({"period": str}), expected.astype({"period": str}), check_dtype=False,
+                                  rtol=1e-9)
+
+
+def test_confidence_intervals_cover_the_exact_values(dataset):
+    exact = build_cube(dataset).metrics(SETTINGS).iloc[0]
+    covered = {metric: 0 for metric in CI_METRICS}
+    seeds = range(40)
+    for seed in seeds:
+        estimate = sample_cube(dataset, 0.2, seed=seed).estimate(SETTINGS).iloc[0]
+        for metric in CI_METRICS:
+            covered[metric] += estimate[f"{metric}_lo"] <= exact[metric] <= estimate[f"{metric}_hi"]
+    # 95% intervals: allow for sampling noise over 40 draws
+    for metric, hits in covered.items():
+        assert hits >= 0.8 * len(seeds), f"{metric}: {hits} of {len(seeds)}"
+
+
+def test_totals_are_scaled_by_the_fraction(dataset):
+    sample = sample_cube(dataset, 0.25)
+    sampled = sample.cube.metrics(SETTINGS).iloc[0]
+    estimate = sample.estimate(SETTINGS).iloc[0]
+    assert estimate["real_output_value"] == pytest.approx(sampled["real_output_value"] / 0.25)
+    assert estimate["TFP_value_based"] == pytest.approx(sampled["TFP_value_based"])
+    assert estimate["companies_sampled"] == len(sample.sums.index.get_level_values("company").unique())
+
+
+def test_nothing_sampled(dataset):
+    with pytest.raises(ValueError, match="No companies sampled"):
+        sample_base_sums(dataset.head(3), 1e-9)
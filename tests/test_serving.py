@@ -0,0 +1,64 @@
+import time
+
+import pandas as pd
+import pytest
+
+from productivity import serving
+from productivity.jobs import DONE, JobRunner
+
+
+@pytest.mark.parametrize("headers, trust, expected", [
+    ({"X-Forwarded-User": "ana"}, False, "session-1"),
+    ({"X-Forwarded-User": "ana"}, True, "ana"),
+    ({"X-Forwarded-Email": "ana@example.org"}, True, "ana@example.org"),
+    ({"X-Forwarded-User": "ana", "X-Forwarded-Email": "bob@example.org"}, True, "ana"),
+    ({"X-Forwarded-User": "  "}, True, "session-1"),
+    ({}, True, "session-1"),
+])
+def test_request_user(headers, trust, expected):
+    assert serving.request_user(headers, "session-1", trust) == expected
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRODUCTIVITY_CACHE_DIR", str(tmp_path))
+    serving.shared_result_cache.cache_clear()
+    yield tmp_path
+    serving.shared_result_cache.cache_clear()
+
+
+def test_run_task_goes_through_the_shared_cache(cache_dir, monkeypatch):
+    calls = []
+
+    def task(n):
+        calls.append(n)
+        return pd.DataFrame({"n": range(n)})
+
+    monkeypatch.setitem(serving.TASKS, "test_task", task)
+    first = serving.run_task("test_task", "key-1", 3)
+    again = serving.run_task("test_task", "key-1", 3)
+    pd.testing.assert_frame_equal(first, again)
+    assert calls == [3]
+    with pytest.raises(ValueError, match="Unknown compute task"):
+        serving.run_task("nope", "key-2")
+
+
+def test_service_shares_jobs_between_front_ends(cache_dir, monkeypatch):
+    monkeypatch.setitem(serving.TASKS, "test_task", lambda n: pd.DataFrame({"n": range(n)}))
+    service = serving.ComputeService(JobRunner(max_workers=2, max_per_user=1))
+    try:
+        first = service.submit("task", serving.run_task, ("test_task", "key-1", 2), {}, "key-1", "ana")
+        second = service.submit("task", serving.run_task, ("test_task", "key-1", 2), {}, "key-1", "bob")
+        assert first == second
+        deadline = time.time() + 10
+        while not service.get(first).is_finished and time.time() < deadline:
+            time.sleep(0.01)
+        assert service.get(first).status == DONE
+        assert list(service.get(first).result["n"]) == [0, 1]
+    finally:
+        service.runner.shutdown()
+
+
+def test_parse_address():
+    assert serving.parse_address("10.0.0.2:9000") == ("10.0.0.2", 9000)
+    assert serving.parse_address(":9000") == ("127.0.0.1", 9000)
@@ -0,0 +1,32 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.tabular_io import DOWNLOAD_FORMATS, download_data, read_table, write_table
+
+FRAME = pd.DataFrame({"unit": ["A", "B", "Ç"], "output": [1.5, np.nan, 3.0], "workers": [1, 2, 3]})
+
+
+@pytest.mark.parametrize("label", list(DOWNLOAD_FORMATS))
+def test_download_payload_passes_streamlit_converter(label):
+    download_data_util = pytest.importorskip("streamlit.runtime.download_data_util")
+    payload = download_data(FRAME, label)()
+    data, _ = download_data_util.convert_data_to_bytes_and_infer_mime(payload, TypeError("unsupported"))
+    readers = {"csv": pd.read_csv, "parquet": pd.read_parquet, "feather": pd.read_feather}
+    back = readers[DOWNLOAD_FORMATS[label][0]](io.BytesIO(data))
+    pd.testing.assert_frame_equal(back, FRAME, check_dtype=False)
+
+
+def test_download_payload_can_be_fetched_again():
+    payload = download_data(FRAME, "CSV")
+    first, second = payload().read(), payload().read()
+    assert first == second and first.startswith(b"unit,output,workers")
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_write_read_round_trip(tmp_path, fmt):
+    path = tmp_path / f"t.{fmt}"
+    write_table(FRAME, str(path), fmt)
+    pd.testing.assert_frame_equal(read_table(str(path)), FRAME, check_dtype=False)
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productivity.cube import build_cube
+from productivity.timeseries import TIMESERIES_COLUMNS, national_timeseries
+
+SETTINGS = {"use_price_output": True}
+PERIODS = ["2021", "2022", "2023", "2024", "2025"]
+
+
+def panel(seed=0):
+    # Per company and period: one product (value = quantity) and labor / energy / materials costs
+    rng = np.random.default_rng(seed)
+    rows = []
+    for company in ["A", "B"]:
+        for period in PERIODS:
+            rows.append((company, period, "product", "P", None, rng.uniform(50, 150), 1.0, None))
+            for resource in ["labor", "energy", "materials"]:
+                rows.append((company, period, "input", None, resource, rng.uniform(5, 40), None, 1.0))
+    return pd.DataFrame(rows, columns=["company", "period", "table", "product", "resource", "quantity", "price",
+                                       "unit_cost"])
+
+
+def reference(df, window):
+    # Scalar, per-company transcription of the formulas in the timeseries module docstring
+    out = []
+    for company, rows in df.groupby("company"):
+        prev = None
+        tq_level = fisher_level = 100.0
+        growth = []
+        for period in sorted(rows["period"].unique()):
+            at = rows[rows["period"] == period]
+            y = float(at.loc[at["table"] == "product", "quantity"].sum())
+            costs = at[at["table"] == "input"].set_index("resource")["quantity"].astype(float)
+            x = float(costs.sum())
+            shares = costs / x
+            tfp = y / x
+            r = {"company": company, "period": period, "real_output": y, "real_input": x, "TFP": tfp}
+            if prev is None:
+                base = tfp
+                r.update(tfp_growth_pct=np.nan, output_growth=np.nan, tornqvist_input_growth=np.nan,
+                         tornqvist_tfp_growth=np.nan)
+            else:
+                w = 0.5 * (shares + prev["shares"])
+                tq_input = float((w * np.log(costs / prev["costs"])).sum() / w.sum())
+                laspeyres = float((prev["shares"] * costs / prev["costs"]).sum())
+                paasche_inv = float((shares * prev["costs"] / costs).sum())
+                output_growth = np.log(y / prev["y"])
+                tq_level *= np.exp(output_growth - tq_input)
+                fisher_level *= np.exp(output_growth - 0.5 * np.log(laspeyres / paasche_inv))
+                r.update(tfp_growth_pct=(tfp / prev["tfp"] - 1) * 100, output_growth=output_growth,
+                         tornqvist_input_growth=tq_input, tornqvist_tfp_growth=output_growth - tq_input)
+            growth.append(r["tfp_growth_pct"])
+            recent = [g for g in growth[-window:] if not np.isnan(g)]
+            r.update(tfp_index=100 * tfp / base, tornqvist_tfp_index=tq_level, fisher_tfp_index=fisher_level,
+                     tfp_growth_ma=np.mean(recent) if recent else np.nan)
+            out.append(r)
+            prev = {"y": y, "tfp": tfp, "costs": costs, "shares": shares}
+    return pd.DataFrame(out)
+
+
+@pytest.mark.parametrize("window", [1, 3])
+def test_matches_scalar_reference(window):
+    df = panel()
+    got = national_timeseries(df, SETTINGS, entity=["company"], window=window)
+    expected = reference(df, window)
+    assert list(got.columns) == ["company", "period", *TIMESERIES_COLUMNS]
+    pd.testing.assert_frame_equal(got.astype({"period": str}), expected[got.columns], check_dtype=False, rtol=1e-9)
+
+
+def test_cube_series_match_dataset_series():
+    df = panel(1)
+    cube = build_cube(df)
+    got = cube.timeseries(SETTINGS, entity=["company"], window=2)
+    expected = national_timeseries(df, SETTINGS, entity=["company"], window=2)
+    pd.testing.assert_frame_equal(got.astype({"company": str, "period": str}), expected.astype({"period": str}),
+                                  check_dtype=False, rtol=1e-9)
+
+
+def test_proportional_inputs_give_equal_indexes():
+    # Inputs all growing by the same factor: every input index equals that factor
+    df = panel(2)
+    inputs = df["table"] == "input"
+    step = df["period"].map({p: 1.1 ** i for i, p in enumerate(PERIODS)})
+    df.loc[inputs, "quantity"] = df.loc[inputs].groupby(["company", "resource"])["quantity"].transform("first") \
+        * step[inputs]
+    got = national_timeseries(df, SETTINGS, entity=["company"])
+    later = got["period"] != PERIODS[0]
+    np.testing.assert_allclose(got.loc[later, "tornqvist_input_growth"], np.log(1.1), rtol=1e-12)
+    np.testing.assert_allclose(got["tornqvist_tfp_index"], got["fisher_tfp_index"], rtol=1e-12)
+    np.testing.assert_allclose(got["tornqvist_tfp_index"], got["tfp_index"], rtol=1e-12)
+
+
+def test_missing_inputs_break_the_chain():
+    df = panel()
+    df = df[~((df["company"] == "A") & (df["period"] == "2023") & (df["table"] == "input"))]
+    got = national_timeseries(df, SETTINGS, entity=["company"]).set_index(["company", "period"])
+    assert np.isnan(got.loc[("A", "2023"), "TFP"])
+    assert got.loc[("A", "2022"), "tornqvist_tfp_index"] > 0
+    assert got.loc[[("A", "2023"), ("A", "2024"), ("A", "2025")], "tornqvist_tfp_index"].isna().all()
+    # The other company is unaffected
+    assert got.loc["B", "fisher_tfp_index"].notna().all()
+
+
+def test_national_series():
+    df = panel()
+    got = national_timeseries(df, SETTINGS, entity=[])
+    assert list(got["period"].astype(str)) == PERIODS
+    assert got.loc[0, "tfp_index"] == 100.0
+    y = df[df["table"] == "product"].groupby("period")["quantity"].sum().to_numpy()
+    np.testing.assert_allclose(got["output_growth"].to_numpy()[1:], np.diff(np.log(y)), rtol=1e-12)